@@ -0,0 +1,203 @@
+"""
+This file contains batched versions of move generation and evaluation, for
+analysis and self-play jobs that look at many boards at once. Every function
+works on N positions at a time with NumPy, so the Python overhead is paid
+once per batch instead of once per board.
+
+A batch of positions is an (N, 2) uint64 array. Column 0 holds the tokens
+of the player to move and column 1 the tokens of the opponent, with the same
+square layout as bitboard.py.
+
+NumPy is only needed by this module, the player itself does not use it.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from bitboard import SHIFTS, FULL_MASK
+from evaluation import (PatternEvaluator, get_default_evaluator,
+                        NUM_PHASES)
+
+_SHIFTS = [(np.uint64(abs(amount)), amount > 0, np.uint64(mask))
+           for amount, mask in SHIFTS]
+"""SHIFTS as NumPy scalars: (shift amount, shift left, mask)"""
+_ZERO = np.uint64(0)
+_ONE = np.uint64(1)
+_FULL = np.uint64(FULL_MASK)
+_SQUARE_BITS = np.left_shift(_ONE, np.arange(64, dtype=np.uint64))
+"""Bit of every square"""
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """
+    Count the tokens of every bitboard in an array
+    :param bits: uint64 array
+    :return: int64 array of the same shape
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).astype(np.int64)
+    as_bytes = np.ascontiguousarray(bits).view(np.uint8)
+    return np.unpackbits(as_bytes).reshape(bits.shape + (64,)).sum(
+        axis=-1, dtype=np.int64)
+
+
+def _shift(bits: np.ndarray, amount: np.uint64, left: bool,
+           mask: np.uint64) -> np.ndarray:
+    """
+    Shift every token of every bitboard one square in a direction
+    :param bits:
+    :param amount:
+    :param left:
+    :param mask:
+    :return:
+    """
+    if left:
+        return np.left_shift(bits, amount) & mask
+    return np.right_shift(bits, amount) & mask
+
+
+def from_grids(grids: np.ndarray, players: np.ndarray) -> np.ndarray:
+    """
+    Convert (N, 8, 8) boards in the server format (0 empty, 1 or 2 for the
+    players) to a batch of positions
+    :param grids: (N, 8, 8) array
+    :param players: (N,) array, the player to move on each board
+    :return: (N, 2) uint64 array
+    """
+    grids = np.asarray(grids).reshape(-1, 64)
+    players = np.asarray(players).reshape(-1, 1)
+    own = np.where(grids == players, _SQUARE_BITS, _ZERO)
+    other = np.where((grids != players) & (grids != 0), _SQUARE_BITS, _ZERO)
+    return np.stack([np.bitwise_or.reduce(own, axis=1),
+                     np.bitwise_or.reduce(other, axis=1)], axis=1)
+
+
+def batch_moves(positions: np.ndarray) -> np.ndarray:
+    """
+    Find the legal moves of every position
+    :param positions: (N, 2) uint64 array
+    :return: (N,) uint64 array of move masks
+    """
+    own = positions[:, 0]
+    other = positions[:, 1]
+    empty = ~(own | other) & _FULL
+    moves = np.zeros_like(own)
+    for amount, left, mask in _SHIFTS:
+        line = _shift(own, amount, left, mask) & other
+        # A line can contain at most 6 opponent tokens
+        for _ in range(5):
+            line |= _shift(line, amount, left, mask) & other
+        moves |= _shift(line, amount, left, mask) & empty
+    return moves
+
+
+def batch_flips(positions: np.ndarray, squares: np.ndarray) -> np.ndarray:
+    """
+    Find the tokens flipped by one move on every position
+    :param positions: (N, 2) uint64 array
+    :param squares: (N,) array, the square of the move on each position
+    :return: (N,) uint64 array of flipped tokens
+    """
+    own = positions[:, 0]
+    other = positions[:, 1]
+    move = _SQUARE_BITS[np.asarray(squares)]
+    flipped = np.zeros_like(own)
+    for amount, left, mask in _SHIFTS:
+        # Grow the line of opponent tokens next to the move
+        step = _shift(move, amount, left, mask) & other
+        line = step
+        for _ in range(5):
+            step = _shift(step, amount, left, mask) & other
+            line |= step
+        # Flip it if the square after the line is the players own token
+        bounded = (_shift(line, amount, left, mask) & own) != 0
+        flipped |= np.where(bounded, line, _ZERO)
+    return flipped
+
+
+def batch_children(positions: np.ndarray
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Play every legal move of every position.
+    The children have the opponent to move, so their columns are swapped.
+    :param positions: (N, 2) uint64 array
+    :return: (children (M, 2), parent index (M,), move square (M,))
+    """
+    moves = batch_moves(positions)
+    is_move = (moves[:, None] & _SQUARE_BITS[None, :]) != 0
+    parents, squares = np.nonzero(is_move)
+    parent_positions = positions[parents]
+    flipped = batch_flips(parent_positions, squares)
+    new_own = parent_positions[:, 0] | flipped | _SQUARE_BITS[squares]
+    new_other = parent_positions[:, 1] & ~flipped
+    children = np.stack([new_other, new_own], axis=1)
+    return children, parents, squares
+
+
+def batch_pattern_values(own: np.ndarray, other: np.ndarray,
+                         replies: np.ndarray,
+                         evaluator: Optional[PatternEvaluator] = None
+                         ) -> np.ndarray:
+    """
+    Evaluate positions with the pattern evaluator, the same way as
+    PatternEvaluator.evaluate
+    :param own: (N,) uint64 array, tokens of the player who just moved
+    :param other: (N,) uint64 array
+    :param replies: (N,) array, number of opponent replies
+    :param evaluator: The hand tuned evaluator if None
+    :return: (N,) int64 array of values
+    """
+    if evaluator is None:
+        evaluator = get_default_evaluator()
+    discs = popcount(own | other)
+    phases = np.minimum((discs - 4) * NUM_PHASES // 60, NUM_PHASES - 1)
+    values = np.asarray(evaluator.mobility)[phases] * replies + \
+        np.asarray(evaluator.discs)[phases] * \
+        (popcount(own) - popcount(other))
+    for pattern, extract, table in evaluator.instances:
+        table = np.asarray(table)
+        weights = np.asarray([phase_weights[pattern]
+                              for phase_weights in evaluator.weights])
+        # The readers only shift, mask and multiply, so they work on arrays
+        index = table[extract(own).astype(np.intp)] + \
+            2 * table[extract(other).astype(np.intp)]
+        values = values + weights[phases, index]
+    return values.astype(np.int64)
+
+
+def batch_move_values(positions: np.ndarray,
+                      squares: np.ndarray,
+                      evaluator: Optional[PatternEvaluator] = None
+                      ) -> np.ndarray:
+    """
+    Evaluate one move on every position, the same way as
+    Player._compute_board_value
+    :param positions: (N, 2) uint64 array
+    :param squares: (N,) array, the square of the move on each position
+    :param evaluator: The hand tuned evaluator if None
+    :return: (N,) int64 array of values
+    """
+    squares = np.asarray(squares)
+    flipped = batch_flips(positions, squares)
+    new_own = positions[:, 0] | flipped | _SQUARE_BITS[squares]
+    new_other = positions[:, 1] & ~flipped
+    replies = popcount(batch_moves(np.stack([new_other, new_own], axis=1)))
+    return batch_pattern_values(new_own, new_other, replies, evaluator)
+
+
+def batch_evaluate(positions: np.ndarray,
+                   evaluator: Optional[PatternEvaluator] = None
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                              np.ndarray]:
+    """
+    Expand and evaluate every legal move of every position in one call.
+    :param positions: (N, 2) uint64 array
+    :param evaluator: The hand tuned evaluator if None
+    :return: (move masks (N,), children (M, 2), parent index (M,),
+    value of each child's move (M,))
+    """
+    moves = batch_moves(positions)
+    children, parents, squares = batch_children(positions)
+    values = batch_move_values(positions[parents], squares, evaluator)
+    return moves, children, parents, values
@@ -0,0 +1,267 @@
+"""
+This file contains the benchmark suite. It checks and times the move
+generators with perft (the number of leaves of the game tree to a fixed
+depth), and times the search: nodes per second and the time to reach each
+depth of the iterative deepening, on a fixed set of positions.
+
+Results are written as JSON, and can be compared with the results of an
+earlier run to catch slowdowns:
+python benchmark.py [results path] [baseline path]
+"""
+
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from bitboard import BitBoard, find_flips, find_moves, iter_squares
+from book import START_BOARD
+from player import Player, ALGORITHMS
+from support import Board
+
+RESULTS_VERSION = 1
+"""Version of the results format"""
+PERFT_START: List[int] = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216,
+                          3005288]
+"""
+Leaves of the game tree from the start of the game, for each depth.
+A pass counts as a move, and a finished game is a leaf.
+"""
+PERFT_POSITIONS: List[Tuple[str, int, int, int, int]] = [
+    # (name, tokens of the player to move, tokens of the opponent, depth,
+    # leaves)
+    ('random-12-a', 0x80C06011291D0070, 0x783894E8D4E2FF8F, 6, 9242),
+    ('random-12-b', 0x8A4D8B56ECF2FE0C, 0x11123408130901B1, 6, 37500),
+]
+"""
+Positions from endgame.BENCHMARK_POSITIONS. The leaves were checked with
+the Board move generator.
+"""
+SEARCH_POSITIONS: List[Tuple[str, int, int]] = [
+    # (name, tokens of the player to move, tokens of the opponent)
+    ('start', 0x0000000810000000, 0x0000001008000000),
+    ('random-16', 0x003A0A0604000000, 0x0001041818180C02),
+    ('random-24', 0x091E201C3C3E4080, 0x00001E2300000000),
+    ('random-32', 0x8058250E0C032020, 0x4020103172F41C14),
+]
+"""Positions searched by the speed benchmarks, from seeded random games"""
+SEARCH_DEPTH = 5
+"""Depth searched by the speed benchmarks"""
+TOLERANCE = 0.2
+"""Fraction of speed that can be lost before a benchmark is a regression"""
+
+
+def perft(board: Union[Board, BitBoard], player: int, depth: int,
+          passed: bool = False) -> int:
+    """
+    Count the leaves of the game tree with the find_valid and
+    create_updated_board functions of a board.
+    :param board:
+    :param player: Player to move
+    :param depth:
+    :param passed: True if the previous player passed
+    :return:
+    """
+    if depth == 0:
+        return 1
+    opponent = player % 2 + 1
+    moves = list(board.find_valid(player))
+    if not moves:
+        if passed:
+            return 1
+        return perft(board, opponent, depth - 1, True)
+    return sum(perft(board.create_updated_board(move, player), opponent,
+                     depth - 1) for move in moves)
+
+
+def perft_bits(own: int, other: int, depth: int,
+               passed: bool = False) -> int:
+    """
+    Count the leaves of the game tree with the bitboard move generator.
+    :param own: Tokens of the player to move
+    :param other:
+    :param depth:
+    :param passed: True if the previous player passed
+    :return:
+    """
+    if depth == 0:
+        return 1
+    moves = find_moves(own, other)
+    if not moves:
+        if passed:
+            return 1
+        return perft_bits(other, own, depth - 1, True)
+    if depth == 1:
+        return bin(moves).count('1')
+    leaves = 0
+    for square in iter_squares(moves):
+        flipped = find_flips(own, other, square)
+        leaves += perft_bits(other & ~flipped, own | flipped | (1 << square),
+                             depth - 1)
+    return leaves
+
+
+def _timed(function: Callable, *args) -> Tuple[object, float]:
+    """
+    Call a function and measure how long it takes
+    :param function:
+    :param args:
+    :return: (result, time in seconds)
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_perft(board_depth: int = 5, bits_depth: int = 8) -> Dict[str, dict]:
+    """
+    Check and time both move generators from the start of the game and
+    from PERFT_POSITIONS.
+    :param board_depth: Depth of the Board perft, which is much slower
+    :param bits_depth: Depth of the bitboard perft
+    :return: Maps benchmark names to leaves, expected leaves, time and
+    leaves per second
+    """
+    start = BitBoard(START_BOARD)
+    runs = [
+        ('perft/board/start', perft, (Board(START_BOARD), 1, board_depth),
+         PERFT_START[board_depth]),
+        ('perft/bitboard/start', perft_bits,
+         (start.tokens[0], start.tokens[1], bits_depth),
+         PERFT_START[bits_depth]),
+    ]
+    for name, own, other, depth, leaves in PERFT_POSITIONS:
+        runs.append(('perft/bitboard/' + name, perft_bits,
+                     (own, other, depth), leaves))
+    results = {}
+    for name, function, args, expected in runs:
+        leaves, elapsed = _timed(function, *args)
+        results[name] = {'leaves': leaves, 'expected': expected,
+                         'ok': leaves == expected, 'seconds': elapsed,
+                         'per_second': leaves / max(elapsed, 1e-9)}
+    return results
+
+
+def time_to_depth(own: int, other: int, algorithm: str,
+                  depth: int) -> List[Tuple[int, float, int]]:
+    """
+    Run the iterative deepening search of the player one depth at a time.
+    :param own: Tokens of player 1, who is to move
+    :param other:
+    :param algorithm:
+    :param depth:
+    :return: List of (depth, time since the start, nodes since the start)
+    """
+    player = Player(BitBoard.from_bits(own, other), 1, max_depth=depth,
+                    algorithm=algorithm, endgame_empties=0)
+    moves = list(player.board.find_valid(1))
+    player.nodes = 0
+    iterations = []
+    start = time.perf_counter()
+    for search_depth in range(1, depth + 1):
+        player.search_depth = search_depth
+        player.depth_limited = False
+        player.search_root(moves)
+        iterations.append((search_depth, time.perf_counter() - start,
+                           player.nodes))
+        if not player.depth_limited:
+            break
+    return iterations
+
+
+def bench_search(depth: int = SEARCH_DEPTH) -> Dict[str, dict]:
+    """
+    Time the search of every algorithm on SEARCH_POSITIONS
+    :param depth:
+    :return: Maps benchmark names to nodes, time, nodes per second and the
+    time to reach each depth
+    """
+    results = {}
+    for algorithm in ALGORITHMS:
+        total_nodes = 0
+        total_time = 0.0
+        for name, own, other in SEARCH_POSITIONS:
+            iterations = time_to_depth(own, other, algorithm, depth)
+            _, elapsed, nodes = iterations[-1]
+            total_nodes += nodes
+            total_time += elapsed
+            results['search/{}/{}'.format(algorithm, name)] = {
+                'nodes': nodes, 'seconds': elapsed,
+                'per_second': nodes / max(elapsed, 1e-9),
+                'time_to_depth': {str(reached): seconds
+                                  for reached, seconds, _ in iterations}}
+        results['search/{}/all'.format(algorithm)] = {
+            'nodes': total_nodes, 'seconds': total_time,
+            'per_second': total_nodes / max(total_time, 1e-9)}
+    return results
+
+
+def run_benchmarks() -> dict:
+    """
+    Run the whole suite
+    :return: The results, ready to be written as JSON
+    """
+    benchmarks = bench_perft()
+    benchmarks.update(bench_search())
+    return {'version': RESULTS_VERSION,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'benchmarks': benchmarks}
+
+
+def compare(baseline: dict, current: dict,
+            tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Find the benchmarks that are slower than in the baseline, or wrong.
+    :param baseline: Results of an earlier run
+    :param current:
+    :param tolerance: Fraction of speed that can be lost
+    :return: A description of every problem found
+    """
+    problems = []
+    for name, result in current['benchmarks'].items():
+        if not result.get('ok', True):
+            problems.append('{}: {} leaves instead of {}'.format(
+                name, result['leaves'], result['expected']))
+        previous = baseline['benchmarks'].get(name)
+        if previous is None:
+            continue
+        if result['per_second'] < previous['per_second'] * (1 - tolerance):
+            problems.append('{}: {:.0f}/s, was {:.0f}/s'.format(
+                name, result['per_second'], previous['per_second']))
+    return problems
+
+
+def _read_results(path: str) -> Optional[dict]:
+    """
+    Read earlier results, if the file exists
+    :param path:
+    :return:
+    """
+    try:
+        with open(path) as results_file:
+            return json.load(results_file)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    """
+    Run the suite from the command line. Exits with status 1 if a
+    benchmark is wrong or slower than in the baseline.
+    """
+    output = sys.argv[1] if len(sys.argv) > 1 else 'benchmark.json'
+    baseline = _read_results(sys.argv[2]) if len(sys.argv) > 2 else None
+    results = run_benchmarks()
+    for bench_name, bench in results['benchmarks'].items():
+        print('{:32} {:10.3f}s {:12.0f}/s{}'.format(
+            bench_name, bench['seconds'], bench['per_second'],
+            '' if bench.get('ok', True) else '  WRONG'))
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent=2, sort_keys=True)
+    problems = compare(baseline or results, results)
+    for problem in problems:
+        print('REGRESSION ' + problem)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,511 @@
+"""
+This file contains a bitboard engine for the game.
+Each player's tokens are stored in a single 64 bit integer, where square
+(row, column) is bit row * 8 + column. Moves and flips are computed with
+shifts and masks instead of walking the board one position at a time.
+"""
+
+from typing import Iterator, List, Tuple
+
+from support import BOARD_SIZE, Position, SQUARE_POSITIONS
+from transposition import ZOBRIST_KEYS, zobrist_hash
+
+FULL_MASK = 0xFFFFFFFFFFFFFFFF
+"""Every square on the board"""
+NOT_FIRST_COLUMN = 0xFEFEFEFEFEFEFEFE
+"""Every square except column 0"""
+NOT_LAST_COLUMN = 0x7F7F7F7F7F7F7F7F
+"""Every square except column 7"""
+INNER_COLUMNS = NOT_FIRST_COLUMN & NOT_LAST_COLUMN
+"""Every square except columns 0 and 7"""
+
+SHIFTS: List[Tuple[int, int]] = [
+    # (shift amount, mask applied after the shift)
+    (-8, FULL_MASK),  # UP
+    (8, FULL_MASK),  # DOWN
+    (-1, NOT_LAST_COLUMN),  # LEFT
+    (1, NOT_FIRST_COLUMN),  # RIGHT
+    (7, NOT_LAST_COLUMN),  # DOWN_LEFT
+    (9, NOT_FIRST_COLUMN),  # DOWN_RIGHT
+    (-9, NOT_LAST_COLUMN),  # UP_LEFT
+    (-7, NOT_FIRST_COLUMN),  # UP_RIGHT
+]
+"""
+The 8 directions on the board as a shift and a mask.
+The mask removes tokens that wrapped around to the other side of the board.
+"""
+
+FLIP_KEYS: List[int] = [ZOBRIST_KEYS[0][square] ^ ZOBRIST_KEYS[1][square]
+                        for square in range(64)]
+"""Change in the Zobrist hash when the token on a square is flipped"""
+
+
+def popcount(bits: int) -> int:
+    """
+    Count the number of set bits (tokens) in a bitboard
+    :param bits:
+    :return:
+    """
+    return bits.bit_count()
+
+
+def shift(bits: int, amount: int, mask: int) -> int:
+    """
+    Shift every token on a bitboard one square in a direction
+    :param bits:
+    :param amount: Shift amount from SHIFTS
+    :param mask: Mask from SHIFTS
+    :return:
+    """
+    if amount > 0:
+        return (bits << amount) & mask & FULL_MASK
+    return (bits >> -amount) & mask
+
+
+def square_to_position(square: int) -> Position:
+    """
+    Convert a square index (0-63) into a position
+    :param square:
+    :return: A shared position from SQUARE_POSITIONS
+    """
+    return SQUARE_POSITIONS[square]
+
+
+def position_to_square(position: Position) -> int:
+    """
+    Convert a position into a square index (0-63)
+    :param position:
+    :return:
+    """
+    return position.square
+
+
+def iter_squares(bits: int) -> Iterator[int]:
+    """
+    Loop over the square index of every set bit, lowest first
+    :param bits:
+    :return:
+    """
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+
+def find_moves(own: int, other: int) -> int:
+    """
+    Find all legal moves for the player owning `own`.
+    For each direction, grow a line of opponent tokens away from the players
+    tokens. Any empty square at the end of such a line is a legal move.
+    :param own: Tokens of the player to move
+    :param other: Tokens of the opponent
+    :return: Bitboard of legal moves
+    """
+    empty = ~(own | other) & FULL_MASK
+    # Opponent tokens in the first or last column can not be inside a
+    # horizontal or diagonal line, leaving them out also stops the lines
+    # from wrapping around the board
+    inner = other & INNER_COLUMNS
+    moves = 0
+    for amount, line_tokens in ((8, other), (1, inner), (7, inner),
+                                (9, inner)):
+        # A line can contain at most 6 opponent tokens
+        line = (own << amount) & line_tokens
+        line |= (line << amount) & line_tokens
+        line |= (line << amount) & line_tokens
+        line |= (line << amount) & line_tokens
+        line |= (line << amount) & line_tokens
+        line |= (line << amount) & line_tokens
+        moves |= line << amount
+        line = (own >> amount) & line_tokens
+        line |= (line >> amount) & line_tokens
+        line |= (line >> amount) & line_tokens
+        line |= (line >> amount) & line_tokens
+        line |= (line >> amount) & line_tokens
+        line |= (line >> amount) & line_tokens
+        moves |= line >> amount
+    return moves & empty
+
+
+def count_moves(own: int, other: int) -> int:
+    """
+    Count the legal moves of the player owning `own`, without listing them
+    :param own: Tokens of the player to move
+    :param other: Tokens of the opponent
+    :return:
+    """
+    return popcount(find_moves(own, other))
+
+
+def _build_rays() -> Tuple[List[List[int]], List[Tuple[int, ...]],
+                           List[Tuple[int, ...]]]:
+    """
+    Build the squares met walking from each square in each direction, as
+    bitboards. Takes well under a millisecond, so it is done at import.
+    :return: (rays of each square in the order of SHIFTS, rays of each
+    square towards higher squares, rays towards lower squares), where
+    the last two only keep rays long enough to flip a token
+    """
+    rays = []
+    increasing = []
+    decreasing = []
+    for square in range(64):
+        square_rays = []
+        up_rays = []
+        down_rays = []
+        for amount, mask in SHIFTS:
+            line = 0
+            curr = shift(1 << square, amount, mask)
+            while curr:
+                line |= curr
+                curr = shift(curr, amount, mask)
+            square_rays.append(line)
+            if popcount(line) >= 2:
+                (up_rays if amount > 0 else down_rays).append(line)
+        rays.append(square_rays)
+        increasing.append(tuple(up_rays))
+        decreasing.append(tuple(down_rays))
+    return rays, increasing, decreasing
+
+
+RAYS, INCREASING_RAYS, DECREASING_RAYS = _build_rays()
+"""
+Squares met walking from each square in each direction, as bitboards.
+INCREASING_RAYS and DECREASING_RAYS split the rays that can contain a flip
+by the direction of the walk, see find_flips.
+"""
+
+
+def find_flips(own: int, other: int, square: int) -> int:
+    """
+    Find all tokens flipped when the player owning `own` plays at square.
+    :param own: Tokens of the player to move
+    :param other: Tokens of the opponent
+    :param square: Square index of the move
+    :return: Bitboard of flipped tokens
+    """
+    flipped = 0
+    # The first square of a ray that is not an opponent token ends the line
+    # of tokens that can be flipped. Only flip if it is the players own
+    for ray in INCREASING_RAYS[square]:
+        blockers = ray & ~other
+        first = blockers & -blockers
+        if first & own:
+            flipped |= ray & (first - 1)
+    for ray in DECREASING_RAYS[square]:
+        blockers = ray & ~other
+        if blockers:
+            first = 1 << (blockers.bit_length() - 1)
+            if first & own:
+                flipped |= ray & -(first << 1)
+    return flipped
+
+
+REVERSED_BYTES = bytes(int('{:08b}'.format(byte)[::-1], 2)
+                       for byte in range(256))
+"""Each byte with its bits in reverse order, to mirror the rows of a board"""
+
+
+def flip_vertical(bits: int) -> int:
+    """
+    Flip a bitboard upside down, row r goes to row 7 - r
+    :param bits:
+    :return:
+    """
+    return int.from_bytes(bits.to_bytes(8, 'little'), 'big')
+
+
+def flip_horizontal(bits: int) -> int:
+    """
+    Mirror a bitboard, column c goes to column 7 - c
+    :param bits:
+    :return:
+    """
+    return int.from_bytes(bits.to_bytes(8, 'little').translate(REVERSED_BYTES),
+                          'little')
+
+
+def flip_diagonal(bits: int) -> int:
+    """
+    Flip a bitboard along its main diagonal, (row, column) goes to
+    (column, row)
+    :param bits:
+    :return:
+    """
+    swap = 0x0F0F0F0F00000000 & (bits ^ (bits << 28))
+    bits ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (bits ^ (bits << 14))
+    bits ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (bits ^ (bits << 7))
+    bits ^= swap ^ (swap >> 7)
+    return bits & FULL_MASK
+
+
+SYMMETRIES = 8
+"""
+Number of symmetries of the board. Symmetry i flips along the diagonal if
+bit 4 is set, then upside down if bit 1 is set, then mirrors if bit 2 is set.
+"""
+
+
+def transform(bits: int, symmetry: int) -> int:
+    """
+    Apply one of the 8 symmetries of the board to a bitboard
+    :param bits:
+    :param symmetry: 0 to 7, 0 is the identity
+    :return:
+    """
+    if symmetry & 4:
+        bits = flip_diagonal(bits)
+    if symmetry & 1:
+        bits = flip_vertical(bits)
+    if symmetry & 2:
+        bits = flip_horizontal(bits)
+    return bits
+
+
+def inverse_transform(bits: int, symmetry: int) -> int:
+    """
+    Undo transform, each flip is its own inverse so they are applied in the
+    reverse order
+    :param bits:
+    :param symmetry:
+    :return:
+    """
+    if symmetry & 2:
+        bits = flip_horizontal(bits)
+    if symmetry & 1:
+        bits = flip_vertical(bits)
+    if symmetry & 4:
+        bits = flip_diagonal(bits)
+    return bits
+
+
+def symmetries(bits: int) -> List[int]:
+    """
+    Apply all 8 symmetries to a bitboard at once, sharing the flips between
+    them: only one diagonal flip is needed instead of four.
+    :param bits:
+    :return: transform(bits, symmetry) for each symmetry
+    """
+    vertical = flip_vertical(bits)
+    diagonal = flip_diagonal(bits)
+    diagonal_vertical = flip_vertical(diagonal)
+    return [bits, vertical, flip_horizontal(bits), flip_horizontal(vertical),
+            diagonal, diagonal_vertical, flip_horizontal(diagonal),
+            flip_horizontal(diagonal_vertical)]
+
+
+def canonical(own: int, other: int) -> Tuple[int, int, int]:
+    """
+    Find the canonical form of a position: the smallest (own, other) out of
+    the 8 symmetric positions.
+    :param own: Tokens of the player to move
+    :param other: Tokens of the opponent
+    :return: (own, other, symmetry used)
+    """
+    own_symmetries = symmetries(own)
+    smallest = min(own_symmetries)
+    first = own_symmetries.index(smallest)
+    # The opponent tokens only decide between symmetries giving the same
+    # smallest own tokens, which is rare outside of symmetric positions
+    if own_symmetries.count(smallest) == 1:
+        return smallest, transform(other, first), first
+    best = None
+    for symmetry in range(first, SYMMETRIES):
+        if own_symmetries[symmetry] == smallest:
+            candidate = (smallest, transform(other, symmetry), symmetry)
+            if best is None or candidate < best:
+                best = candidate
+    return best
+
+
+class BitBoard:
+    """
+    BitBoard is a drop in replacement for support.Board.
+    It exposes the same find_valid, create_updated_board and score surface,
+    but stores each player's tokens as a 64 bit integer.
+    It also keeps the Zobrist hash of the position up to date as moves are
+    made, so it can be used as a transposition table key.
+    """
+
+    __slots__ = ('tokens', 'hash_key', 'undo_stack')
+
+    def __init__(self, input_board: List[List[int]]):
+        """Creates a board from the given JSON"""
+
+        self.tokens: List[int] = [0, 0]
+        """
+        Tokens of each player as a bitboard.
+        Player 1 is the first bitboard, Player 2 is the second bitboard.
+        """
+        for row in range(len(input_board)):
+            for column in range(len(input_board[row])):
+                player = input_board[row][column]
+                if player in [1, 2]:
+                    self.tokens[player - 1] |= 1 << (row * BOARD_SIZE[1] +
+                                                     column)
+        self.hash_key: int = zobrist_hash(self.tokens)
+        """Zobrist hash of the tokens on the board"""
+        self.undo_stack: List[Tuple[int, int, int]] = []
+        """
+        State before each move made with make_move, as (player 1 tokens,
+        player 2 tokens, hash), so they can be undone with unmake_move.
+        """
+
+    @classmethod
+    def from_bits(cls, player_one: int, player_two: int) -> "BitBoard":
+        """
+        Create a board directly from the two bitboards
+        :param player_one:
+        :param player_two:
+        :return:
+        """
+        board = cls.__new__(cls)
+        board.tokens = [player_one, player_two]
+        board.hash_key = zobrist_hash(board.tokens)
+        board.undo_stack = []
+        return board
+
+    def copy(self) -> "BitBoard":
+        """
+        Create a copy of the board, without recomputing the hash
+        :return:
+        """
+        board = BitBoard.__new__(BitBoard)
+        board.tokens = [self.tokens[0], self.tokens[1]]
+        board.hash_key = self.hash_key
+        board.undo_stack = []
+        return board
+
+    @classmethod
+    def from_board(cls, board) -> "BitBoard":
+        """
+        Create a bitboard from any board exposing raw_board
+        :param board:
+        :return:
+        """
+        return cls(board.raw_board)
+
+    @property
+    def score(self) -> List[int]:
+        """
+        Current score of the game in a list format.
+        Player 1 is the first score, Player 2 is the second score.
+        """
+        return [popcount(self.tokens[0]), popcount(self.tokens[1])]
+
+    @property
+    def raw_board(self) -> List[List[int]]:
+        """
+        Raw board of the game status, rebuilt from the bitboards
+        """
+        return [[1 if self.tokens[0] >> (row * BOARD_SIZE[1] + column) & 1
+                 else 2 if self.tokens[1] >> (row * BOARD_SIZE[1] + column) & 1
+                 else 0
+                 for column in range(BOARD_SIZE[1])]
+                for row in range(BOARD_SIZE[0])]
+
+    def valid_mask(self, curr_player: int) -> int:
+        """
+        Find all valid positions on the board as a bitboard.
+        :param curr_player:
+        :return:
+        """
+        return find_moves(self.tokens[curr_player - 1],
+                          self.tokens[curr_player % 2])
+
+    def count_valid(self, curr_player: int) -> int:
+        """
+        Count the valid positions on the board
+        :param curr_player:
+        :return:
+        """
+        return popcount(self.valid_mask(curr_player))
+
+    def find_valid(self, curr_player: int) -> Iterator[Position]:
+        """
+        Find and return all valid positions on the board.
+        Each position is returned once, ordered by row then column.
+        :param curr_player:
+        :return:
+        """
+        for square in iter_squares(self.valid_mask(curr_player)):
+            yield SQUARE_POSITIONS[square]
+
+    def update_board(self, placed_position: Position,
+                     player: int) -> None:
+        """
+        Given a new position, update a board and flip tokens
+        :param placed_position:
+        :param player:
+        :return:
+        """
+        own = self.tokens[player - 1]
+        other = self.tokens[player % 2]
+        square = position_to_square(placed_position)
+        flipped = find_flips(own, other, square)
+        self.tokens[player - 1] = own | flipped | (1 << square)
+        self.tokens[player % 2] = other & ~flipped
+
+        # Update the hash with the placed token and the flipped tokens
+        hash_key = self.hash_key ^ ZOBRIST_KEYS[player - 1][square]
+        while flipped:
+            low_bit = flipped & -flipped
+            hash_key ^= FLIP_KEYS[low_bit.bit_length() - 1]
+            flipped ^= low_bit
+        self.hash_key = hash_key
+
+    def make_move(self, placed_position: Position, player: int) -> None:
+        """
+        Given a new position, update this board in place, so the move can be
+        undone with unmake_move. The search uses this to reuse one board.
+        :param placed_position:
+        :param player:
+        :return:
+        """
+        self.undo_stack.append(
+            (self.tokens[0], self.tokens[1], self.hash_key))
+        self.update_board(placed_position, player)
+
+    def unmake_move(self) -> None:
+        """
+        Undo the last move made with make_move.
+        :return:
+        """
+        self.tokens[0], self.tokens[1], self.hash_key = self.undo_stack.pop()
+
+    def create_updated_board(self, placed_position: Position,
+                             player: int) -> "BitBoard":
+        """
+        Given a new position, return a new updated board with tiles flipped
+        """
+        new_board = self.copy()
+        new_board.update_board(placed_position, player)
+        return new_board
+
+    def canonical(self, player: int) -> Tuple[int, int, int]:
+        """
+        Find the canonical form of the position, see canonical. Positions
+        that are rotations or mirrors of each other have the same form.
+        :param player: Player to move
+        :return: (tokens of player, tokens of the opponent, symmetry used)
+        """
+        return canonical(self.tokens[player - 1], self.tokens[player % 2])
+
+    def __eq__(self, other: "BitBoard") -> bool:
+        """
+        Define if two boards hold the same tokens
+        :param other:
+        :return:
+        """
+        if type(other) != type(self):
+            return False
+        return self.tokens == other.tokens
+
+    def __hash__(self):
+        """
+        Return the hash of the two bitboards
+        :return:
+        """
+        return self.hash_key
@@ -0,0 +1,216 @@
+"""
+This file contains the opening book. The book maps positions from the start
+of the game to their best move, found ahead of time by a deep search.
+
+Positions are stored in their canonical form, so each of the 8 symmetric
+positions uses the same entry. The book file is an open addressing hash
+table of fixed size records, read through mmap, so loading is instant and a
+lookup reads only a few records.
+"""
+
+import mmap
+import struct
+import sys
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from bitboard import (BitBoard, canonical, inverse_transform, iter_squares,
+                      square_to_position, position_to_square)
+from support import Position
+
+BOOK_MAGIC = b'AOBK'
+"""First bytes of a book file"""
+BOOK_VERSION = 1
+HEADER = struct.Struct('<4sII')
+"""Magic, version and number of slots"""
+RECORD = struct.Struct('<QQB')
+"""Tokens of the player to move, tokens of the opponent, best move square"""
+EMPTY_MOVE = 0xFF
+"""Move stored in a slot that holds no position"""
+LOAD_FACTOR = 0.5
+"""Maximum fraction of used slots when a book is written"""
+DEFAULT_PLIES = 8
+"""Number of moves from the start of the game covered by the builder"""
+DEFAULT_DEPTH = 6
+"""Depth of the search used by the builder"""
+START_BOARD = [[0, 0, 0, 0, 0, 0, 0, 0],
+               [0, 0, 0, 0, 0, 0, 0, 0],
+               [0, 0, 0, 0, 0, 0, 0, 0],
+               [0, 0, 0, 1, 2, 0, 0, 0],
+               [0, 0, 0, 2, 1, 0, 0, 0],
+               [0, 0, 0, 0, 0, 0, 0, 0],
+               [0, 0, 0, 0, 0, 0, 0, 0],
+               [0, 0, 0, 0, 0, 0, 0, 0]]
+"""Board at the start of a game"""
+
+
+def _slot(own: int, other: int, mask: int) -> int:
+    """
+    Find the first slot of a canonical position
+    :param own:
+    :param other:
+    :param mask: Number of slots - 1
+    :return:
+    """
+    mixed = (own ^ (other * 0x9E3779B97F4A7C15)) & 0xFFFFFFFFFFFFFFFF
+    mixed = (mixed * 0xFF51AFD7ED558CCD) & 0xFFFFFFFFFFFFFFFF
+    return (mixed >> 32) & mask
+
+
+def write_book(path: str, entries: Dict[Tuple[int, int], int]) -> None:
+    """
+    Write a book file.
+    :param path:
+    :param entries: Maps canonical (own, other) to the best move square
+    :return:
+    """
+    slots = 1
+    while slots * LOAD_FACTOR < len(entries) or slots < 2:
+        slots *= 2
+    table = bytearray(RECORD.pack(0, 0, EMPTY_MOVE) * slots)
+    for (own, other), square in entries.items():
+        index = _slot(own, other, slots - 1)
+        # Linear probing to the next free slot
+        while table[index * RECORD.size + RECORD.size - 1] != EMPTY_MOVE:
+            index = (index + 1) & (slots - 1)
+        RECORD.pack_into(table, index * RECORD.size, own, other, square)
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, slots))
+        book_file.write(table)
+
+
+class OpeningBook:
+    """
+    A read only opening book, memory mapped from a file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a book file
+        :param path:
+        """
+        with open(path, 'rb') as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        magic, version, self.slots = HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            raise ValueError('{} is not a version {} opening book'.format(
+                path, BOOK_VERSION))
+        self.mask = self.slots - 1
+
+    def __len__(self) -> int:
+        """
+        Number of positions in the book
+        :return:
+        """
+        return sum(1 for _ in self.items())
+
+    def items(self) -> Iterator[Tuple[Tuple[int, int], int]]:
+        """
+        Loop over all canonical positions and their best move
+        :return:
+        """
+        for own, other, square in RECORD.iter_unpack(
+                self.data[HEADER.size:]):
+            if square != EMPTY_MOVE:
+                yield (own, other), square
+
+    def lookup_canonical(self, own: int, other: int) -> Optional[int]:
+        """
+        Find the best move of a canonical position
+        :param own:
+        :param other:
+        :return: Square of the best move, or None if not in the book
+        """
+        index = _slot(own, other, self.mask)
+        while True:
+            offset = HEADER.size + index * RECORD.size
+            stored_own, stored_other, square = RECORD.unpack_from(self.data,
+                                                                  offset)
+            if square == EMPTY_MOVE:
+                return None
+            if stored_own == own and stored_other == other:
+                return square
+            index = (index + 1) & self.mask
+
+    def lookup(self, board: BitBoard, player: int) -> Optional[Position]:
+        """
+        Find the best move for a player on a board
+        :param board:
+        :param player: Player to move
+        :return: The move, or None if the position is not in the book
+        """
+        own, other, symmetry = board.canonical(player)
+        square = self.lookup_canonical(own, other)
+        if square is None:
+            return None
+        # Turn the move of the canonical position back to this board
+        move = inverse_transform(1 << square, symmetry)
+        if not move & board.valid_mask(player):
+            return None
+        return square_to_position(move.bit_length() - 1)
+
+    def close(self) -> None:
+        """
+        Release the memory map
+        :return:
+        """
+        self.data.close()
+
+
+def build_book(plies: int = DEFAULT_PLIES,
+               depth: int = DEFAULT_DEPTH,
+               algorithm: str = 'alphabeta') -> Dict[Tuple[int, int], int]:
+    """
+    Fill a book from deep searches of every position in the first moves of
+    the game. Symmetric positions are only searched once.
+    :param plies: Number of moves from the start of the game to cover
+    :param depth: Depth of the search of each position
+    :param algorithm: Search algorithm, from player.ALGORITHMS
+    :return: Maps canonical (own, other) to the best move square
+    """
+    # Imported here, as the player may use the book
+    from player import Player
+
+    entries: Dict[Tuple[int, int], int] = {}
+    start = BitBoard(START_BOARD)
+    # Player 1 moves first. Each level holds canonical positions only
+    level = {canonical(start.tokens[0], start.tokens[1])[:2]}
+    player = 1
+    for _ in range(plies):
+        next_level = set()
+        for own, other in level:
+            tokens = (own, other) if player == 1 else (other, own)
+            board = BitBoard.from_bits(*tokens)
+            moves = board.valid_mask(player)
+            if not moves:
+                continue
+            searcher = Player(board, player, max_depth=depth,
+                              algorithm=algorithm)
+            # No time limit, the builder runs offline
+            searcher.deadline = None
+            best = searcher.iterative_deepening()
+            entries[(own, other)] = position_to_square(best)
+            for square in iter_squares(moves):
+                child = board.create_updated_board(
+                    square_to_position(square), player)
+                next_level.add(canonical(child.tokens[player % 2],
+                                         child.tokens[player - 1])[:2])
+        level = next_level
+        player = player % 2 + 1
+    return entries
+
+
+if __name__ == "__main__":
+    """
+    Build a book from the command line:
+    python book.py <output path> [plies] [depth]
+    """
+    output = sys.argv[1]
+    plies = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PLIES
+    depth = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_DEPTH
+    start_time = time.monotonic()
+    book = build_book(plies, depth)
+    write_book(output, book)
+    print('wrote {} positions to {} in {:.1f}s'.format(
+        len(book), output, time.monotonic() - start_time))
@@ -0,0 +1,117 @@
+"""
+This file contains a cache of values computed for positions, such as their
+evaluation. The 8 symmetric forms of a position share a single entry, and
+the least recently used entries are removed once the cache is full. The
+value must be the same for every symmetric form, as it is for evaluators
+with symmetric weights (see evaluation.symmetric_weights).
+
+Canonicalizing a position costs about half of an evaluation, and after the
+opening a position is almost never reached in two symmetric forms, so only
+positions with few tokens are keyed by their canonical form. Others are
+keyed as they are.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from bitboard import canonical, popcount
+
+DEFAULT_ENTRIES = 1 << 16
+"""Default number of positions kept"""
+CANONICAL_TOKENS = 16
+"""Positions with at most this many tokens are keyed by canonical form"""
+
+
+class PositionCache:
+    """
+    A least recently used cache of values keyed by position.
+    """
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_ENTRIES,
+                 canonical_tokens: int = CANONICAL_TOKENS):
+        """
+        :param max_entries: Number of positions kept
+        :param canonical_tokens: Positions with at most this many tokens
+        are keyed by canonical form, 64 to always use it
+        """
+        self.max_entries = max_entries
+        self.canonical_tokens = canonical_tokens
+        self.entries: "OrderedDict[Tuple[int, int], int]" = \
+            OrderedDict()
+        """Values by key, least recently used first"""
+        self.hits = 0
+        """Number of lookups that found the position"""
+        self.misses = 0
+        """Number of lookups that did not find the position"""
+
+    def __len__(self) -> int:
+        """
+        Number of positions in the cache
+        :return:
+        """
+        return len(self.entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Fraction of lookups that found the position
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def key(self, own: int, other: int) -> Tuple[int, int]:
+        """
+        Key of a position in the cache
+        :param own: Tokens of the player to move
+        :param other:
+        :return:
+        """
+        if popcount(own | other) <= self.canonical_tokens:
+            return canonical(own, other)[:2]
+        return own, other
+
+    def get(self, own: int, other: int) -> Optional[int]:
+        """
+        Find the value stored for a position or any of its symmetric forms
+        :param own: Tokens of the player to move
+        :param other:
+        :return: The value, or None if not found
+        """
+        if popcount(own | other) <= self.canonical_tokens:
+            key = canonical(own, other)[:2]
+        else:
+            key = own, other
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, own: int, other: int, value: int) -> None:
+        """
+        Store the value of a position, removing the least recently used
+        position if the cache is full
+        :param own: Tokens of the player to move
+        :param other:
+        :param value: Must not be None
+        :return:
+        """
+        key = self.key(own, other)
+        entries = self.entries
+        # New keys are added at the end, only known keys must be moved
+        if key in entries:
+            entries.move_to_end(key)
+        entries[key] = value
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove all positions and reset the counters
+        :return:
+        """
+        self.entries.clear()
+        self.hits = self.misses = 0
@@ -1,22 +1,57 @@
 #!/usr/bin/python
 
+import os
 import sys
-import json
 import socket
-from support import Board
-from player import Player
-from typing import List
+import asyncio
+from typing import Optional
+# The protocol functions are also kept here, where they were first written
+from protocol import prepare_response, parse_message, play
+from session import PlayerSession
+from records import GameRecordWriter
+from telemetry import MoveLog
 
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'opening.book')
+"""Opening book used if it exists, built with book.py"""
 
-def prepare_response(move: List[int]):
+
+async def main(host: str, port: int, workers: int,
+               telemetry_path: Optional[str] = None,
+               algorithm: str = 'expectimax',
+               records_path: Optional[str] = None) -> None:
     """
-    Function that takes a movement and converts it to a response
-    :param move:
+    Connect to the server and play until the connection is closed.
+    :param host:
+    :param port:
+    :param workers: Number of processes searching the root moves
+    :param telemetry_path: File receiving the search statistics of every
+    move, '-' for stderr, None to disable them
+    :param algorithm: Way the player finds its moves, from player.MODES
+    :param records_path: File the moves are recorded to, see records.py,
+    None to disable them
     :return:
     """
-    response = '{}\n'.format(move).encode()
-    print('sending {!r}'.format(response))
-    return response
+    telemetry = MoveLog(telemetry_path) if telemetry_path else None
+    recorder = GameRecordWriter(records_path) if records_path else None
+    # The session keeps the search state between turns
+    session = PlayerSession(
+        algorithm=algorithm,
+        workers=workers,
+        book_path=BOOK_PATH if os.path.exists(BOOK_PATH) else None,
+        telemetry=telemetry,
+        recorder=recorder)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await play(reader, writer, session)
+    finally:
+        session.stop_pondering()
+        writer.close()
+        await writer.wait_closed()
+        if telemetry is not None:
+            telemetry.close()
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == "__main__":
@@ -26,29 +61,15 @@ if __name__ == "__main__":
     port = int(sys.argv[1]) if (len(sys.argv) > 1 and sys.argv[1]) else 1337
     host = sys.argv[2] if (
                 len(sys.argv) > 2 and sys.argv[2]) else socket.gethostname()
+    # Number of processes searching the root moves, 0 to search in this one
+    workers = int(sys.argv[3]) if (len(sys.argv) > 3 and sys.argv[3]) else 0
+    # File receiving the search statistics of every move, '-' for stderr
+    log_path = sys.argv[4] if (len(sys.argv) > 4 and sys.argv[4]) else None
+    # Search algorithm, or mcts for the Monte Carlo tree search
+    algorithm = sys.argv[5] if (len(sys.argv) > 5 and sys.argv[5]) \
+        else 'expectimax'
+    # File receiving a record of every move, see records.py
+    records_path = sys.argv[6] if (len(sys.argv) > 6 and sys.argv[6]) \
+        else None
 
-    # Define the socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    try:
-        # Try to connect to the port
-        sock.connect((host, port))
-        while True:
-            # While receiving
-            data = sock.recv(1024)
-            if not data:
-                print('connection to server closed')
-                break
-            # Get the data from the program in json
-            json_data = json.loads(str(data.decode('UTF-8')))
-            # Create the player for this board.
-            # Player is passed a board object and the players number
-            player = Player(Board(json_data['board']), json_data['player'])
-            maxTurnTime = json_data['maxTurnTime']
-
-            # Get the move from the player
-            move = player.get_move()
-            response = prepare_response(move)
-            # Send the response to the socket
-            sock.sendall(response)
-    finally:
-        sock.close()
+    asyncio.run(main(host, port, workers, log_path, algorithm, records_path))
@@ -0,0 +1,236 @@
+"""
+This file contains the exact endgame solver. When only a few squares are
+empty, the whole tree can be searched to the end of the game, so the
+solver plays perfectly instead of relying on the heuristics of the player.
+
+The solver works directly on bitboards and returns the disc differential
+(tokens of the player to move - tokens of the opponent) with perfect play.
+"""
+
+import time
+from typing import List, Optional, Tuple
+
+from bitboard import (FULL_MASK, find_flips, find_moves,
+                      iter_squares, popcount)
+from support import SearchTimeout
+
+ENDGAME_EMPTIES: int = 12
+"""The player switches to the solver at this many empty squares or fewer"""
+FASTEST_FIRST_EMPTIES: int = 7
+"""Above this many empty squares, moves are ordered by opponent mobility"""
+HASH_EMPTIES: int = 6
+"""Positions with at least this many empty squares are stored in the table"""
+HASH_SIZE: int = 1 << 16
+"""Maximum number of positions in the endgame table"""
+TIME_CHECK_INTERVAL = 1024
+"""Number of nodes searched between two checks of the clock"""
+QUADRANTS: List[int] = [0x000000000F0F0F0F, 0x00000000F0F0F0F0,
+                        0x0F0F0F0F00000000, 0xF0F0F0F000000000]
+"""The 4 quadrants of the board, used for parity ordering"""
+SQUARE_QUADRANT: List[int] = [
+    next(quadrant for quadrant in QUADRANTS if quadrant >> square & 1)
+    for square in range(64)
+]
+"""Quadrant of each square"""
+INFINITY = 65
+"""Larger than any disc differential"""
+
+BENCHMARK_POSITIONS: List[Tuple[str, int, int, int]] = [
+    # (name, tokens of the player to move, tokens of the opponent, value)
+    ('random-8-a', 0x40E0FCD052C4001F, 0x2F1D032F2D3B3F20, -24),
+    ('random-8-b', 0xFF7CA0D89424C080, 0x00805F266A5B3F78, 44),
+    ('random-10-a', 0x8040A099A5143C70, 0x7C3C5B665AEA4307, 10),
+    ('random-10-b', 0xC00130446A62524E, 0x3EFECFBB150D0501, -10),
+    ('random-12-a', 0x80C06011291D0070, 0x783894E8D4E2FF8F, -18),
+    ('random-12-b', 0x8A4D8B56ECF2FE0C, 0x11123408130901B1, -32),
+]
+"""
+Positions taken from seeded random games. Their values were checked against
+a plain minimax search (8 and 10 empty squares) or a plain alpha-beta search
+without table or ordering (12 empty squares).
+"""
+
+
+def final_score(own: int, other: int) -> int:
+    """
+    Disc differential at the end of the game. Empty squares go to the
+    winner.
+    :param own:
+    :param other:
+    :return:
+    """
+    own_count = popcount(own)
+    other_count = popcount(other)
+    empties = 64 - own_count - other_count
+    if own_count > other_count:
+        return own_count - other_count + empties
+    if own_count < other_count:
+        return own_count - other_count - empties
+    return 0
+
+
+class EndgameSolver:
+    """
+    Negamax alpha-beta search to the end of the game, with fastest-first
+    and parity move ordering and a small table of searched positions.
+    """
+
+    def __init__(self, hash_size: int = HASH_SIZE):
+        self.hash_size = hash_size
+        self.table = {}
+        """Maps (own, other) to (lower bound, upper bound)"""
+        self.nodes = 0
+        """Number of positions searched"""
+        self.deadline: Optional[float] = None
+        """Time (from time.monotonic) at which the search must stop"""
+
+    def best_move(self, own: int, other: int) -> Tuple[Optional[int], int]:
+        """
+        Find the best move and the exact value of a position.
+        :param own: Tokens of the player to move
+        :param other: Tokens of the opponent
+        :return: (square of the best move, disc differential). The square is
+        None if the player has to pass.
+        """
+        moves = find_moves(own, other)
+        if not moves:
+            return None, self.solve(own, other)
+        best_square = None
+        alpha = -INFINITY
+        for square in self._order(own, other, moves):
+            flipped = find_flips(own, other, square)
+            value = -self._solve(other & ~flipped,
+                                 own | flipped | (1 << square),
+                                 -INFINITY, -alpha, False)
+            if value > alpha:
+                alpha = value
+                best_square = square
+        return best_square, alpha
+
+    def solve(self, own: int, other: int,
+              alpha: int = -INFINITY, beta: int = INFINITY) -> int:
+        """
+        Find the exact value of a position.
+        :param own: Tokens of the player to move
+        :param other: Tokens of the opponent
+        :param alpha:
+        :param beta:
+        :return: Disc differential with perfect play
+        """
+        return self._solve(own, other, alpha, beta, False)
+
+    def _order(self, own: int, other: int, moves: int) -> List[int]:
+        """
+        Order the moves so the best ones are likely searched first.
+        With many empty squares, moves leaving the opponent the fewest
+        replies go first. Near the end, moves in quadrants with an odd
+        number of empty squares go first, as the last move in a region is
+        an advantage.
+        :param own:
+        :param other:
+        :param moves:
+        :return: Squares of the moves
+        """
+        empties = ~(own | other) & FULL_MASK
+        squares = list(iter_squares(moves))
+        if popcount(empties) > FASTEST_FIRST_EMPTIES:
+            def mobility(square: int) -> int:
+                flipped = find_flips(own, other, square)
+                return popcount(find_moves(other & ~flipped,
+                                           own | flipped | (1 << square)))
+            squares.sort(key=mobility)
+        else:
+            squares.sort(key=lambda square: not popcount(
+                SQUARE_QUADRANT[square] & empties) & 1)
+        return squares
+
+    def _solve(self, own: int, other: int, alpha: int, beta: int,
+               passed: bool) -> int:
+        """
+        Recursive negamax search to the end of the game.
+        :param own:
+        :param other:
+        :param alpha:
+        :param beta:
+        :param passed: True if the opponent just passed
+        :return:
+        """
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 \
+                and self.deadline is not None \
+                and time.monotonic() > self.deadline:
+            raise SearchTimeout()
+
+        moves = find_moves(own, other)
+        if not moves:
+            # Game over when neither player can move
+            if passed:
+                return final_score(own, other)
+            return -self._solve(other, own, -beta, -alpha, True)
+
+        # Look up the position in the table
+        key = None
+        if 64 - popcount(own | other) >= HASH_EMPTIES:
+            key = (own, other)
+            bounds = self.table.get(key)
+            if bounds is not None:
+                lower, upper = bounds
+                if lower >= beta:
+                    return lower
+                if upper <= alpha:
+                    return upper
+                if lower == upper:
+                    return lower
+                alpha = max(alpha, lower)
+                beta = min(beta, upper)
+        alpha_start = alpha
+
+        best = -INFINITY
+        for square in self._order(own, other, moves):
+            flipped = find_flips(own, other, square)
+            value = -self._solve(other & ~flipped,
+                                 own | flipped | (1 << square),
+                                 -beta, -alpha, False)
+            if value > best:
+                best = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if key is not None:
+            if len(self.table) >= self.hash_size:
+                self.table.clear()
+            lower, upper = self.table.get(key, (-INFINITY, INFINITY))
+            if best <= alpha_start:
+                upper = best
+            elif best >= beta:
+                lower = best
+            else:
+                lower = upper = best
+            self.table[key] = (lower, upper)
+        return best
+
+
+def run_benchmark() -> None:
+    """
+    Solve every benchmark position, check its value and report the speed.
+    :return:
+    """
+    for name, own, other, expected in BENCHMARK_POSITIONS:
+        solver = EndgameSolver()
+        start = time.monotonic()
+        value = solver.solve(own, other)
+        elapsed = time.monotonic() - start
+        print('{:12} empties={:2} value={:4} expected={:4} {} '
+              'nodes={:8} time={:.3f}s nodes/s={:.0f}'.format(
+                name, 64 - popcount(own | other), value, expected,
+                'ok' if value == expected else 'WRONG', solver.nodes,
+                elapsed, solver.nodes / max(elapsed, 1e-9)))
+
+
+if __name__ == "__main__":
+    """
+    Run the benchmark from the command line: python endgame.py
+    """
+    run_benchmark()
@@ -0,0 +1,608 @@
+"""
+This file contains the pattern evaluation of a position. Instead of checking
+single squares, the evaluation looks at groups of squares (patterns) along
+the edges, in the corners and on the diagonals. Each pattern instance is
+read from the bitboards, turned into a base 3 index (empty, own, opponent
+for each square) and looked up in a table of weights, with a separate table
+for each phase of the game. A whole position costs a few table lookups.
+
+Symmetric instances of a pattern (the 4 edges, the 4 corners, the 2
+diagonals) share the same weights, as their squares are indexed in the same
+order.
+"""
+
+import os
+import struct
+from array import array
+from typing import Callable, List, Optional, Tuple
+
+from bitboard import BitBoard, FLIP_KEYS, find_flips, popcount, transform
+from support import Position
+from transposition import ZOBRIST_KEYS
+
+CORNER_REWARD = 100
+X_SQUARE_REWARD = -10
+EDGES_REWARD = 5
+REWARD_SCORE_DIFF = 2
+MOBILITY_PENALTY = 10
+"""Penalty for each reply left to the opponent"""
+
+NUM_PHASES = 4
+"""Number of game phases with their own weights"""
+PATTERNS: List[Tuple[str, List[int]]] = [
+    ('edge', [0, 1, 2, 3, 4, 5, 6, 7]),
+    ('corner', [0, 1, 2, 8, 9, 10, 16, 17, 18]),
+    ('diagonal', [0, 9, 18, 27, 36, 45, 54, 63]),
+]
+"""
+Name and squares of each pattern, in the order of its base 3 digits. The
+squares are those of the instance in the top left corner.
+"""
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'weights.bin')
+"""Weights loaded by every player if the file exists, written by tuning.py"""
+WEIGHTS_MAGIC = b'AOWT'
+"""First bytes of a weight file"""
+WEIGHTS_VERSION = 1
+WEIGHTS_HEADER = struct.Struct('<4sIIII')
+"""Magic, format version, revision of the weights, phases, patterns"""
+MAIN_DIAGONAL = 0x8040201008040201
+ANTI_DIAGONAL = 0x0102040810204080
+FIRST_COLUMN = 0x0101010101010101
+
+
+def _row(row: int) -> Callable[[int], int]:
+    """
+    Read the tokens of a row as a byte
+    :param row:
+    :return:
+    """
+    amount = 8 * row
+    return lambda bits: (bits >> amount) & 0xFF
+
+
+def _column(column: int) -> Callable[[int], int]:
+    """
+    Read the tokens of a column as a byte. The multiplication moves the bit
+    of every row to a different bit of the top byte.
+    :param column:
+    :return:
+    """
+    return lambda bits: (((bits >> column) & FIRST_COLUMN) *
+                         0x0102040810204080 >> 56) & 0xFF
+
+
+def _diagonal(mask: int) -> Callable[[int], int]:
+    """
+    Read the tokens of a diagonal as a byte. Each row has its square in a
+    different column, so the multiplication adds the rows into the top
+    byte without carries.
+    :param mask:
+    :return:
+    """
+    return lambda bits: ((bits & mask) * FIRST_COLUMN >> 56) & 0xFF
+
+
+def _corner(row: int, column: int) -> Callable[[int], int]:
+    """
+    Read the tokens of the 3x3 square starting at (row, column) as 9 bits
+    :param row:
+    :param column:
+    :return:
+    """
+    amount = 8 * row + column
+    return lambda bits: ((bits >> amount) & 0x7) | \
+        ((bits >> (amount + 5)) & 0x38) | \
+        ((bits >> (amount + 10)) & 0x1C0)
+
+
+INSTANCES: List[Tuple[int, int, Callable[[int], int]]] = [
+    (0, 0, _row(0)), (0, 1, _row(7)), (0, 4, _column(0)), (0, 6, _column(7)),
+    (1, 0, _corner(0, 0)), (1, 1, _corner(5, 0)), (1, 2, _corner(0, 5)),
+    (1, 3, _corner(5, 5)),
+    (2, 0, _diagonal(MAIN_DIAGONAL)), (2, 2, _diagonal(ANTI_DIAGONAL)),
+]
+"""
+Every pattern instance on the board: (index in PATTERNS, symmetry turning
+the top left instance into this one, function reading its tokens)
+"""
+
+
+def game_phase(tokens: int) -> int:
+    """
+    Find the phase of the game from the tokens on the board
+    :param tokens: Tokens of both players
+    :return: 0 to NUM_PHASES - 1
+    """
+    return min((popcount(tokens) - 4) * NUM_PHASES // 60, NUM_PHASES - 1)
+
+
+def _index_table(pattern: int, symmetry: int,
+                 extract: Callable[[int], int]) -> List[int]:
+    """
+    Build the table turning the tokens read from an instance into the base
+    3 index of its digits, without the factor 2 of the opponent tokens
+    :param pattern: Index in PATTERNS
+    :param symmetry:
+    :param extract:
+    :return:
+    """
+    squares = PATTERNS[pattern][1]
+    # Bit read for the k-th square of the pattern
+    bits = []
+    for square in squares:
+        moved = transform(1 << square, symmetry)
+        read = extract(moved)
+        if popcount(read) != 1:
+            raise ValueError('square {} is not read by instance {} of '
+                             'pattern {}'.format(square, symmetry,
+                                                 PATTERNS[pattern][0]))
+        bits.append(read.bit_length() - 1)
+    size = 1 << max(bits) + 1
+    return [sum(3 ** digit for digit, bit in enumerate(bits)
+                if read >> bit & 1) for read in range(size)]
+
+
+def _swap_table(length: int) -> List[int]:
+    """
+    Build the table turning the index of an instance seen by one player into
+    the index seen by the other player: own and opponent digits are swapped
+    :param length: Number of squares of the pattern
+    :return:
+    """
+    table = [0]
+    for position in range(length):
+        # Indexes with a digit at this position extend the shorter ones
+        power = 3 ** position
+        table = table + [power * 2 + swapped for swapped in table] + \
+            [power + swapped for swapped in table]
+    return table
+
+
+def mirror_tables() -> List[List[List[int]]]:
+    """
+    Build, for each pattern, the tables turning an index into the index of
+    the same tokens read in mirrored order: the symmetries of the board
+    that keep the squares of the pattern but read them in another order
+    (edges and diagonals reversed, corners transposed). A weight table gives
+    the same value for every symmetric position only if each entry equals
+    the entries of its mirrored indexes.
+    :return: [pattern][mirror][index]
+    """
+    mirrors = []
+    for _, squares in PATTERNS:
+        bits = [1 << square for square in squares]
+        tables = []
+        for symmetry in range(1, 8):
+            moved = [transform(bit, symmetry) for bit in bits]
+            if sorted(moved) != sorted(bits) or moved == bits:
+                continue
+            table = [0]
+            for bit in moved:
+                power = 3 ** bits.index(bit)
+                table = [mirrored + value * power for value in range(3)
+                         for mirrored in table]
+            if table not in tables:
+                tables.append(table)
+        mirrors.append(tables)
+    return mirrors
+
+
+def symmetric_weights(weights: List[List[List[int]]]
+                      ) -> List[List[List[int]]]:
+    """
+    Average each weight with the weights of its mirrored indexes, so the
+    evaluation is the same for every symmetric position
+    :param weights: Pattern weights [phase][pattern][index]
+    :return: New weights
+    """
+    mirrors = mirror_tables()
+    result = []
+    for tables in weights:
+        phase = []
+        for table, pattern_mirrors in zip(tables, mirrors):
+            phase.append([
+                (value + sum(table[mirror[index]]
+                             for mirror in pattern_mirrors)) //
+                (len(pattern_mirrors) + 1)
+                for index, value in enumerate(table)])
+        result.append(phase)
+    return result
+
+
+def _digits(index: int, length: int) -> List[int]:
+    """
+    Split a base 3 index into its digits: 0 empty, 1 own, 2 opponent
+    :param index:
+    :param length:
+    :return:
+    """
+    digits = []
+    for _ in range(length):
+        digits.append(index % 3)
+        index //= 3
+    return digits
+
+
+def _edge_value(digits: List[int], player: int) -> int:
+    """
+    Hand tuned value of an edge for one player. Edge squares are good,
+    squares next to an empty corner are bad, and tokens connected to an own
+    corner can not be flipped anymore.
+    :param digits:
+    :param player:
+    :return:
+    """
+    value = 0
+    for square in range(1, 7):
+        if digits[square] != player:
+            continue
+        next_corner = 0 if square == 1 else 7 if square == 6 else None
+        if next_corner is not None and digits[next_corner] == 0:
+            value += X_SQUARE_REWARD
+        else:
+            value += EDGES_REWARD
+    # Stable tokens, in a line from an own corner
+    for corner, step in ((0, 1), (7, -1)):
+        square = corner
+        while 0 <= square < 8 and digits[square] == player:
+            value += EDGES_REWARD
+            square += step
+    return value
+
+
+def _corner_value(digits: List[int], player: int) -> int:
+    """
+    Hand tuned value of a corner region for one player. The corner is worth
+    a lot, and the diagonal square next to it is bad while the corner is
+    empty.
+    :param digits:
+    :param player:
+    :return:
+    """
+    value = 0
+    if digits[0] == player:
+        value += CORNER_REWARD
+    elif digits[0] == 0 and digits[4] == player:
+        value += 2 * X_SQUARE_REWARD
+    return value
+
+
+def _diagonal_value(digits: List[int], player: int) -> int:
+    """
+    Hand tuned value of a diagonal for one player. A token next to an empty
+    corner is very bad if the opponent can take the corner by flipping it.
+    :param digits:
+    :param player:
+    :return:
+    """
+    value = 0
+    opponent = 3 - player
+    for corner, step in ((0, 1), (7, -1)):
+        if digits[corner] != 0 or digits[corner + step] != player:
+            continue
+        square = corner + step
+        while 0 <= square < 8 and digits[square] == player:
+            square += step
+        if 0 <= square < 8 and digits[square] == opponent:
+            value += 3 * X_SQUARE_REWARD
+    return value
+
+
+def default_weights() -> Tuple[List[List[List[int]]], List[int], List[int]]:
+    """
+    Build the weights from the hand tuned values, the same for every phase
+    except for the tokens, which only count near the end of the game.
+    :return: (pattern weights [phase][pattern][index],
+    mobility weight of each phase, token weight of each phase)
+    """
+    rules = [_edge_value, _corner_value, _diagonal_value]
+    tables = []
+    for (_, squares), rule in zip(PATTERNS, rules):
+        table = []
+        for index in range(3 ** len(squares)):
+            digits = _digits(index, len(squares))
+            table.append(rule(digits, 1) - rule(digits, 2))
+        tables.append(table)
+    weights = [[table[:] for table in tables] for _ in range(NUM_PHASES)]
+    mobility = [-MOBILITY_PENALTY] * NUM_PHASES
+    discs = [0, 0, REWARD_SCORE_DIFF, 2 * REWARD_SCORE_DIFF]
+    return weights, mobility, discs
+
+
+class PatternEvaluator:
+    """
+    Evaluates positions from precomputed pattern weights.
+    Values are integers, which the null window of the pvs search relies on.
+    """
+
+    def __init__(self,
+                 weights: Optional[List[List[List[int]]]] = None,
+                 mobility: Optional[List[int]] = None,
+                 discs: Optional[List[int]] = None,
+                 revision: int = 0):
+        """
+        :param weights: Pattern weights [phase][pattern][index], the hand
+        tuned weights are used if None
+        :param mobility: Weight of each opponent reply, for each phase
+        :param discs: Weight of the token difference, for each phase
+        :param revision: Revision of the tuned weights, 0 if hand tuned
+        """
+        self.revision = revision
+        defaults = default_weights() if None in (weights, mobility, discs) \
+            else (weights, mobility, discs)
+        self.weights = weights if weights is not None else defaults[0]
+        self.mobility = mobility if mobility is not None else defaults[1]
+        self.discs = discs if discs is not None else defaults[2]
+        self.instances: List[Tuple[int, Callable[[int], int], List[int]]] = [
+            (pattern, extract, _index_table(pattern, symmetry, extract))
+            for pattern, symmetry, extract in INSTANCES
+        ]
+        """(pattern, function reading the tokens, index table)"""
+        self.patterns: List[int] = [pattern for pattern, _, _ in INSTANCES]
+        """Pattern of each instance"""
+        swaps = {length: _swap_table(length)
+                 for length in {len(squares) for _, squares in PATTERNS}}
+        self.swaps: List[List[int]] = [swaps[len(PATTERNS[pattern][1])]
+                                       for pattern in self.patterns]
+        """Table swapping the own and opponent digits of each instance"""
+        self.square_digits: List[List[Tuple[int, int]]] = [
+            [(instance, table[extract(1 << square)])
+             for instance, (_, extract, table) in enumerate(self.instances)
+             if extract(1 << square)]
+            for square in range(64)
+        ]
+        """
+        For each square, the instances it is part of and the value of its
+        digit, as (instance, 3 ** digit), to update indexes incrementally
+        """
+        self._value_bounds: Optional[Tuple[int, int]] = None
+        """Result of value_bounds, computed on the first call"""
+
+    def value_bounds(self) -> Tuple[int, int]:
+        """
+        Find values that evaluate can never go below or above, in any phase.
+        The opponent can have at most 60 replies, one per empty square, and
+        the token difference is at most 64. The bounds always include 0.
+        :return: (lowest value, highest value)
+        """
+        if self._value_bounds is None:
+            lowest = highest = 0
+            for phase in range(NUM_PHASES):
+                weights = self.weights[phase]
+                mobility = (0, self.mobility[phase] * 60)
+                discs = (-64 * self.discs[phase], 64 * self.discs[phase])
+                lowest = min(lowest, min(mobility) + min(discs) + sum(
+                    min(weights[pattern]) for pattern in self.patterns))
+                highest = max(highest, max(mobility) + max(discs) + sum(
+                    max(weights[pattern]) for pattern in self.patterns))
+            self._value_bounds = (lowest, highest)
+        return self._value_bounds
+
+    def pattern_indexes(self, own: int,
+                        other: int) -> List[Tuple[int, int]]:
+        """
+        Find the index of every pattern instance of a position
+        :param own:
+        :param other:
+        :return: List of (pattern, base 3 index)
+        """
+        return [(pattern, table[extract(own)] + 2 * table[extract(other)])
+                for pattern, extract, table in self.instances]
+
+    def evaluate(self, own: int, other: int, replies: int) -> int:
+        """
+        Evaluate a position for the player owning `own`, right after they
+        moved
+        :param own:
+        :param other:
+        :param replies: Number of moves the opponent can reply with
+        :return:
+        """
+        phase = game_phase(own | other)
+        weights = self.weights[phase]
+        value = self.mobility[phase] * replies + \
+            self.discs[phase] * (popcount(own) - popcount(other))
+        for pattern, extract, table in self.instances:
+            value += weights[pattern][table[extract(own)] +
+                                      2 * table[extract(other)]]
+        return value
+
+    def evaluate_indexes(self, indexes: List[int], player: int, own: int,
+                         other: int, replies: int) -> int:
+        """
+        Evaluate a position from the indexes kept by a PatternBoard. Gives
+        the same value as evaluate.
+        :param indexes: Index of every instance, seen by player 1
+        :param player: Player owning `own`, who just moved
+        :param own:
+        :param other:
+        :param replies: Number of moves the opponent can reply with
+        :return:
+        """
+        phase = game_phase(own | other)
+        weights = self.weights[phase]
+        value = self.mobility[phase] * replies + \
+            self.discs[phase] * (popcount(own) - popcount(other))
+        if player == 1:
+            for pattern, index in zip(self.patterns, indexes):
+                value += weights[pattern][index]
+        else:
+            for pattern, swap, index in zip(self.patterns, self.swaps,
+                                            indexes):
+                value += weights[pattern][swap[index]]
+        return value
+
+
+class PatternBoard(BitBoard):
+    """
+    A BitBoard that keeps the index of every pattern instance up to date as
+    moves are made and undone. Only the instances containing the placed and
+    flipped tokens change, so evaluating a position in the search only needs
+    the weight lookups.
+    """
+
+    __slots__ = ('evaluator', 'indexes')
+
+    def __init__(self, board: BitBoard, evaluator: PatternEvaluator):
+        """
+        Start tracking the patterns of a board
+        :param board: Board to copy
+        :param evaluator: Evaluator giving the instances and their digits
+        """
+        self.tokens = [board.tokens[0], board.tokens[1]]
+        self.hash_key = board.hash_key
+        self.undo_stack = []
+        self.evaluator = evaluator
+        self.indexes: List[int] = [
+            index for _, index in evaluator.pattern_indexes(*self.tokens)]
+        """Index of every instance, seen by player 1"""
+
+    def update_board(self, placed_position: Position,
+                     player: int) -> None:
+        """
+        Given a new position, update a board, flip tokens and update the
+        pattern indexes and the hash
+        :param placed_position:
+        :param player:
+        :return:
+        """
+        own = self.tokens[player - 1]
+        other = self.tokens[player % 2]
+        square = placed_position.square
+        flipped = find_flips(own, other, square)
+        self.tokens[player - 1] = own | flipped | (1 << square)
+        self.tokens[player % 2] = other & ~flipped
+
+        square_digits = self.evaluator.square_digits
+        # A new list, so make_move can keep the old one to undo the move
+        indexes = self.indexes[:]
+        for instance, power in square_digits[square]:
+            indexes[instance] += power * player
+        hash_key = self.hash_key ^ ZOBRIST_KEYS[player - 1][square]
+        # A flipped token goes from digit 2 to 1 for player 1, and from 1 to
+        # 2 for player 2
+        sign = 2 * player - 3
+        while flipped:
+            low_bit = flipped & -flipped
+            flipped_square = low_bit.bit_length() - 1
+            hash_key ^= FLIP_KEYS[flipped_square]
+            for instance, power in square_digits[flipped_square]:
+                indexes[instance] += sign * power
+            flipped ^= low_bit
+        self.hash_key = hash_key
+        self.indexes = indexes
+
+    def make_move(self, placed_position: Position, player: int) -> None:
+        """
+        Given a new position, update this board in place, so the move can be
+        undone with unmake_move.
+        :param placed_position:
+        :param player:
+        :return:
+        """
+        self.undo_stack.append(
+            (self.tokens[0], self.tokens[1], self.hash_key, self.indexes))
+        self.update_board(placed_position, player)
+
+    def unmake_move(self) -> None:
+        """
+        Undo the last move made with make_move.
+        :return:
+        """
+        self.tokens[0], self.tokens[1], self.hash_key, self.indexes = \
+            self.undo_stack.pop()
+
+    def evaluate(self, player: int, replies: int) -> int:
+        """
+        Evaluate the position for a player, right after they moved
+        :param player:
+        :param replies: Number of moves the opponent can reply with
+        :return:
+        """
+        return self.evaluator.evaluate_indexes(
+            self.indexes, player, self.tokens[player - 1],
+            self.tokens[player % 2], replies)
+
+
+def save_weights(path: str, evaluator: PatternEvaluator) -> None:
+    """
+    Write the weights of an evaluator to a file. The file is written next
+    to the old one and then renamed, so a player starting meanwhile never
+    reads half a file.
+    :param path:
+    :param evaluator:
+    :return:
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as weight_file:
+        weight_file.write(WEIGHTS_HEADER.pack(
+            WEIGHTS_MAGIC, WEIGHTS_VERSION, evaluator.revision, NUM_PHASES,
+            len(PATTERNS)))
+        for phase in range(NUM_PHASES):
+            array('i', [evaluator.mobility[phase],
+                        evaluator.discs[phase]]).tofile(weight_file)
+            for table in evaluator.weights[phase]:
+                array('i', table).tofile(weight_file)
+    os.replace(temp_path, path)
+
+
+def load_weights(path: str, symmetric: bool = False) -> PatternEvaluator:
+    """
+    Read an evaluator from a weight file
+    :param path:
+    :param symmetric: Check that mirrored indexes have the same weight, and
+    average them if not, see symmetric_weights. Files written before the
+    tuner kept its tables symmetric give mirrored positions different
+    values.
+    :return:
+    """
+    with open(path, 'rb') as weight_file:
+        data = weight_file.read()
+    magic, version, revision, phases, patterns = \
+        WEIGHTS_HEADER.unpack_from(data, 0)
+    if magic != WEIGHTS_MAGIC or version != WEIGHTS_VERSION \
+            or phases != NUM_PHASES or patterns != len(PATTERNS):
+        raise ValueError('{} is not a version {} weight file'.format(
+            path, WEIGHTS_VERSION))
+    values = array('i')
+    values.frombytes(data[WEIGHTS_HEADER.size:])
+    sizes = [3 ** len(squares) for _, squares in PATTERNS]
+    if len(values) != NUM_PHASES * (2 + sum(sizes)):
+        raise ValueError('{} is truncated'.format(path))
+    weights, mobility, discs = [], [], []
+    offset = 0
+    for _ in range(NUM_PHASES):
+        mobility.append(values[offset])
+        discs.append(values[offset + 1])
+        offset += 2
+        tables = []
+        for size in sizes:
+            tables.append(values[offset:offset + size].tolist())
+            offset += size
+        weights.append(tables)
+    if symmetric:
+        weights = symmetric_weights(weights)
+    return PatternEvaluator(weights, mobility, discs, revision)
+
+
+_default_evaluator: Optional[PatternEvaluator] = None
+"""Evaluator used by every player, built on first use"""
+
+
+def get_default_evaluator() -> PatternEvaluator:
+    """
+    Get the evaluator used by every player: the tuned weights of
+    WEIGHTS_PATH if the file exists, else the hand tuned weights. The
+    tables are built once per process and shared by every player. The
+    weights are made symmetric, as the evaluation cache shares one value
+    between the symmetric forms of a position.
+    :return:
+    """
+    global _default_evaluator
+    if _default_evaluator is None:
+        if os.path.exists(WEIGHTS_PATH):
+            _default_evaluator = load_weights(WEIGHTS_PATH, symmetric=True)
+        else:
+            _default_evaluator = PatternEvaluator()
+    return _default_evaluator
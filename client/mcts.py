@@ -0,0 +1,394 @@
+"""
+This file contains the Monte Carlo tree search (MCTS) of the player. Instead
+of evaluating positions, the search plays many quick games (playouts) from
+the positions of a tree and grows the tree towards the moves that win most
+often. Children are picked with UCT: their win rate plus a bonus for moves
+that were rarely tried.
+
+The tree is stored in a NodePool: one array per node field instead of one
+Python object per node, so it stays compact and can be copied quickly. The
+children of a node are added together, so they are stored next to each
+other and found from the first child and the number of children.
+
+The search can be stopped at any time and gives the root move that was
+tried the most. The tree is kept between turns: the position of the next
+turn is usually a grandchild of the previous root, and its subtree is reused.
+"""
+
+import math
+import random
+import time
+from array import array
+from typing import Dict, Optional, Tuple
+
+from bitboard import find_flips, find_moves, popcount
+
+DEFAULT_NODES = 1 << 18
+"""Default number of nodes the pool can hold"""
+EXPLORATION = 1.4
+"""Weight of the exploration bonus of UCT, about sqrt(2)"""
+PASS = -1
+"""Square of the move of a player who has to pass"""
+CORNER_MASK = 0x8100000000000081
+"""Corners, which playouts take whenever they can"""
+REUSE_PLIES = 2
+"""Depth below the old root at which the new position is looked for"""
+
+
+def playout(player_one: int,
+            player_two: int,
+            to_move: int,
+            rng: random.Random) -> int:
+    """
+    Play random moves until the end of the game. Corners are taken whenever
+    possible, which makes the results much closer to real games for almost
+    no cost.
+    :param player_one: Tokens of player 1
+    :param player_two: Tokens of player 2
+    :param to_move: Player to move
+    :param rng:
+    :return: Winner of the game, 0 for a draw
+    """
+    if to_move == 1:
+        own, other = player_one, player_two
+    else:
+        own, other = player_two, player_one
+    random = rng.random
+    passes = 0
+    while passes < 2:
+        moves = find_moves(own, other)
+        if moves:
+            passes = 0
+            if moves & CORNER_MASK:
+                moves &= CORNER_MASK
+            # Drop a random number of the lowest moves, and play the next one
+            for _ in range(int(random() * popcount(moves))):
+                moves &= moves - 1
+            placed = moves & -moves
+            flipped = find_flips(own, other, placed.bit_length() - 1)
+            own, other = other & ~flipped, own | flipped | placed
+        else:
+            passes += 1
+            own, other = other, own
+        to_move = to_move % 2 + 1
+    difference = popcount(own) - popcount(other)
+    if not difference:
+        return 0
+    return to_move if difference > 0 else to_move % 2 + 1
+
+
+class NodePool:
+    """
+    The nodes of a search tree, stored as one array per field. A node is an
+    index into the arrays.
+    """
+
+    def __init__(self, max_nodes: int = DEFAULT_NODES):
+        """
+        :param max_nodes: Number of nodes the pool can hold
+        """
+        self.max_nodes = max_nodes
+        self.size = 0
+        """Number of nodes in use"""
+        self.player_one = array('Q', bytes(8 * max_nodes))
+        """Tokens of player 1 in the position of each node"""
+        self.player_two = array('Q', bytes(8 * max_nodes))
+        """Tokens of player 2 in the position of each node"""
+        self.to_move = array('b', bytes(max_nodes))
+        """Player to move in the position of each node"""
+        self.square = array('b', bytes(max_nodes))
+        """Square of the move leading to each node, PASS for a pass"""
+        self.parent = array('i', bytes(4 * max_nodes))
+        """Parent of each node, -1 for the root"""
+        self.first_child = array('i', bytes(4 * max_nodes))
+        """First child of each node, -1 if it was not expanded yet"""
+        self.child_count = array('i', bytes(4 * max_nodes))
+        """Number of children, 0 for an expanded node ending the game"""
+        self.visits = array('i', bytes(4 * max_nodes))
+        """Number of playouts through each node"""
+        self.wins = array('d', bytes(8 * max_nodes))
+        """
+        Playouts won by the player who made the move of each node, draws
+        counting half
+        """
+
+    def __len__(self) -> int:
+        """
+        Number of nodes in use
+        :return:
+        """
+        return self.size
+
+    def clear(self) -> None:
+        """
+        Remove all nodes. The arrays are kept and overwritten.
+        :return:
+        """
+        self.size = 0
+
+    def add(self, parent: int, square: int, player_one: int,
+            player_two: int, to_move: int) -> int:
+        """
+        Add a node that was not expanded or visited yet
+        :param parent: -1 for a root
+        :param square: Square of the move leading to the node
+        :param player_one:
+        :param player_two:
+        :param to_move:
+        :return: The new node
+        """
+        node = self.size
+        self.player_one[node] = player_one
+        self.player_two[node] = player_two
+        self.to_move[node] = to_move
+        self.square[node] = square
+        self.parent[node] = parent
+        self.first_child[node] = -1
+        self.child_count[node] = 0
+        self.visits[node] = 0
+        self.wins[node] = 0.0
+        self.size = node + 1
+        return node
+
+    def expand(self, node: int) -> bool:
+        """
+        Add a child for every move of the player to move, or a single pass
+        child if they have no moves but the opponent has
+        :param node:
+        :return: False if the pool is too full to hold the children
+        """
+        to_move = self.to_move[node]
+        opponent = to_move % 2 + 1
+        tokens = (self.player_one[node], self.player_two[node])
+        own = tokens[to_move - 1]
+        other = tokens[to_move % 2]
+        moves = find_moves(own, other)
+        if not moves:
+            if not find_moves(other, own):
+                # End of the game
+                self.first_child[node] = self.size
+                self.child_count[node] = 0
+                return True
+            if self.size >= self.max_nodes:
+                return False
+            self.first_child[node] = self.size
+            self.child_count[node] = 1
+            self.add(node, PASS, tokens[0], tokens[1], opponent)
+            return True
+
+        count = popcount(moves)
+        if self.size + count > self.max_nodes:
+            return False
+        self.first_child[node] = self.size
+        self.child_count[node] = count
+        while moves:
+            placed = moves & -moves
+            square = placed.bit_length() - 1
+            flipped = find_flips(own, other, square)
+            new_own = own | flipped | placed
+            new_other = other & ~flipped
+            if to_move == 1:
+                self.add(node, square, new_own, new_other, opponent)
+            else:
+                self.add(node, square, new_other, new_own, opponent)
+            moves ^= placed
+        return True
+
+    def children(self, node: int) -> range:
+        """
+        Children of an expanded node
+        :param node:
+        :return:
+        """
+        first = self.first_child[node]
+        return range(first, first + self.child_count[node]) \
+            if first >= 0 else range(0)
+
+    def copy_subtree(self, root: int) -> "NodePool":
+        """
+        Copy the subtree of a node into a new pool of the same size, with
+        the node as its root
+        :param root:
+        :return:
+        """
+        pool = NodePool(self.max_nodes)
+        pool.add(-1, self.square[root], self.player_one[root],
+                 self.player_two[root], self.to_move[root])
+        pool.visits[0] = self.visits[root]
+        pool.wins[0] = self.wins[root]
+        # Children are copied together, so they stay next to each other
+        queue = [(root, 0)]
+        for old, new in queue:
+            if self.first_child[old] < 0:
+                continue
+            pool.first_child[new] = pool.size
+            pool.child_count[new] = self.child_count[old]
+            for child in self.children(old):
+                copied = pool.add(new, self.square[child],
+                                  self.player_one[child],
+                                  self.player_two[child],
+                                  self.to_move[child])
+                pool.visits[copied] = self.visits[child]
+                pool.wins[copied] = self.wins[child]
+                queue.append((child, copied))
+        return pool
+
+
+class MctsSearch:
+    """
+    Monte Carlo tree search with UCT, keeping its tree between turns.
+    """
+
+    def __init__(self,
+                 max_nodes: int = DEFAULT_NODES,
+                 exploration: float = EXPLORATION,
+                 seed: Optional[int] = None):
+        """
+        :param max_nodes: Number of nodes the tree can hold. Once full, the
+        tree stops growing but the playouts go on.
+        :param exploration: Weight of the exploration bonus
+        :param seed: Seed of the playouts, for repeatable searches
+        """
+        self.pool = NodePool(max_nodes)
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.root: int = -1
+        """Node of the position being searched, -1 if there is none"""
+        self.playouts: int = 0
+        """Number of playouts of the last search"""
+        self.reused: int = 0
+        """Playouts of the root that were kept from the previous turns"""
+
+    def set_position(self, player_one: int, player_two: int,
+                     to_move: int) -> None:
+        """
+        Set the position to search. If it is in the tree, at most
+        REUSE_PLIES below the current root, its subtree is kept.
+        :param player_one:
+        :param player_two:
+        :param to_move:
+        :return:
+        """
+        pool = self.pool
+        found = -1
+        if self.root >= 0:
+            level = [self.root]
+            for _ in range(REUSE_PLIES + 1):
+                for node in level:
+                    if pool.player_one[node] == player_one and \
+                            pool.player_two[node] == player_two and \
+                            pool.to_move[node] == to_move:
+                        found = node
+                        break
+                if found >= 0:
+                    break
+                level = [child for node in level
+                         for child in pool.children(node)]
+
+        if found < 0:
+            pool.clear()
+            self.root = pool.add(-1, PASS, player_one, player_two, to_move)
+        elif pool.size > pool.max_nodes // 2:
+            # Only keep the subtree, so the tree has room to grow again
+            self.pool = pool.copy_subtree(found)
+            self.root = 0
+        else:
+            self.root = found
+        self.reused = self.pool.visits[self.root]
+
+    def search(self,
+               deadline: Optional[float] = None,
+               max_playouts: Optional[int] = None) -> int:
+        """
+        Run playouts from the root until the deadline passes or max_playouts
+        were played. At least one playout is always played.
+        :param deadline: Time (from time.monotonic) at which to stop
+        :param max_playouts:
+        :return: Number of playouts played
+        """
+        if self.root < 0:
+            raise ValueError('No position to search, call set_position')
+        pool = self.pool
+        root = self.root
+        to_move = pool.to_move
+        visits = pool.visits
+        wins = pool.wins
+        parent = pool.parent
+        first_child = pool.first_child
+        child_count = pool.child_count
+        exploration = self.exploration
+        rng = self.rng
+        self.playouts = 0
+
+        while True:
+            # Selection: follow the best children down to a leaf
+            node = root
+            while first_child[node] >= 0 and child_count[node]:
+                first = first_child[node]
+                log_visits = math.log(visits[node])
+                best_score = -1.0
+                for child in range(first, first + child_count[node]):
+                    child_visits = visits[child]
+                    if not child_visits:
+                        # Try every move once before comparing them
+                        node = child
+                        break
+                    score = wins[child] / child_visits + exploration * \
+                        math.sqrt(log_visits / child_visits)
+                    if score > best_score:
+                        best_score = score
+                        best = child
+                else:
+                    node = best
+                    continue
+                break
+
+            # Expansion: a leaf gets children once it was visited
+            if first_child[node] < 0 and (visits[node] or node == root) \
+                    and pool.expand(node) and child_count[node]:
+                node = first_child[node]
+
+            winner = playout(pool.player_one[node], pool.player_two[node],
+                             to_move[node], rng)
+
+            # Back up the result, for the player who made each move
+            while node != root:
+                up = parent[node]
+                visits[node] += 1
+                if winner == to_move[up]:
+                    wins[node] += 1.0
+                elif not winner:
+                    wins[node] += 0.5
+                node = up
+            visits[root] += 1
+
+            self.playouts += 1
+            if max_playouts is not None and self.playouts >= max_playouts:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        return self.playouts
+
+    def root_stats(self) -> Dict[int, Tuple[int, float]]:
+        """
+        Playouts and wins of each move of the root
+        :return: Maps squares to (visits, wins)
+        """
+        pool = self.pool
+        return {pool.square[child]: (pool.visits[child], pool.wins[child])
+                for child in pool.children(self.root)}
+
+    def best_move(self) -> Tuple[int, float]:
+        """
+        The root move that was tried the most, which is more reliable than
+        the one with the best win rate
+        :return: (square, win rate of the move)
+        """
+        pool = self.pool
+        children = pool.children(self.root)
+        if not children:
+            raise ValueError('The root was not expanded')
+        best = max(children, key=lambda child: pool.visits[child])
+        win_rate = pool.wins[best] / pool.visits[best] \
+            if pool.visits[best] else 0.0
+        return pool.square[best], win_rate
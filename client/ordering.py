@@ -0,0 +1,159 @@
+"""
+This file contains the move ordering of the pruning searches. Alpha-beta
+only cuts off replies once a good enough one was searched, so searching the
+best replies first decides how much of the tree is skipped.
+
+Replies are searched in this order:
+- the best reply stored in the transposition table (the hash move),
+- corners,
+- moves that caused a cutoff at the same ply (killer moves),
+- then by the square they are played on (the squares next to an empty
+  corner last) plus how often they caused cutoffs anywhere in the tree
+  (the history table).
+Near the root, where the subtrees are the largest, moves leaving the
+opponent the fewest replies are also preferred.
+"""
+
+from typing import List, Optional
+
+from bitboard import count_moves, find_flips, position_to_square
+from support import Position
+
+SQUARE_VALUES: List[int] = [
+    100, -20, 10, 5, 5, 10, -20, 100,
+    -20, -50, -2, -2, -2, -2, -50, -20,
+    10, -2, 1, 1, 1, 1, -2, 10,
+    5, -2, 1, 0, 0, 1, -2, 5,
+    5, -2, 1, 0, 0, 1, -2, 5,
+    10, -2, 1, 1, 1, 1, -2, 10,
+    -20, -50, -2, -2, -2, -2, -50, -20,
+    100, -20, 10, 5, 5, 10, -20, 100,
+]
+"""Static ordering value of each square"""
+HASH_MOVE_BONUS = 1 << 30
+"""Added to the hash move, so it is always searched first"""
+CORNER_BONUS = 1 << 25
+"""Added to the corners, so they come right after the hash move"""
+CORNER_SQUARES = (0, 7, 56, 63)
+KILLER_BONUS = 1 << 20
+"""Added to the killer moves, so they come right after the corners"""
+KILLERS_PER_PLY = 2
+"""Number of killer moves kept for each ply"""
+MAX_PLY = 64
+"""Deepest ply killer moves are kept for"""
+MOBILITY_PLIES = 2
+"""Plies from the root at which the replies of each move are counted"""
+MOBILITY_MIN_REMAINING = 3
+"""Remaining depth below which counting replies is not worth its cost"""
+MOBILITY_WEIGHT = 1 << 10
+"""Ordering value lost for each reply left to the opponent"""
+HISTORY_LIMIT = 1 << 18
+"""
+History value at which the whole table is halved, so that it stays below
+the killer bonus
+"""
+
+
+class MoveOrdering:
+    """
+    Killer moves and history table, kept between searches.
+    """
+
+    def __init__(self):
+        self.killers: List[List[int]] = [[] for _ in range(MAX_PLY + 1)]
+        """Squares of the last moves that caused a cutoff at each ply"""
+        self.history: List[List[int]] = [[0] * 64 for _ in range(2)]
+        """Cutoff credit of each (player - 1, square) pair"""
+
+    def clear(self) -> None:
+        """
+        Forget all killer moves and history
+        :return:
+        """
+        self.killers = [[] for _ in range(MAX_PLY + 1)]
+        self.history = [[0] * 64 for _ in range(2)]
+
+    def new_search(self, plies: int = 2) -> None:
+        """
+        Prepare for the search of the next turn. The root moved by plies, so
+        the killer moves move up as many plies, and the history is halved
+        so recent searches count more.
+        :param plies: Moves played since the last search
+        :return:
+        """
+        self.killers = self.killers[plies:] + [[] for _ in range(plies)]
+        for squares in self.history:
+            for square in range(64):
+                squares[square] >>= 1
+
+    def order(self,
+              moves: List[Position],
+              tokens: List[int],
+              player: int,
+              ply: int,
+              remaining: int,
+              hash_move: Optional[Position] = None) -> List[Position]:
+        """
+        Sort moves so the most promising ones come first
+        :param moves: Moves of player
+        :param tokens: Bitboard of each player before the moves
+        :param player: Player making the moves
+        :param ply: Depth of the moves from the root, 0 for the root moves
+        :param remaining: Depth left to search after the moves
+        :param hash_move: Best move from the transposition table, if any
+        :return: The same moves, sorted
+        """
+        if len(moves) < 2:
+            return moves
+        hash_square = position_to_square(hash_move) \
+            if hash_move is not None else -1
+        killers = self.killers[ply] if ply <= MAX_PLY else []
+        history = self.history[player - 1]
+        count_replies = ply <= MOBILITY_PLIES and \
+            remaining >= MOBILITY_MIN_REMAINING
+        own = tokens[player - 1]
+        other = tokens[player % 2]
+
+        def score(move: Position) -> int:
+            square = move.square
+            if square == hash_square:
+                return HASH_MOVE_BONUS
+            value = SQUARE_VALUES[square] + history[square]
+            if square in CORNER_SQUARES:
+                value += CORNER_BONUS
+            if square in killers:
+                value += KILLER_BONUS
+            if count_replies:
+                flipped = find_flips(own, other, square)
+                value -= MOBILITY_WEIGHT * count_moves(
+                    other & ~flipped, own | flipped | (1 << square))
+            return value
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def record_cutoff(self,
+                      move: Position,
+                      player: int,
+                      ply: int,
+                      remaining: int) -> None:
+        """
+        Credit a move that caused a cutoff
+        :param move:
+        :param player: Player who made the move
+        :param ply: Depth of the move from the root
+        :param remaining: Depth left to search after the move
+        :return:
+        """
+        square = move.square
+        if ply <= MAX_PLY:
+            killers = self.killers[ply]
+            if square not in killers:
+                killers.insert(0, square)
+                del killers[KILLERS_PER_PLY:]
+        history = self.history[player - 1]
+        history[square] += (remaining + 1) * (remaining + 1)
+        if history[square] >= HISTORY_LIMIT:
+            for squares in self.history:
+                for index in range(64):
+                    squares[index] >>= 1
@@ -0,0 +1,149 @@
+"""
+This file contains the process pool used to search root moves on several
+cores. The pool is started once per client process and reused every turn.
+The Monte Carlo tree search runs a whole search in every worker instead, and
+the visits of the root moves are added up (root parallelization).
+"""
+
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional, Tuple
+
+_pool: Optional[ProcessPoolExecutor] = None
+"""Pool shared by every player in this process"""
+_pool_workers: int = 0
+"""Number of workers in the shared pool"""
+_worker_tables: Dict[Tuple[int, str], object] = {}
+"""
+Transposition tables of a worker, kept between tasks.
+Values depend on the player and algorithm, so each pair has its own table.
+"""
+_worker_generations: Dict[Tuple[int, str], int] = {}
+"""Search generation of the last task of each worker table"""
+_worker_searches: Dict[int, object] = {}
+"""Monte Carlo searches of a worker by player, kept to reuse their trees"""
+
+
+class SearchTask(NamedTuple):
+    """
+    A root move to search, in a compact form that is cheap to send to a
+    worker process.
+    """
+
+    player_one: int
+    """Tokens of player 1 as a bitboard"""
+    player_two: int
+    """Tokens of player 2 as a bitboard"""
+    player_num: int
+    """Player making the move"""
+    square: int
+    """Square index (0-63) of the move"""
+    search_depth: int
+    """Depth to search the move to"""
+    algorithm: str
+    """Search algorithm, from player.ALGORITHMS"""
+    deadline: Optional[float]
+    """Time (from time.monotonic) at which the search must stop"""
+    generation: int = 0
+    """
+    Search the move is part of, the generation of the player's table. A
+    new generation starts a new search of the worker's table, so entries
+    of older searches are replaced first.
+    """
+
+
+class MctsTask(NamedTuple):
+    """
+    A position to search with the Monte Carlo tree search in a worker.
+    """
+
+    player_one: int
+    """Tokens of player 1 as a bitboard"""
+    player_two: int
+    """Tokens of player 2 as a bitboard"""
+    player_num: int
+    """Player making the move"""
+    seed: int
+    """Seed of the playouts, different for every worker"""
+    deadline: Optional[float]
+    """Time (from time.monotonic) at which the search must stop"""
+    max_playouts: Optional[int] = None
+    """Number of playouts after which the search stops, if any"""
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Get the shared process pool, starting it on the first call.
+    :param workers: Number of worker processes
+    :return:
+    """
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """
+    Stop the shared process pool, if it was started.
+    :return:
+    """
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+    _pool = None
+    _pool_workers = 0
+
+
+atexit.register(shutdown_pool)
+
+
+def search_task(task: SearchTask) -> Optional[Tuple[float, int, bool]]:
+    """
+    Search a single root move. Runs inside a worker process.
+    :param task:
+    :return: (value, nodes searched, depth limited), or None on timeout
+    """
+    # Imported here, as the player imports this module
+    from bitboard import BitBoard, square_to_position
+    from player import Player, SearchTimeout
+    from transposition import TranspositionTable
+
+    table_key = (task.player_num, task.algorithm)
+    if table_key not in _worker_tables:
+        _worker_tables[table_key] = TranspositionTable()
+    if _worker_generations.get(table_key) != task.generation:
+        _worker_tables[table_key].new_search()
+        _worker_generations[table_key] = task.generation
+
+    board = BitBoard.from_bits(task.player_one, task.player_two)
+    player = Player(board, task.player_num, algorithm=task.algorithm,
+                    transposition_table=_worker_tables[table_key])
+    player.search_depth = task.search_depth
+    player.deadline = task.deadline
+    try:
+        value = player.search_move(square_to_position(task.square))
+    except SearchTimeout:
+        return None
+    return value, player.nodes, player.depth_limited
+
+
+def mcts_task(task: MctsTask) -> Tuple[Dict[int, Tuple[int, float]], int]:
+    """
+    Search a position with the Monte Carlo tree search. Runs inside a
+    worker process, which keeps its tree for the next turn.
+    :param task:
+    :return: ((visits, wins) of each root move by square, playouts played)
+    """
+    # Imported here, as the player imports this module
+    from mcts import MctsSearch
+
+    if task.player_num not in _worker_searches:
+        _worker_searches[task.player_num] = MctsSearch()
+    search = _worker_searches[task.player_num]
+    search.rng.seed(task.seed)
+    search.set_position(task.player_one, task.player_two, task.player_num)
+    playouts = search.search(task.deadline, task.max_playouts)
+    return search.root_stats(), playouts
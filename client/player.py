@@ -1,163 +1,1053 @@
-from support import Board, Position
-from typing import List, Tuple
+import random
+import time
+from support import Board, Position, SearchTimeout
+from bitboard import (BitBoard, position_to_square, square_to_position,
+                      popcount, iter_squares, SQUARE_POSITIONS)
+from cache import PositionCache
+from endgame import EndgameSolver, ENDGAME_EMPTIES
+from evaluation import PatternBoard, PatternEvaluator, get_default_evaluator
+from mcts import MctsSearch
+from ordering import MoveOrdering
+import parallel
+from telemetry import MoveLog, branching_factor
+from transposition import (TranspositionTable, position_key, EXACT, LOWER,
+                           UPPER, FULL_DEPTH)
+from typing import List, Optional, Tuple, Union
 
 MAX_DEPTH: int = 10
-CORNERS = [
-    Position(0, 0),
-    Position(0, 7),
-    Position(7, 7),
-    Position(7, 0)
-]
-X_SQUARES = [
-    Position(1, 0),
-    Position(1, 1),
-    Position(0, 1),
-    Position(6, 1),
-    Position(6, 0),
-    Position(7, 1),
-    Position(0, 6),
-    Position(1, 6),
-    Position(1, 7),
-    Position(6, 6),
-    Position(6, 7),
-    Position(7, 6)
-]
-EDGES = [Position(row, col) for row in range(0, 7) for col in [0, 7]] + [
-    Position(row, col) for row in [0, 7] for col in range(0, 7)]
-CORNER_REWARD = 100
-X_SQUARE_REWARD = -10
-EDGES_REWARD = 5
-NUM_MOVES_MULTIPLIER = 5
-REWARD_SCORE_DIFF = 2
+DEFAULT_TURN_TIME: int = 1000
+"""Turn time in milliseconds used when the server does not provide one"""
+TURN_TIME_FRACTION = 0.75
+"""Fraction of the turn time the search may use, the rest is a safety margin"""
+TIME_CHECK_INTERVAL = 256
+"""Number of nodes searched between two checks of the clock"""
+ALGORITHMS = ['expectimax', 'alphabeta', 'negamax', 'pvs']
+"""
+Search algorithms the player can use.
+expectimax assumes a random opponent, the others assume the opponent plays
+the move that is worst for the bot and can therefore prune the tree.
+"""
+MODES = ALGORITHMS + ['mcts']
+"""
+Ways the player can find its moves: one of the search algorithms, or the
+Monte Carlo tree search of mcts.py, which does not use max_depth
+"""
+INFINITY = float('inf')
+STAR_MARGIN = 1e-6
+"""
+Widening of the windows of the moves of the random opponent, larger than
+any rounding error of their average
+"""
 
 
 class Player:
     """
     The player class is the 'brains' of the operation.
-    It will hold the board information and decide where to place pieces next
+    It will hold the board information and decide where to place pieces next.
+    The board can either be a Board or a BitBoard, as both expose the same
+    find_valid, create_updated_board and score functions. A Board is
+    converted to a BitBoard, as it is much faster to search.
     """
 
-    def __init__(self, board: Board, player_number: int):
-        self.board = board
+    def __init__(self,
+                 board: Union[Board, BitBoard],
+                 player_number: int,
+                 max_depth: int = MAX_DEPTH,
+                 algorithm: str = 'expectimax',
+                 transposition_table: Optional[TranspositionTable] = None,
+                 use_transposition_table: bool = True,
+                 workers: int = 0,
+                 book=None,
+                 endgame_empties: int = ENDGAME_EMPTIES,
+                 evaluator: Optional[PatternEvaluator] = None,
+                 telemetry: Optional[MoveLog] = None,
+                 ordering: Optional[MoveOrdering] = None,
+                 eval_cache: Optional[PositionCache] = None,
+                 mcts: Optional[MctsSearch] = None,
+                 chance_pruning: bool = True):
+        if algorithm not in MODES:
+            raise ValueError('Unknown search algorithm {!r}'.format(algorithm))
+        self.board = board if isinstance(board, BitBoard) \
+            else BitBoard.from_board(board)
         self.player_num = player_number
+        self.max_depth = max_depth
+        self.algorithm = algorithm
+        self.workers = workers
+        """Number of processes searching the root moves, 0 to search here"""
+        self.chance_pruning = chance_pruning
+        """Prune the moves of the random opponent in expectimax"""
+        self.book = book
+        """Opening book (book.OpeningBook) checked before searching"""
+        self.endgame_empties = endgame_empties
+        """Number of empty squares at which the endgame solver is used"""
+        self.solver = EndgameSolver()
+        self.evaluator = evaluator if evaluator is not None \
+            else get_default_evaluator()
+        """Pattern evaluation of the positions reached by the bot's moves"""
+        self.telemetry = telemetry
+        """Log receiving a line of search statistics after each move"""
+        self.ordering = ordering if ordering is not None else MoveOrdering()
+        """Killer moves and history of the pruning searches"""
+        self.eval_cache = eval_cache
+        """Evaluations of positions already seen, if any"""
+        self.mcts = mcts if mcts is not None or algorithm != 'mcts' \
+            else MctsSearch()
+        """Monte Carlo tree search of the mcts mode, kept between turns"""
+        self.search_board: Optional[PatternBoard] = None
+        """
+        Copy of the board searched with make_move and unmake_move, keeping
+        the pattern indexes up to date
+        """
+        self.table: Optional[TranspositionTable] = None
+        """Transposition table shared by all positions of the search"""
+        if use_transposition_table:
+            self.table = transposition_table if transposition_table \
+                is not None else TranspositionTable()
         self.fringe: List[Tuple[float, Position]]
 
-    def get_move(self) -> list:
+        self.search_depth: int = 0
+        """Depth of the current iteration of the search"""
+        self.depth_limited: bool = False
+        """True if the current iteration was cut short by search_depth"""
+        self.deadline: Optional[float] = None
+        """Time (from time.monotonic) at which the search must stop"""
+        self.nodes: int = 0
+        """Number of nodes searched this turn"""
+        self.completed_depth: int = 0
+        """Depth of the last completed iteration of the search"""
+        self.evaluations: int = 0
+        """Number of positions evaluated this turn"""
+        self.cutoffs: int = 0
+        """Number of cutoffs this turn"""
+        self.iterations: List[dict] = []
+        """Depth, time in ms and nodes of each completed iteration"""
+        self.best_value: Optional[float] = None
+        """Value of the move found by the last completed iteration"""
+        self.source: Optional[str] = None
+        """How the last move was found, see _find_move"""
+
+    def set_board(self, board: Union[Board, BitBoard]) -> None:
+        """
+        Set the board for the next search. The transposition table is kept,
+        so a player can be reused for every turn of a game.
+        :param board:
+        :return:
+        """
+        self.board = board if isinstance(board, BitBoard) \
+            else BitBoard.from_board(board)
+
+    def get_move(self, max_turn_time: Optional[int] = None) -> list:
         """
         Get move will determine the next move for the player.
-        This will be done using the heuristics below.
+        This will be done using an iterative deepening search: the tree is
+        searched to depth 1, 2, 3... and the best move of the last completed
+        depth is kept. The search stops before the turn time runs out.
+        :param max_turn_time: Time allowed for the turn in milliseconds
+        :return:
+        """
+        start = time.monotonic()
+        table_probes = (self.table.hits, self.table.misses) \
+            if self.table is not None else (0, 0)
+        self.nodes = self.evaluations = self.cutoffs = 0
+        self.completed_depth = 0
+        self.iterations = []
+        self.best_value = None
+        move, self.source = self._find_move(max_turn_time)
+        if self.telemetry is not None:
+            self.telemetry.write(self.move_record(
+                move, self.source, time.monotonic() - start, table_probes,
+                max_turn_time))
+        return [move.row, move.column]
+
+    def _find_move(self,
+                   max_turn_time: Optional[int]) -> Tuple[Position, str]:
+        """
+        Find the move with the opening book, the endgame solver or the
+        search, in that order.
+        :param max_turn_time: Time allowed for the turn in milliseconds
+        :return: (move, 'book', 'endgame', 'mcts' or 'search')
+        """
+        # Positions in the opening book do not need a search
+        if self.book is not None:
+            book_move = self.book.lookup(self.board, self.player_num)
+            if book_move is not None:
+                return book_move, 'book'
+
+        if max_turn_time is None:
+            max_turn_time = DEFAULT_TURN_TIME
+        budget = max_turn_time / 1000 * TURN_TIME_FRACTION
+        self.deadline = time.monotonic() + budget
+
+        # Near the end of the game, solve it exactly. The solver gets half
+        # of the time, and the normal search is used if it runs out
+        tokens = self.board.tokens
+        if 64 - popcount(tokens[0] | tokens[1]) <= self.endgame_empties:
+            self.solver.deadline = time.monotonic() + budget / 2
+            self.solver.nodes = 0
+            try:
+                square, value = self.solver.best_move(
+                    tokens[self.player_num - 1], tokens[self.player_num % 2])
+                if square is not None:
+                    self.best_value = value
+                    return square_to_position(square), 'endgame'
+            except SearchTimeout:
+                pass
+
+        if self.algorithm == 'mcts':
+            return self.mcts_move(), 'mcts'
+        if self.table is not None:
+            self.table.new_search()
+        self.ordering.new_search()
+        return self.iterative_deepening(), 'search'
+
+    def move_record(self,
+                    move: Position,
+                    source: str,
+                    seconds: float,
+                    table_probes: Tuple[int, int] = (0, 0),
+                    max_turn_time: Optional[int] = None) -> dict:
         """
+        Describe how the last move was found, for the telemetry.
+        :param move: Move played
+        :param source: 'book', 'endgame', 'mcts' or 'search'
+        :param seconds: Time taken by the turn
+        :param table_probes: Hits and misses of the transposition table
+        before the turn
+        :param max_turn_time: Time allowed for the turn in milliseconds
+        :return:
+        """
+        hits = misses = 0
+        if self.table is not None:
+            hits = self.table.hits - table_probes[0]
+            misses = self.table.misses - table_probes[1]
+        # The solver counts its own nodes
+        nodes = self.solver.nodes if source == 'endgame' else self.nodes
+        tokens = self.board.tokens
+        return {
+            'player': self.player_num,
+            'algorithm': self.algorithm,
+            'empties': 64 - popcount(tokens[0] | tokens[1]),
+            'source': source,
+            'move': [move.row, move.column],
+            'value': self.best_value,
+            'ms': round(seconds * 1000, 3),
+            'max_turn_time': max_turn_time,
+            'depth': self.completed_depth,
+            'nodes': nodes,
+            'nodes_per_second': round(nodes / max(seconds, 1e-9)),
+            'evaluations': self.evaluations,
+            'cutoffs': self.cutoffs,
+            'tt_hits': hits,
+            'tt_probes': hits + misses,
+            'iterations': self.iterations,
+            'branching_factor': branching_factor(self.iterations),
+            'pv': [[pv_move.row, pv_move.column]
+                   for pv_move in self.principal_variation(move)],
+        }
+
+    def principal_variation(self, move: Position) -> List[Position]:
+        """
+        Follow the best replies stored in the transposition table from the
+        move played, up to the depth of the last completed iteration.
+        Expectimax does not store best replies, so its variation is only the
+        move itself.
+        :param move: First move of the variation
+        :return:
+        """
+        variation = [move]
+        if self.table is None:
+            return variation
+        board = self.board.copy()
+        player = self.player_num
+        board.update_board(move, player)
+        while len(variation) < self.completed_depth:
+            player = player % 2 + 1
+            moves = board.valid_mask(player)
+            if not moves:
+                player = player % 2 + 1
+                moves = board.valid_mask(player)
+                if not moves:
+                    break
+            entry = self.table.probe(position_key(board.hash_key, player))
+            if entry is None or entry.best_move is None or \
+                    not moves >> position_to_square(entry.best_move) & 1:
+                break
+            variation.append(entry.best_move)
+            board.update_board(entry.best_move, player)
+        return variation
+
+    def mcts_move(self) -> Position:
+        """
+        Find the move with the Monte Carlo tree search, playing out games
+        until the deadline. With workers, every worker searches its own tree
+        and the playouts of each root move are added up. The playouts are
+        counted as the nodes, and the value is the win rate of the move.
+        :return:
+        """
+        tokens = self.board.tokens
+        if self.workers:
+            pool = parallel.get_pool(self.workers)
+            tasks = [parallel.MctsTask(tokens[0], tokens[1], self.player_num,
+                                       random.getrandbits(32), self.deadline)
+                     for _ in range(self.workers)]
+            stats = {}
+            for root_stats, playouts in pool.map(parallel.mcts_task, tasks):
+                self.nodes += playouts
+                for square, (visits, wins) in root_stats.items():
+                    total_visits, total_wins = stats.get(square, (0, 0.0))
+                    stats[square] = (total_visits + visits, total_wins + wins)
+            square = max(stats, key=lambda move: stats[move][0])
+            visits, wins = stats[square]
+            self.best_value = wins / visits if visits else 0.0
+        else:
+            self.mcts.set_position(tokens[0], tokens[1], self.player_num)
+            self.nodes = self.mcts.search(self.deadline)
+            square, self.best_value = self.mcts.best_move()
+        return SQUARE_POSITIONS[square]
+
+    def iterative_deepening(self) -> Position:
+        """
+        Search the tree to depth 1, 2, 3... until max_depth, the whole tree
+        is searched or the deadline passes.
+        :return: Best move of the last completed depth
+        """
+        self.nodes = self.evaluations = self.cutoffs = 0
+        self.completed_depth = 0
+        self.iterations = []
+        self.best_value = None
+        start = time.monotonic()
+
         # Get all possible locations for next move.
-        # Add a value to the possible location to determine which is best
-        fringe = [[0, pos] for pos in self.board.find_valid(self.player_num)]
+        moves = list(self.board.find_valid(self.player_num))
+        if self.algorithm != 'expectimax':
+            moves = self.ordering.order(moves, self.board.tokens,
+                                        self.player_num, 0, self.max_depth)
+        best_move = moves[0]
+
+        for depth in range(1, self.max_depth + 1):
+            self.search_depth = depth
+            self.depth_limited = False
+            # Add a value to the possible location to determine which is best
+            try:
+                fringe = self.search_root(moves)
+            except SearchTimeout:
+                # Keep the move from the last completed depth
+                break
+            self.best_value, best_move = max(fringe, key=lambda x: x[0])
+            if self.algorithm != 'expectimax':
+                # The best moves of this depth are searched first next time
+                moves = [move for _, move in sorted(
+                    fringe, key=lambda x: x[0], reverse=True)]
+            self.completed_depth = depth
+            searched = self.nodes - sum(iteration['nodes']
+                                        for iteration in self.iterations)
+            self.iterations.append({
+                'depth': depth,
+                'ms': round((time.monotonic() - start) * 1000, 3),
+                'nodes': searched})
+            # Searching deeper will not change anything if the whole tree
+            # was already searched
+            if not self.depth_limited:
+                break
 
-        # Get the value for all possible moves
-        for move in fringe:
-            move[0] = self.compute_val(move[1], self.board, 0, self.player_num)
+        return best_move
 
-        # Return the best move
-        best_move = max(fringe, key=lambda x: x[0])
-        return [best_move[1].row, best_move[1].column]
+    def search_root(self,
+                    moves: List[Position]) -> List[Tuple[float, Position]]:
+        """
+        Compute the value of every move at the root with the chosen
+        algorithm. With the pruning algorithms, a move that is not better
+        than the best move so far only gets an upper bound as its value.
+        :param moves: Possible moves for the player
+        :return: List of (value, move)
+        """
+        if self.workers:
+            return self.parallel_search_root(moves)
+        if self.algorithm == 'expectimax' and not self.chance_pruning:
+            return [(self.search_move(move), move) for move in moves]
+
+        fringe = []
+        best_value = -INFINITY
+        for move in moves:
+            value = self.search_move(move, best_value, INFINITY)
+            best_value = max(best_value, value)
+            fringe.append((value, move))
+        return fringe
+
+    def parallel_search_root(
+            self,
+            moves: List[Position]) -> List[Tuple[float, Position]]:
+        """
+        Compute the value of every move at the root, with each move searched
+        by a worker of the process pool. The workers search with the full
+        window, as they can not share the best value found so far.
+        :param moves: Possible moves for the player
+        :return: List of (value, move)
+        """
+        pool = parallel.get_pool(self.workers)
+        generation = self.table.generation if self.table is not None else 0
+        tasks = [
+            parallel.SearchTask(self.board.tokens[0], self.board.tokens[1],
+                                self.player_num, position_to_square(move),
+                                self.search_depth, self.algorithm,
+                                self.deadline, generation)
+            for move in moves
+        ]
+        fringe = []
+        for move, result in zip(moves, pool.map(parallel.search_task, tasks)):
+            if result is None:
+                raise SearchTimeout()
+            value, nodes, depth_limited = result
+            self.nodes += nodes
+            self.depth_limited = self.depth_limited or depth_limited
+            fringe.append((value, move))
+        return fringe
+
+    def search_move(self,
+                    move: Position,
+                    alpha: float = -INFINITY,
+                    beta: float = INFINITY) -> float:
+        """
+        Compute the value of a single move at the root with the chosen
+        algorithm.
+        :param move:
+        :param alpha: Value the bot is already guaranteed
+        :param beta:
+        :return:
+        """
+        board = self._search_board()
+        if self.algorithm == 'expectimax':
+            return self.compute_val(move, board, 1, self.player_num,
+                                    alpha, beta)
+        if self.algorithm == 'alphabeta':
+            return self.alpha_beta(move, board, 1, self.player_num,
+                                   alpha, beta)
+        if self.algorithm == 'negamax':
+            return self.negamax(move, board, 1, self.player_num,
+                                alpha, beta)
+        return self.pvs(move, board, 1, self.player_num, alpha, beta)
+
+    def _search_board(self) -> PatternBoard:
+        """
+        Get the board to search, reading the pattern indexes again only when
+        the board or the evaluator changed since the last search
+        :return:
+        """
+        board = self.search_board
+        if board is None or board.evaluator is not self.evaluator or \
+                board.tokens != self.board.tokens:
+            board = self.search_board = PatternBoard(self.board,
+                                                     self.evaluator)
+        return board
+
+    def _check_time(self) -> None:
+        """
+        Count a searched node, and every TIME_CHECK_INTERVAL nodes check if
+        the deadline has passed.
+        :return:
+        """
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 \
+                and self.deadline is not None \
+                and time.monotonic() > self.deadline:
+            raise SearchTimeout()
 
     def compute_val(self,
                     position: Position,
-                    board: Board,
+                    board: Union[Board, BitBoard],
                     depth: int,
-                    curr_player: int) -> int:
+                    curr_player: int,
+                    alpha: float = -INFINITY,
+                    beta: float = INFINITY) -> float:
         """
         Recursive function to compute the value of a move. This method is
         based on an expectimax search, which assumes the opponent is random.
         This makes the bot more risky, but better models the situation here.
 
         During the bot's turn, it will evaluate how good the board looks and
-        report that number. Then, it will add the max of its children and
-        recursively call the function.
-        On the opponent turn, we assume the bot is random. Therefore, the value
-        is computed to be the average of its childrens value (computed
-        recursively)
+        report that number. Then, as the opponent plays next and is assumed to
+        be random, it will add the average of its childrens value (computed
+        recursively).
+        On the opponent turn, the bot will reply with its best move.
+        Therefore, the value is the max of its childrens value.
+
+        Will recurse to a depth of search_depth. The move is made on the
+        board in place, and undone before returning.
 
-        Will recurse to a depth of MAX_DEPTH.
+        With a window, the search stops as soon as the value is known to be
+        at most alpha or at least beta, and returns a bound instead, see
+        _chance_value. The value is exact when it is inside the window.
         :param position:
         :param board:
         :param depth:
         :param curr_player:
+        :param alpha: Value the parent already has
+        :param beta: Value above which the parent does not need the move
         :return:
         """
+        self._check_time()
         # initialize the value of at 0
         value = 0
-        # Find the opponents number and possible moves
-        # opponent = self.player_num % 2 + 1
+        # Find the opponents number
         opponent = curr_player % 2 + 1
-        opponent_moves = list(board.find_valid(opponent))
 
-        # Get the updated board from the move
-        new_board = board.create_updated_board(position, curr_player)
+        # Update the board with the move, and get the opponents replies
+        board.make_move(position, curr_player)
+        try:
+            reply_mask = board.valid_mask(opponent)
 
-        # See if max depth is reached or opponent has no moves
-        stop = depth >= MAX_DEPTH or len(opponent_moves) == 0
+            # See if max depth is reached or opponent has no moves
+            stop = depth >= self.search_depth or not reply_mask
+            if depth >= self.search_depth and reply_mask:
+                self.depth_limited = True
 
-        # If the current player in the recursion is the player
-        if curr_player == self.player_num:
-            value += self._compute_board_value(
-                curr_player,
-                opponent,
-                position,
-                opponent_moves,
-                board,
-                new_board
-            )
-            # If not at max_depth
-            if not stop:
-                value += max([
-                    self.compute_val(move, new_board, depth, opponent)
+            # If the current player in the recursion is the player
+            if curr_player == self.player_num:
+                value += self._compute_board_value(board, curr_player,
+                                                   popcount(reply_mask))
+            if stop:
+                return value
+            opponent_moves = [SQUARE_POSITIONS[square]
+                              for square in iter_squares(reply_mask)]
+
+            # Reuse the value of the replies if this position was already
+            # seen. The window applies to the value of the replies
+            alpha -= value
+            beta -= value
+            key = position_key(board.hash_key, opponent)
+            cached, hash_move = self._probe(key, depth, alpha, beta)
+            if cached is not None and (not self.chance_pruning or
+                                       self._within_bounds(cached, depth)):
+                return value + cached
+            limited = self.depth_limited
+            self.depth_limited = False
+
+            # If the current player is the bot, the opponent is random
+            if curr_player == self.player_num:
+                replies = self._chance_value(opponent_moves, board,
+                                             depth + 1, opponent,
+                                             alpha, beta)
+                best_move = None
+            # Else, the bot picks its best reply
+            elif not self.chance_pruning:
+                replies = max([
+                    self.compute_val(move, board, depth + 1, opponent)
                     for move in opponent_moves
                 ])
-        # Else, if the current player is not the bot and still iterating
-        elif not stop:
-            value += 1 / len(opponent_moves) * sum([
-                self.compute_val(move, new_board, depth, opponent)
-                for move in opponent_moves
+                best_move = None
+            else:
+                opponent_moves = self._order(opponent_moves, board, depth,
+                                             opponent, hash_move)
+                replies = -INFINITY
+                best_move = None
+                for move in opponent_moves:
+                    score = self.compute_val(move, board, depth + 1,
+                                             opponent, max(alpha, replies),
+                                             beta)
+                    if score > replies:
+                        replies = score
+                        best_move = move
+                    if replies >= beta:
+                        self._record_cutoff(move, opponent, depth)
+                        break
+            self._store(key, depth, replies, alpha, beta, best_move, limited)
+            return value + replies
+        finally:
+            board.unmake_move()
+
+    def _chance_value(self,
+                      moves: List[Position],
+                      board: BitBoard,
+                      depth: int,
+                      player: int,
+                      alpha: float,
+                      beta: float) -> float:
+        """
+        Average value of the moves of the random opponent, pruned with
+        Star2. Every move is first probed for cheap bounds of its value (see
+        _probe_bounds). Then the moves are searched one by one, each with
+        the window where it can still move the average across alpha or
+        beta, given the bounds of the others (Star1). The other moves are
+        skipped once the average is known to be outside (alpha, beta).
+        Without chance_pruning, every move is searched and the average is
+        exact.
+        :param moves: Moves of the opponent
+        :param board:
+        :param depth: Depth of the moves
+        :param player: The opponent
+        :param alpha:
+        :param beta:
+        :return: The average, or a bound of it outside (alpha, beta)
+        """
+        count = len(moves)
+        if not self.chance_pruning:
+            return 1 / count * sum([
+                self.compute_val(move, board, depth, player)
+                for move in moves
             ])
-        #
-        return value
+
+        # The sums are compared with a small margin, so rounding can not
+        # prune a move that decides the average
+        lowest, highest = self._value_range(depth)
+        lower = []
+        upper = []
+        lower_sum = lowest * count
+        upper_sum = highest * count
+        for move in moves:
+            low, high = self._probe_bounds(move, board, depth, player)
+            lower.append(low)
+            upper.append(high)
+            lower_sum += low - lowest
+            upper_sum += high - highest
+            if upper_sum < count * alpha - STAR_MARGIN:
+                self.cutoffs += 1
+                return upper_sum / count
+            if lower_sum > count * beta + STAR_MARGIN:
+                self.cutoffs += 1
+                return lower_sum / count
+
+        total = 0
+        for index, move in enumerate(moves):
+            lower_sum -= lower[index]
+            upper_sum -= upper[index]
+            if lower[index] == upper[index]:
+                # The probe found the exact value
+                total += lower[index]
+                continue
+            move_alpha = count * alpha - total - upper_sum - STAR_MARGIN
+            move_beta = count * beta - total - lower_sum + STAR_MARGIN
+            value = self.compute_val(move, board, depth, player,
+                                     move_alpha, move_beta)
+            if value <= move_alpha:
+                self.cutoffs += 1
+                return (total + value + upper_sum) / count
+            if value >= move_beta:
+                self.cutoffs += 1
+                return (total + value + lower_sum) / count
+            total += value
+        return 1 / count * total
+
+    def _probe_bounds(self,
+                      position: Position,
+                      board: BitBoard,
+                      depth: int,
+                      curr_player: int) -> Tuple[float, float]:
+        """
+        Bounds of the value of a move of the opponent, from the evaluation
+        of every reply of the bot without searching deeper. The bot picks
+        its best reply, so the value is between the best reply evaluation
+        plus the lowest and plus the highest value of what follows it. The
+        bounds are equal, and the value exact, when nothing follows.
+        :param position: Move of the opponent
+        :param board:
+        :param depth: Depth of the move
+        :param curr_player: The opponent
+        :return: (lower bound, upper bound)
+        """
+        self._check_time()
+        bot = self.player_num
+        board.make_move(position, curr_player)
+        try:
+            reply_mask = board.valid_mask(bot)
+            if depth >= self.search_depth or not reply_mask:
+                if reply_mask:
+                    self.depth_limited = True
+                return 0, 0
+
+            lowest, highest = self._value_range(depth + 2)
+            lower = upper = -INFINITY
+            for square in iter_squares(reply_mask):
+                board.make_move(SQUARE_POSITIONS[square], bot)
+                replies = board.valid_mask(curr_player)
+                value = self._compute_board_value(board, bot,
+                                                  popcount(replies))
+                board.unmake_move()
+                # The value of the reply depends on the search depth,
+                # whether it is the last ply or its replies are skipped
+                if replies:
+                    self.depth_limited = True
+                if depth + 1 >= self.search_depth or not replies:
+                    lower = max(lower, value)
+                    upper = max(upper, value)
+                else:
+                    lower = max(lower, value + lowest)
+                    upper = max(upper, value + highest)
+            return lower, upper
+        finally:
+            board.unmake_move()
+
+    def _value_range(self, depth: int) -> Tuple[float, float]:
+        """
+        Bounds of the value of a move: the bot's moves from it down to
+        search_depth are evaluated. The bot's moves are the odd depths, as
+        the search stops instead of passing.
+        :param depth: Depth of the move
+        :return: (lowest value, highest value)
+        """
+        lowest, highest = self.evaluator.value_bounds()
+        evaluations = max(0, (self.search_depth + 1) // 2 - depth // 2)
+        return evaluations * lowest, evaluations * highest
+
+    def _within_bounds(self, value: float, depth: int) -> bool:
+        """
+        Check that the stored value of the replies to a move can be used by
+        the pruning of _chance_value. A value stored by a deeper search can
+        hold more evaluations than the bounds allow.
+        :param value: Value of the replies to a move
+        :param depth: Depth of the move
+        :return:
+        """
+        lowest, highest = self._value_range(depth + 1)
+        return lowest <= value <= highest
+
+    def _probe(self,
+               key: int,
+               depth: int,
+               alpha: float,
+               beta: float) -> Tuple[Optional[float], Optional[Position]]:
+        """
+        Look up the replies of a position in the transposition table.
+        The value can only be used if the entry was searched to the same
+        depth, or to the end of the game, and its bound is good enough for
+        the (alpha, beta) window. Values add up an evaluation for every move
+        of the bot, so a deeper entry does not match the values of a
+        shallower search, and only its best reply is used.
+        :param key: Hash of the position with the player to move
+        :param depth: Depth of the move leading to the position
+        :param alpha:
+        :param beta:
+        :return: (usable value or None, best reply or None)
+        """
+        if self.table is None:
+            return None, None
+        entry = self.table.probe(key)
+        if entry is None:
+            return None, None
+        if entry.depth == self.search_depth - depth \
+                or entry.depth == FULL_DEPTH:
+            if entry.bound == EXACT \
+                    or (entry.bound == LOWER and entry.value >= beta) \
+                    or (entry.bound == UPPER and entry.value <= alpha):
+                # The subtree was cut by depth when it was stored
+                if entry.depth < FULL_DEPTH:
+                    self.depth_limited = True
+                return entry.value, entry.best_move
+        return None, entry.best_move
+
+    def _store(self,
+               key: int,
+               depth: int,
+               value: float,
+               alpha: float,
+               beta: float,
+               best_move: Optional[Position],
+               limited: bool) -> None:
+        """
+        Store the value of the replies of a position in the transposition
+        table. Must be called right after searching the replies, with
+        depth_limited reset to False before the search.
+        :param key: Hash of the position with the player to move
+        :param depth: Depth of the move leading to the position
+        :param value: Value of the replies
+        :param alpha: Window the replies were searched with
+        :param beta:
+        :param best_move: Best reply
+        :param limited: depth_limited before the replies were searched
+        :return:
+        """
+        if self.table is not None:
+            bound = UPPER if value <= alpha else \
+                LOWER if value >= beta else EXACT
+            # A subtree not cut by depth is exact at any depth
+            stored_depth = self.search_depth - depth \
+                if self.depth_limited else FULL_DEPTH
+            self.table.store(key, stored_depth, value, bound, best_move)
+        self.depth_limited = self.depth_limited or limited
+
+    def _order(self,
+               moves: List[Position],
+               board: BitBoard,
+               depth: int,
+               player: int,
+               hash_move: Optional[Position]) -> List[Position]:
+        """
+        Sort the replies so the ones most likely to cause a cutoff are
+        searched first, see ordering.MoveOrdering
+        :param moves: Replies of player
+        :param board:
+        :param depth: Depth of the move the replies answer
+        :param player: Player making the replies
+        :param hash_move: Best reply from the transposition table
+        :return:
+        """
+        return self.ordering.order(moves, board.tokens, player, depth + 1,
+                                   self.search_depth - depth - 1, hash_move)
+
+    def _record_cutoff(self,
+                       move: Position,
+                       player: int,
+                       depth: int) -> None:
+        """
+        Count a cutoff, and credit the reply that caused it in the move
+        ordering
+        :param move: Reply that caused the cutoff
+        :param player: Player who made the reply
+        :param depth: Depth of the move the reply answers
+        :return:
+        """
+        self.cutoffs += 1
+        self.ordering.record_cutoff(move, player, depth + 1,
+                                    self.search_depth - depth - 1)
+
+    def _expand(self,
+                position: Position,
+                board: Union[Board, BitBoard],
+                depth: int,
+                curr_player: int
+                ) -> Tuple[float, List[Position], bool]:
+        """
+        Shared first step of the pruning searches: make the move on the
+        board, find the replies and the value gained by the move. Only the
+        bot's moves are evaluated, the same as in compute_val.
+        The caller must undo the move with board.unmake_move().
+        :param position:
+        :param board:
+        :param depth:
+        :param curr_player:
+        :return: (gained value, opponent moves, stop)
+        """
+        self._check_time()
+        opponent = curr_player % 2 + 1
+        board.make_move(position, curr_player)
+        reply_mask = board.valid_mask(opponent)
+
+        stop = depth >= self.search_depth or not reply_mask
+        if depth >= self.search_depth and reply_mask:
+            self.depth_limited = True
+
+        gain = 0
+        if curr_player == self.player_num:
+            gain = self._compute_board_value(board, curr_player,
+                                             popcount(reply_mask))
+        # The replies are only listed if they are searched
+        opponent_moves = [] if stop else [
+            SQUARE_POSITIONS[square] for square in iter_squares(reply_mask)]
+        return gain, opponent_moves, stop
+
+    def alpha_beta(self,
+                   position: Position,
+                   board: Union[Board, BitBoard],
+                   depth: int,
+                   curr_player: int,
+                   alpha: float,
+                   beta: float) -> float:
+        """
+        Recursive function to compute the value of a move with a minimax
+        search and alpha-beta pruning. Unlike compute_val, the opponent is
+        assumed to pick the reply that is worst for the bot, which allows
+        cutting off replies once the move can no longer change the result.
+
+        The value is always from the bot's point of view, between alpha and
+        beta (fail soft).
+        :param position:
+        :param board:
+        :param depth:
+        :param curr_player:
+        :param alpha: Value the bot is already guaranteed
+        :param beta: Value the opponent is already guaranteed
+        :return:
+        """
+        value, opponent_moves, stop = self._expand(
+            position, board, depth, curr_player)
+        try:
+            if stop:
+                return value
+            opponent = curr_player % 2 + 1
+
+            # The children only see the value not gained yet
+            alpha -= value
+            beta -= value
+            key = position_key(board.hash_key, opponent)
+            cached, hash_move = self._probe(key, depth, alpha, beta)
+            if cached is not None:
+                return value + cached
+            window = (alpha, beta)
+            limited = self.depth_limited
+            self.depth_limited = False
+
+            best_move = None
+            # If the bot moved, the opponent picks the lowest reply
+            if curr_player == self.player_num:
+                best = INFINITY
+                for move in self._order(opponent_moves, board, depth,
+                                        opponent, hash_move):
+                    score = self.alpha_beta(move, board, depth + 1,
+                                            opponent, alpha, beta)
+                    if score < best:
+                        best, best_move = score, move
+                    if best <= alpha:
+                        self._record_cutoff(move, opponent, depth)
+                        break
+                    beta = min(beta, best)
+            # Else, the bot picks the highest reply
+            else:
+                best = -INFINITY
+                for move in self._order(opponent_moves, board, depth,
+                                        opponent, hash_move):
+                    score = self.alpha_beta(move, board, depth + 1,
+                                            opponent, alpha, beta)
+                    if score > best:
+                        best, best_move = score, move
+                    if best >= beta:
+                        self._record_cutoff(move, opponent, depth)
+                        break
+                    alpha = max(alpha, best)
+            self._store(key, depth, best, *window, best_move, limited)
+            return value + best
+        finally:
+            board.unmake_move()
+
+    def negamax(self,
+                position: Position,
+                board: Union[Board, BitBoard],
+                depth: int,
+                curr_player: int,
+                alpha: float,
+                beta: float) -> float:
+        """
+        Negamax form of alpha_beta. The value of a move is from the point of
+        view of the player making it, so both players maximize and the value
+        of a reply is negated.
+        :param position:
+        :param board:
+        :param depth:
+        :param curr_player:
+        :param alpha:
+        :param beta:
+        :return:
+        """
+        value, opponent_moves, stop = self._expand(
+            position, board, depth, curr_player)
+        try:
+            if stop:
+                return value
+            opponent = curr_player % 2 + 1
+
+            # value - reply must fall within (alpha, beta)
+            alpha, beta = value - beta, value - alpha
+            key = position_key(board.hash_key, opponent)
+            cached, hash_move = self._probe(key, depth, alpha, beta)
+            if cached is not None:
+                return value - cached
+            window = (alpha, beta)
+            limited = self.depth_limited
+            self.depth_limited = False
+
+            best = -INFINITY
+            best_move = None
+            for move in self._order(opponent_moves, board, depth,
+                                    opponent, hash_move):
+                score = self.negamax(move, board, depth + 1, opponent,
+                                     alpha, beta)
+                if score > best:
+                    best, best_move = score, move
+                if best >= beta:
+                    self._record_cutoff(move, opponent, depth)
+                    break
+                alpha = max(alpha, best)
+            self._store(key, depth, best, *window, best_move, limited)
+            return value - best
+        finally:
+            board.unmake_move()
+
+    def pvs(self,
+            position: Position,
+            board: Union[Board, BitBoard],
+            depth: int,
+            curr_player: int,
+            alpha: float,
+            beta: float) -> float:
+        """
+        Principal variation search on top of negamax. The first reply is
+        searched with the full window. The others are searched with a null
+        window, which only proves they are not better, and are re-searched
+        with the full window if they are.
+        :param position:
+        :param board:
+        :param depth:
+        :param curr_player:
+        :param alpha:
+        :param beta:
+        :return:
+        """
+        value, opponent_moves, stop = self._expand(
+            position, board, depth, curr_player)
+        try:
+            if stop:
+                return value
+            opponent = curr_player % 2 + 1
+
+            alpha, beta = value - beta, value - alpha
+            key = position_key(board.hash_key, opponent)
+            cached, hash_move = self._probe(key, depth, alpha, beta)
+            if cached is not None:
+                return value - cached
+            window = (alpha, beta)
+            limited = self.depth_limited
+            self.depth_limited = False
+
+            best = -INFINITY
+            best_move = None
+            for index, move in enumerate(
+                    self._order(opponent_moves, board, depth, opponent,
+                                hash_move)):
+                if index == 0:
+                    score = self.pvs(move, board, depth + 1, opponent,
+                                     alpha, beta)
+                else:
+                    # Board values are integers, so a window of 1 is null
+                    score = self.pvs(move, board, depth + 1, opponent,
+                                     alpha, alpha + 1)
+                    if alpha < score < beta:
+                        score = self.pvs(move, board, depth + 1, opponent,
+                                         alpha, beta)
+                if score > best:
+                    best, best_move = score, move
+                if best >= beta:
+                    self._record_cutoff(move, opponent, depth)
+                    break
+                alpha = max(alpha, best)
+            self._store(key, depth, best, *window, best_move, limited)
+            return value - best
+        finally:
+            board.unmake_move()
 
     def _compute_board_value(self,
+                             board: BitBoard,
                              curr_player: int,
-                             opponent: int,
-                             position: Position,
-                             opponent_moves: List[Position],
-                             curr_board: Board,
-                             new_board: Board):
+                             replies: int) -> int:
         """
         This helper function computes the value of a singular state of the
-        board. These strategies were chosen based on the recommendations from
-        UltraBoardGames.com, and converted into arbitrary values
-        :param position: Current choice being decided on
-        :param opponent_moves: The moves the opponent can make
-        :param curr_board: The current board
-        :param new_board: The board after the move is made
+        board, right after curr_player moved. The value comes from the pattern
+        evaluator: edge, corner and diagonal patterns looked up in weight
+        tables, the number of replies left to the opponent and, near the end
+        of the game, the difference in tokens.
+        :param board: Board after the move
+        :param curr_player: Player who just moved
+        :param replies: Number of moves the opponent can reply with
         :return:
         """
-        value = 0
-
-        # First, judge how good the current move is based on if its a
-        # corner, edge, or an 'X square'
-        if position in CORNERS:
-            value += CORNER_REWARD
-        elif position in X_SQUARES:
-            value += X_SQUARE_REWARD
-        elif position in EDGES:
-            value += EDGES_REWARD
-
-        # Then, find all the number of opponent moves that can be made with
-        # this choice.
-        value -= 10 * len(opponent_moves)
-
-        # Finally, compute the change in score for the move
-        curr_score = curr_board.score[curr_player - 1] - \
-                     curr_board.score[opponent - 1]
-        score_on_update = new_board.score[curr_player - 1] - \
-                          curr_board.score[opponent - 1]
-        value += REWARD_SCORE_DIFF * (score_on_update - curr_score)
-
+        own = board.tokens[curr_player - 1]
+        other = board.tokens[curr_player % 2]
+        if self.eval_cache is not None:
+            value = self.eval_cache.get(own, other)
+            if value is not None:
+                return value
+        self.evaluations += 1
+        if type(board) is PatternBoard:
+            value = board.evaluate(curr_player, replies)
+        else:
+            value = self.evaluator.evaluate(own, other, replies)
+        if self.eval_cache is not None:
+            self.eval_cache.put(own, other, value)
         return value
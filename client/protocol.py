@@ -0,0 +1,93 @@
+"""
+This file contains the newline delimited JSON protocol spoken between the
+client and the game server: reading the server messages, sending and
+reading moves, and the loop answering every message of a game.
+"""
+
+import asyncio
+import json
+from typing import List, Optional
+
+from bitboard import BitBoard
+from session import PlayerSession
+from support import Position
+
+
+def prepare_response(move: List[int]):
+    """
+    Function that takes a movement and converts it to a response
+    :param move:
+    :return:
+    """
+    response = '{}\n'.format(move).encode()
+    print('sending {!r}'.format(response))
+    return response
+
+
+def parse_message(line: bytes) -> Optional[dict]:
+    """
+    Function that takes a single line from the server and converts it to
+    the json data. Blank lines are ignored.
+    :param line:
+    :return:
+    """
+    line = line.strip()
+    if not line:
+        return None
+    return json.loads(line.decode('UTF-8'))
+
+
+def parse_move(line: bytes) -> Optional[Position]:
+    """
+    Read a move sent by a client
+    :param line:
+    :return: The move, or None if the line is not a [row, column] pair
+    """
+    try:
+        move = json.loads(line.decode('UTF-8'))
+    except ValueError:
+        return None
+    if not isinstance(move, list) or len(move) != 2 or \
+            not all(isinstance(value, int) for value in move):
+        return None
+    return Position(move[0], move[1])
+
+
+async def play(reader: asyncio.StreamReader,
+               writer: asyncio.StreamWriter,
+               session: PlayerSession) -> None:
+    """
+    Read newline delimited messages from the server and answer each one
+    with a move. A message split over several reads, or several messages
+    in one read, are handled by the stream reader.
+    The search runs in an executor so the event loop stays responsive.
+    :param reader:
+    :param writer:
+    :param session:
+    :return:
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        # While receiving
+        line = await reader.readline()
+        if not line:
+            print('connection to server closed')
+            break
+        # Get the data from the program in json
+        json_data = parse_message(line)
+        if json_data is None:
+            continue
+        maxTurnTime = json_data['maxTurnTime']
+
+        # Get the move from the player within the turn time.
+        # The session is passed a board object and the players number
+        move = await loop.run_in_executor(None,
+                                          session.get_move,
+                                          BitBoard(json_data['board']),
+                                          json_data['player'],
+                                          maxTurnTime)
+        # Send the response to the server
+        writer.write(prepare_response(move))
+        await writer.drain()
+        # Think about the next turn while the opponent plays
+        session.start_pondering(move)
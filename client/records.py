@@ -0,0 +1,291 @@
+"""
+This file contains the game records: every position the bot played, with
+its move, the value found by the search, the time it took and how it was
+found. The records are the data for tuning, book building and looking back
+at lost games.
+
+A record file starts with a header, followed by fixed size records, one per
+move of the bot. Records of the same game share a game number, and a file
+can hold any number of games. A move takes 32 bytes, so a million positions
+take 32 MB.
+
+The writer never blocks the moves: a record is packed into bytes right away
+and written to the file by a background thread. The reader maps the file in
+memory and unpacks records while looping over them, so files much larger
+than the memory can be read.
+"""
+
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+from collections import Counter
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+from bitboard import popcount
+
+RECORDS_MAGIC = b'AOGR'
+"""First bytes of a record file"""
+RECORDS_VERSION = 1
+HEADER = struct.Struct('<4sII')
+"""Magic, version and size of a record"""
+RECORD = struct.Struct('<QQIfIBBBB')
+"""
+Tokens of player 1, tokens of player 2, game number, value of the move,
+time taken in microseconds, player who moved, square of the move, depth of
+the search and source of the move
+"""
+SOURCES = ('search', 'book', 'endgame', 'mcts')
+"""Ways the player finds its moves, stored as their index"""
+UNKNOWN_VALUE = float('nan')
+"""Value stored for a move found without a value"""
+MAX_MICROSECONDS = 0xFFFFFFFF
+"""Longest time a record can hold, longer times are stored as this"""
+READ_CHUNK = 4096
+"""Number of records unpacked at once by the reader"""
+
+
+class PositionRecord(NamedTuple):
+    """
+    A move of the bot, and the position it was played in
+    """
+    player_one: int
+    player_two: int
+    game: int
+    value: float
+    microseconds: int
+    player: int
+    square: int
+    depth: int
+    source: int
+
+
+class GameRecordWriter:
+    """
+    Appends records to a file from a background thread.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a record file, creating it if needed. New games are numbered
+        after the games already in the file.
+        :param path:
+        """
+        self.path = path
+        self.game = -1
+        """Number of the current game, -1 before the first record"""
+        self.tokens = 64
+        """Number of tokens in the last recorded position"""
+        self.player = 0
+        """Player of the last recorded move"""
+        self.error: Optional[BaseException] = None
+        """Error that stopped the background thread, raised by close"""
+
+        self.file = open(path, 'ab+')
+        size = self.file.seek(0, os.SEEK_END)
+        if size:
+            self.file.seek(0)
+            _check_header(self.file.read(HEADER.size), path)
+            # A record cut short by a crash would shift all the next ones
+            count = (size - HEADER.size) // RECORD.size
+            self.file.truncate(HEADER.size + count * RECORD.size)
+            if count:
+                self.file.seek(HEADER.size + (count - 1) * RECORD.size)
+                self.game = RECORD.unpack(self.file.read(RECORD.size))[2]
+        else:
+            self.file.write(HEADER.pack(RECORDS_MAGIC, RECORDS_VERSION,
+                                        RECORD.size))
+            self.file.flush()
+
+        self.queue: "queue.SimpleQueue[Optional[bytes]]" = \
+            queue.SimpleQueue()
+        """Packed records waiting to be written, None to stop the thread"""
+        self.thread = threading.Thread(target=self._write_records,
+                                       daemon=True)
+        self.thread.start()
+
+    def record(self,
+               tokens: Tuple[int, int],
+               player: int,
+               square: int,
+               value: Optional[float] = None,
+               seconds: float = 0.0,
+               depth: int = 0,
+               source: str = 'search') -> None:
+        """
+        Queue the record of a move. A position with no more tokens than the
+        last one, or a move of the other player, starts a new game, as the
+        bot's positions gain tokens every turn of a game.
+        :param tokens: Bitboard of each player before the move
+        :param player: Player who moved
+        :param square: Square of the move
+        :param value: Value of the move found by the search, if any
+        :param seconds: Time taken by the move
+        :param depth: Depth of the search
+        :param source: How the move was found, from SOURCES
+        :return:
+        """
+        count = popcount(tokens[0] | tokens[1])
+        if count <= self.tokens or player != self.player:
+            self.game += 1
+        self.tokens = count
+        self.player = player
+        self.queue.put(RECORD.pack(
+            tokens[0], tokens[1], self.game,
+            UNKNOWN_VALUE if value is None else value,
+            min(round(seconds * 1000000), MAX_MICROSECONDS),
+            player, square, min(depth, 0xFF), SOURCES.index(source)))
+
+    def _write_records(self) -> None:
+        """
+        Write the queued records until None is received. Records queued
+        together are written at once.
+        :return:
+        """
+        stop = False
+        while not stop:
+            chunks = [self.queue.get()]
+            while True:
+                try:
+                    chunks.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in chunks:
+                chunks = chunks[:chunks.index(None)]
+                stop = True
+            try:
+                self.file.write(b''.join(chunks))
+                self.file.flush()
+            except OSError as error:
+                self.error = error
+                return
+
+    def close(self) -> None:
+        """
+        Write the queued records and close the file.
+        :return:
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+
+def _check_header(header: bytes, path: str) -> None:
+    """
+    Make sure a file holds records this version can read
+    :param header:
+    :param path:
+    :return:
+    """
+    if len(header) < HEADER.size or HEADER.unpack(header) != (
+            RECORDS_MAGIC, RECORDS_VERSION, RECORD.size):
+        raise ValueError('{} is not a version {} record file'.format(
+            path, RECORDS_VERSION))
+
+
+class GameRecords:
+    """
+    A read only record file, memory mapped.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a record file
+        :param path:
+        """
+        with open(path, 'rb') as record_file:
+            self.data = mmap.mmap(record_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        _check_header(self.data[:HEADER.size], path)
+        # A record still being written is left out
+        self.count = (len(self.data) - HEADER.size) // RECORD.size
+
+    def __len__(self) -> int:
+        """
+        Number of records in the file
+        :return:
+        """
+        return self.count
+
+    def __getitem__(self, index: int) -> PositionRecord:
+        """
+        Read a single record
+        :param index:
+        :return:
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('record index out of range')
+        return PositionRecord(*RECORD.unpack_from(
+            self.data, HEADER.size + index * RECORD.size))
+
+    def __iter__(self) -> Iterator[tuple]:
+        """
+        Loop over all records as plain tuples, in the order of
+        PositionRecord
+        :return:
+        """
+        return self.records()
+
+    def records(self, start: int = 0,
+                stop: Optional[int] = None) -> Iterator[tuple]:
+        """
+        Loop over a range of records as plain tuples, in the order of
+        PositionRecord. Only READ_CHUNK records are in memory at once.
+        :param start: Index of the first record
+        :param stop: Index after the last record, the end of the file if None
+        :return:
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        for first in range(start, stop, READ_CHUNK):
+            offset = HEADER.size + first * RECORD.size
+            end = HEADER.size + min(first + READ_CHUNK, stop) * RECORD.size
+            # The slice is a copy, so no view of the map is left open
+            yield from RECORD.iter_unpack(self.data[offset:end])
+
+    def games(self) -> Iterator[Tuple[int, int, int]]:
+        """
+        Loop over the games of the file
+        :return: (game number, index of the first record, index after the
+        last record) of each game
+        """
+        game = first = None
+        for index, record in enumerate(self.records()):
+            if record[2] != game:
+                if game is not None:
+                    yield game, first, index
+                game = record[2]
+                first = index
+        if game is not None:
+            yield game, first, self.count
+
+    def close(self) -> None:
+        """
+        Release the memory map
+        :return:
+        """
+        self.data.close()
+
+
+if __name__ == "__main__":
+    """
+    Summarize a record file from the command line:
+    python records.py <records path>
+    """
+    records = GameRecords(sys.argv[1])
+    games = sum(1 for _ in records.games())
+    sources = Counter()
+    microseconds = 0
+    for record in records:
+        sources[SOURCES[record[8]]] += 1
+        microseconds += record[4]
+    print('{} moves in {} games, {:.1f} ms per move'.format(
+        len(records), games, microseconds / 1000 / max(len(records), 1)))
+    for source, moves in sources.most_common():
+        print('{}: {} moves'.format(source, moves))
+    records.close()
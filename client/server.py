@@ -0,0 +1,208 @@
+"""
+This file contains a local stand-in for the game server. It speaks the same
+newline delimited JSON protocol: each turn the player to move receives
+{"board": ..., "player": ..., "maxTurnTime": ...} and answers with its move
+as [row, column]. A player that answers too late, or with an illegal move,
+loses the game. The connection is closed when the game is over.
+
+Clients are paired in the order they connect, the first one plays first.
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from bitboard import BitBoard, iter_squares, square_to_position
+from book import START_BOARD
+from protocol import parse_move
+
+DEFAULT_TURN_TIME = 1000
+"""Time allowed for a move in milliseconds"""
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+@dataclass
+class GameResult:
+    """
+    Outcome of a game and how the players used their time
+    """
+
+    score: List[int] = field(default_factory=lambda: [0, 0])
+    """Tokens of player 1 and player 2 at the end of the game"""
+    winner: int = 0
+    """Winning player, 0 for a draw"""
+    forfeit: Optional[int] = None
+    """Player who lost by timeout or illegal move, if any"""
+    reason: str = ''
+    """Why the game was forfeited"""
+    move_times: List[List[float]] = field(
+        default_factory=lambda: [[], []])
+    """Time in seconds each player took for each move"""
+    timeouts: List[int] = field(default_factory=lambda: [0, 0])
+    """Number of moves over the time limit of each player"""
+
+
+def random_opening(plies: int, seed: int) -> Tuple[BitBoard, int]:
+    """
+    Play random moves from the start of the game, so that games between
+    the same players differ.
+    :param plies:
+    :param seed:
+    :return: (board, player to move)
+    """
+    rng = random.Random(seed)
+    board = BitBoard(START_BOARD)
+    player = 1
+    for _ in range(plies):
+        moves = board.valid_mask(player)
+        if not moves:
+            break
+        board.update_board(
+            square_to_position(rng.choice(list(iter_squares(moves)))), player)
+        player = player % 2 + 1
+    return board, player
+
+
+async def run_game(connections: List[Connection],
+                   max_turn_time: int = DEFAULT_TURN_TIME,
+                   board: Optional[BitBoard] = None,
+                   player: int = 1) -> GameResult:
+    """
+    Play a game between two connected clients.
+    :param connections: (reader, writer) of player 1 and player 2
+    :param max_turn_time: Time allowed for each move in milliseconds
+    :param board: Board to start from, the start of the game if None
+    :param player: Player to move first
+    :return:
+    """
+    if board is None:
+        board = BitBoard(START_BOARD)
+    result = GameResult()
+    passes = 0
+    while passes < 2:
+        moves = board.valid_mask(player)
+        if not moves:
+            passes += 1
+            player = player % 2 + 1
+            continue
+        passes = 0
+
+        reader, writer = connections[player - 1]
+        message = {'board': board.raw_board, 'player': player,
+                   'maxTurnTime': max_turn_time}
+        writer.write(json.dumps(message).encode() + b'\n')
+        start = time.monotonic()
+        try:
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(),
+                                          max_turn_time / 1000)
+        except asyncio.TimeoutError:
+            result.move_times[player - 1].append(time.monotonic() - start)
+            result.timeouts[player - 1] += 1
+            result.forfeit = player
+            result.reason = 'timeout'
+            break
+        except ConnectionError:
+            line = b''
+        result.move_times[player - 1].append(time.monotonic() - start)
+
+        move = parse_move(line)
+        if move is None or not 0 <= move.row < 8 or \
+                not 0 <= move.column < 8 or \
+                not moves >> (move.row * 8 + move.column) & 1:
+            result.forfeit = player
+            result.reason = 'illegal move {!r}'.format(line)
+            break
+        board.update_board(move, player)
+        player = player % 2 + 1
+
+    result.score = board.score
+    if result.forfeit is not None:
+        result.winner = result.forfeit % 2 + 1
+    elif result.score[0] != result.score[1]:
+        result.winner = 1 if result.score[0] > result.score[1] else 2
+    for _, writer in connections:
+        writer.close()
+    return result
+
+
+class LocalServer:
+    """
+    Pairs the clients that connect and plays a game between each pair.
+    """
+
+    def __init__(self,
+                 max_turn_time: int = DEFAULT_TURN_TIME,
+                 opening_plies: int = 0,
+                 seed: int = 0,
+                 games: Optional[int] = None):
+        """
+        :param max_turn_time: Time allowed for each move in milliseconds
+        :param opening_plies: Number of random moves played by the server at
+        the start of each game
+        :param seed: Seed of the random moves of the first game
+        :param games: Number of games to play, no limit if None
+        """
+        self.max_turn_time = max_turn_time
+        self.opening_plies = opening_plies
+        self.seed = seed
+        self.games = games
+        self.waiting: Optional[Connection] = None
+        """Client waiting for an opponent"""
+        self.results: List[GameResult] = []
+        self.finished = asyncio.Event()
+        """Set once `games` games were played"""
+
+    async def handle_connection(self,
+                                reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """
+        Called by asyncio for each new client
+        :param reader:
+        :param writer:
+        :return:
+        """
+        if self.waiting is None:
+            self.waiting = (reader, writer)
+            return
+        connections = [self.waiting, (reader, writer)]
+        self.waiting = None
+        board, player = random_opening(self.opening_plies,
+                                       self.seed + len(self.results))
+        result = await run_game(connections, self.max_turn_time, board,
+                                player)
+        self.results.append(result)
+        print('game {}: score {}-{}{}'.format(
+            len(self.results), result.score[0], result.score[1],
+            ', player {} forfeits: {}'.format(result.forfeit, result.reason)
+            if result.forfeit else ''), flush=True)
+        if self.games is not None and len(self.results) >= self.games:
+            self.finished.set()
+
+    async def serve(self, host: str, port: int) -> None:
+        """
+        Accept clients until `games` games were played
+        :param host:
+        :param port:
+        :return:
+        """
+        server = await asyncio.start_server(self.handle_connection, host,
+                                            port)
+        async with server:
+            await self.finished.wait()
+
+
+if __name__ == "__main__":
+    """
+    Serve games from the command line:
+    python server.py [port] [maxTurnTime] [opening plies]
+    """
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1337
+    turn_time = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TURN_TIME
+    plies = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    asyncio.run(LocalServer(turn_time, plies).serve('', port))
@@ -0,0 +1,191 @@
+"""
+This file contains the player session, which lives for the whole client
+process. It keeps the search state between turns and thinks about the next
+turn (ponders) while the opponent is thinking.
+"""
+
+import threading
+import time
+from typing import List, Optional
+
+from bitboard import BitBoard
+from book import OpeningBook
+from cache import PositionCache
+from evaluation import get_default_evaluator
+from ordering import MoveOrdering
+from player import Player, MAX_DEPTH
+from records import GameRecordWriter
+from support import Position
+from telemetry import MoveLog
+from transposition import TranspositionTable, position_key
+
+PONDER_TIME: int = 60
+"""Maximum time in seconds spent pondering a single position"""
+
+
+class PlayerSession:
+    """
+    A long lived player. The same Player and transposition table are used
+    for every turn, and after each move the expected opponent reply is
+    searched in a background thread while waiting for the server.
+    """
+
+    def __init__(self,
+                 max_depth: int = MAX_DEPTH,
+                 algorithm: str = 'expectimax',
+                 workers: int = 0,
+                 ponder: bool = True,
+                 book_path: Optional[str] = None,
+                 telemetry: Optional[MoveLog] = None,
+                 recorder: Optional[GameRecordWriter] = None):
+        self.max_depth = max_depth
+        self.algorithm = algorithm
+        self.workers = workers
+        self.ponder = ponder
+        self.book = OpeningBook(book_path) if book_path else None
+        """Opening book, loaded once for the whole process"""
+        self.telemetry = telemetry
+        """Log of the search statistics of every move, if enabled"""
+        self.recorder = recorder
+        """Record file receiving every move, if enabled"""
+
+        self.table = TranspositionTable()
+        """Transposition table kept between turns"""
+        self.ordering = MoveOrdering()
+        """Killer moves and history kept between turns"""
+        self.eval_cache = PositionCache()
+        """Evaluations kept between turns and shared with pondering"""
+        self.evaluator = get_default_evaluator()
+        """Built here, so the first turn does not pay for the tables"""
+        self.player: Optional[Player] = None
+        """Player of the current game, created on the first turn"""
+
+        self.ponder_player: Optional[Player] = None
+        """Player searching the expected position in the background"""
+        self.ponder_thread: Optional[threading.Thread] = None
+        self.ponder_board: Optional[BitBoard] = None
+        """Board the ponder search expects to receive"""
+        self.ponder_hits = 0
+        """Number of turns where the expected board was received"""
+        self.ponder_misses = 0
+        """Number of turns where another board was received"""
+
+    def get_move(self,
+                 board: BitBoard,
+                 player_number: int,
+                 max_turn_time: Optional[int] = None) -> List[int]:
+        """
+        Stop pondering and find the move for the received board.
+        :param board:
+        :param player_number:
+        :param max_turn_time: Time allowed for the turn in milliseconds
+        :return:
+        """
+        self.stop_pondering()
+        if self.ponder_board is not None:
+            # The work is already in the transposition table, so a miss only
+            # means it is less useful
+            if self.ponder_board == board:
+                self.ponder_hits += 1
+            else:
+                self.ponder_misses += 1
+            self.ponder_board = None
+
+        # A new game, or the server switched sides: values from the old
+        # player do not apply anymore
+        if self.player is None or self.player.player_num != player_number:
+            self.table.clear()
+            self.ordering.clear()
+            self.player = Player(board, player_number,
+                                 max_depth=self.max_depth,
+                                 algorithm=self.algorithm,
+                                 transposition_table=self.table,
+                                 workers=self.workers,
+                                 book=self.book,
+                                 evaluator=self.evaluator,
+                                 telemetry=self.telemetry,
+                                 ordering=self.ordering,
+                                 eval_cache=self.eval_cache)
+        else:
+            self.player.set_board(board)
+        if self.recorder is None:
+            return self.player.get_move(max_turn_time)
+
+        start = time.monotonic()
+        move = self.player.get_move(max_turn_time)
+        self.recorder.record(
+            tuple(board.tokens), player_number, move[0] * 8 + move[1],
+            self.player.best_value, time.monotonic() - start,
+            self.player.completed_depth, self.player.source)
+        return move
+
+    def expected_reply(self,
+                       board: BitBoard,
+                       opponent: int) -> Optional[Position]:
+        """
+        Guess the reply of the opponent. The best reply stored in the
+        transposition table is used if there is one, else the reply that
+        leaves the bot with the fewest moves.
+        :param board: Board after the bot's move
+        :param opponent:
+        :return: The expected reply, or None if the opponent must pass
+        """
+        replies = list(board.find_valid(opponent))
+        if not replies:
+            return None
+        entry = self.table.probe(position_key(board.hash_key, opponent))
+        if entry is not None and entry.best_move in replies:
+            return entry.best_move
+        bot = opponent % 2 + 1
+        return min(replies, key=lambda reply: board.create_updated_board(
+            reply, opponent).count_valid(bot))
+
+    def start_pondering(self, move: List[int]) -> None:
+        """
+        Start searching the expected board in a background thread, after
+        the bot played move. The thread runs until stop_pondering is called.
+        :param move: Move sent to the server
+        :return:
+        """
+        # The Monte Carlo tree search keeps its own tree instead
+        if not self.ponder or self.player is None or \
+                self.algorithm == 'mcts':
+            return
+        bot = self.player.player_num
+        opponent = bot % 2 + 1
+        board = self.player.board.create_updated_board(
+            Position(move[0], move[1]), bot)
+        reply = self.expected_reply(board, opponent)
+        if reply is None:
+            return
+        board.update_board(reply, opponent)
+        if not board.valid_mask(bot):
+            return
+
+        self.ponder_board = board
+        # The table and the move ordering are shared with the next turn,
+        # which only starts once the ponder thread has stopped
+        self.ponder_player = Player(board.copy(), bot,
+                                    max_depth=self.max_depth,
+                                    algorithm=self.algorithm,
+                                    transposition_table=self.table,
+                                    evaluator=self.evaluator,
+                                    ordering=self.ordering,
+                                    eval_cache=self.eval_cache)
+        self.ponder_player.deadline = time.monotonic() + PONDER_TIME
+        self.ponder_thread = threading.Thread(
+            target=self.ponder_player.iterative_deepening, daemon=True)
+        self.ponder_thread.start()
+
+    def stop_pondering(self) -> None:
+        """
+        Stop the ponder thread and wait for it to finish.
+        :return:
+        """
+        if self.ponder_thread is None:
+            return
+        # The search checks the deadline regularly and stops
+        self.ponder_player.deadline = 0
+        self.ponder_thread.join()
+        self.ponder_thread = None
+        self.ponder_player = None
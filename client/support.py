@@ -2,7 +2,6 @@
 This file contains classes that support the analysis of the game
 """
 
-from dataclasses import dataclass
 from enum import Enum
 from typing import Optional, List, Tuple, Iterator, Dict
 
@@ -10,6 +9,12 @@ from typing import Optional, List, Tuple, Iterator, Dict
 BOARD_SIZE = (8, 8)
 
 
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when the time budget for the turn has run out.
+    """
+
+
 class Direction(Enum):
     """
     This class represents the 8 directions on the board.
@@ -28,50 +33,76 @@ class Direction(Enum):
         Get the opposite direction of where this direction is pointing
         :return: Opposite direction
         """
-        return Direction((-1 * self.value[0], -1 * self.value[1]))
+        return self.opposite
+
+
+DIRECTIONS: List[Direction] = list(Direction)
+"""The 8 directions, as a list which is faster to loop over than the enum"""
+# Unpack the values once, instead of on every step: the index of each
+# direction in DIRECTIONS, its steps and its opposite
+for _index, _direction in enumerate(DIRECTIONS):
+    _direction.index = _index
+    _direction.row_step, _direction.column_step = _direction.value
+for _direction in DIRECTIONS:
+    _direction.opposite = Direction((-_direction.row_step,
+                                     -_direction.column_step))
+del _index, _direction
 
 
-@dataclass()
 class Position:
     """
     This class represents a single position on the board.
-    Essentially, it extends a tuple to be (row, column) with other functions
+    Essentially, it extends a tuple to be (row, column) with other functions.
+    The positions of the board are also kept in SQUARE_POSITIONS, and moving
+    from one of them in a direction returns another one of them, so walking
+    the board does not create new objects.
     """
 
-    row: int
-    """Row of the point"""
-    column: int
-    """Column of the point"""
+    __slots__ = ('row', 'column', 'square')
+
+    def __init__(self, row: int, column: int):
+        self.row: int = row
+        """Row of the point"""
+        self.column: int = column
+        """Column of the point"""
+        self.square: int = row * BOARD_SIZE[1] + column
+        """Square index (0-63) of the point, if it is on the board"""
+
+    def __repr__(self) -> str:
+        return 'Position(row={}, column={})'.format(self.row, self.column)
+
+    def __reduce__(self):
+        return Position, (self.row, self.column)
 
     def outside_board(self) -> bool:
         """
         Function that returns true if the position is outside the board
         :return:
         """
-        return True if self.row > BOARD_SIZE[0] - 1 \
-                       or self.row < 0 \
-                       or self.column > BOARD_SIZE[1] - 1 \
-                       or self.column < 0 \
-            else False
+        return not (0 <= self.row < BOARD_SIZE[0] and
+                    0 <= self.column < BOARD_SIZE[1])
 
-    def __add__(self, other: Direction) -> "Position":
+    def __add__(self, other: Direction) -> Optional["Position"]:
         """
         Wrap the '+' function for a position and a direction.
         Simplifies moving around the board from a position.
         :param other: Direction to move
-        :return: New Position
+        :return: New Position, None if it is outside the board
         """
-        new_pos = Position(self.row + other.value[0],
-                           self.column + other.value[1])
+        if 0 <= self.row < BOARD_SIZE[0] and \
+                0 <= self.column < BOARD_SIZE[1]:
+            return NEIGHBORS[self.square][other.index]
+        new_pos = Position(self.row + other.row_step,
+                           self.column + other.column_step)
         return new_pos if not new_pos.outside_board() else None
 
     # Define hash function and equality so can be used in dictionary
     def __hash__(self):
         """
-        Return the hash of the tuple
+        Return the hash of the square
         :return:
         """
-        return hash((self.row, self.column))
+        return self.square
 
     def __eq__(self, other: "Position") -> bool:
         """
@@ -79,11 +110,70 @@ class Position:
         :param other:
         :return:
         """
-        if type(other) != type(self):
+        if type(other) is not Position:
             return False
         return self.row == other.row and self.column == other.column
 
 
+SQUARE_POSITIONS: List[Position] = [
+    Position(square // BOARD_SIZE[1], square % BOARD_SIZE[1])
+    for square in range(BOARD_SIZE[0] * BOARD_SIZE[1])]
+"""
+Position of each square index. They are shared by the whole program, so
+they must not be modified.
+"""
+NEIGHBORS: List[List[Optional[Position]]] = [
+    [SQUARE_POSITIONS[(position.row + direction.row_step) * BOARD_SIZE[1] +
+                      position.column + direction.column_step]
+     if 0 <= position.row + direction.row_step < BOARD_SIZE[0] and
+     0 <= position.column + direction.column_step < BOARD_SIZE[1] else None
+     for direction in DIRECTIONS]
+    for position in SQUARE_POSITIONS]
+"""Neighbor of each square in each direction, None outside the board"""
+
+
+def _build_rays() -> List[List[Tuple[Position, ...]]]:
+    """
+    Build the positions met walking from each square in each direction,
+    nearest first, up to the edge of the board.
+    :return:
+    """
+    rays = []
+    for position in SQUARE_POSITIONS:
+        square_rays = []
+        for direction in DIRECTIONS:
+            ray = []
+            curr_pos = NEIGHBORS[position.square][direction.index]
+            while curr_pos is not None:
+                ray.append(curr_pos)
+                curr_pos = NEIGHBORS[curr_pos.square][direction.index]
+            square_rays.append(tuple(ray))
+        rays.append(square_rays)
+    return rays
+
+
+RAYS: List[List[Tuple[Position, ...]]] = _build_rays()
+"""Positions from each square in each direction, see _build_rays"""
+
+
+def ray(position: Position, direction: Direction) -> Tuple[Position, ...]:
+    """
+    Positions met walking from a position in a direction, nearest first
+    :param position: Position to start from, which is not included
+    :param direction:
+    :return:
+    """
+    if not position.outside_board():
+        return RAYS[position.square][direction.index]
+    # Only positions on the board are in the table
+    positions = []
+    curr_pos = position + direction
+    while curr_pos is not None:
+        positions.append(curr_pos)
+        curr_pos = curr_pos + direction
+    return tuple(positions)
+
+
 class Board:
     """
     Board will contain and process the information for the game board.
@@ -110,6 +200,12 @@ class Board:
         """
         Raw board of the game status
         """
+
+        self.undo_stack: List[Tuple[Position, int, List[Position]]] = []
+        """
+        Moves made with make_move, as (placed position, player, flipped
+        positions), so they can be undone with unmake_move.
+        """
         # Store the tokens in the current tokens.
         # Loop over rows
         for row in range(len(input_board)):
@@ -119,7 +215,8 @@ class Board:
                 # If the position is not empty
                 if player in [1, 2]:
                     # Add the point and add the score
-                    self.curr_tokens[Position(row, column)] = player
+                    position = SQUARE_POSITIONS[row * BOARD_SIZE[1] + column]
+                    self.curr_tokens[position] = player
                     self.score[player - 1] += 1
 
     def flip_token(self, position: Position, set_player: int) -> None:
@@ -165,7 +262,7 @@ class Board:
         :return:
         """
         # Loop over all directions
-        for direction in Direction:
+        for direction in DIRECTIONS:
             # Yield if point exists:
             neighbor = self.find_neighbor_in_direction(position,
                                                        direction)
@@ -182,31 +279,34 @@ class Board:
         a wall or blank space.
         If flankable, return a list of what would be flipped."""
         visited_positions = []
-        curr_pos = init_position + direction
-        if not curr_pos:
-            return False, []
-        # Loop while position is not outside board or not empty
-        while not curr_pos.outside_board() \
-                and self.curr_tokens.get(curr_pos):
+        curr_tokens = self.curr_tokens
+        if 0 <= init_position.row < BOARD_SIZE[0] and \
+                0 <= init_position.column < BOARD_SIZE[1]:
+            line = RAYS[init_position.square][direction.index]
+        else:
+            line = ray(init_position, direction)
+        # Loop over the precomputed line until an empty position
+        for curr_pos in line:
+            token = curr_tokens.get(curr_pos)
+            if not token:
+                break
             # If ends with same token, flank!
-            if self.curr_tokens[curr_pos] == player:
+            if token == player:
                 return True, visited_positions
-
             # else add the current position to the return
             visited_positions.append(curr_pos)
-            # Move in the direction again
-            curr_pos = curr_pos + direction
-            if not curr_pos:
-                return False, []
         # Else, not flankable
         return False, []
 
     def find_valid(self, curr_player: int) -> Iterator[Position]:
         """
         Find and return all valid positions on the board.
+        Each position is returned once, even if it flanks several lines.
         :param curr_player:
         :return:
         """
+        # Squares already returned, as a bitboard
+        found = 0
         # First, find all open positions next to an opponent
         for position, player in self.curr_tokens.items():
             # If the token is the same as the current player, ignore
@@ -220,14 +320,52 @@ class Board:
                 # Left with all unoccupied spaces next to an opponent
                 # Check if the line created by the position can be flanked
                 unoccupied_space = position + direction
+                square = 1 << unoccupied_space.square
+                if found & square:
+                    continue
                 opposite_dir = direction.get_opposite()
 
                 # If flankable, yield that location
                 if self.is_flankable(curr_player,
                                      unoccupied_space,
                                      opposite_dir)[0]:
+                    found |= square
                     yield unoccupied_space
 
+    def valid_mask(self, curr_player: int) -> int:
+        """
+        Find all valid positions on the board as a bitboard, where position
+        (row, column) is bit row * 8 + column.
+        :param curr_player:
+        :return:
+        """
+        mask = 0
+        for position in self.find_valid(curr_player):
+            mask |= 1 << position.square
+        return mask
+
+    def count_valid(self, curr_player: int) -> int:
+        """
+        Count the valid positions on the board
+        :param curr_player:
+        :return:
+        """
+        return bin(self.valid_mask(curr_player)).count('1')
+
+    def canonical(self, player: int) -> Tuple[int, int, int]:
+        """
+        Find the canonical form of the position: the smallest pair of
+        bitboards out of its 8 rotations and mirrors, see bitboard.canonical.
+        :param player: Player to move
+        :return: (tokens of player, tokens of the opponent, symmetry used)
+        """
+        # Imported here, as bitboard imports this module
+        from bitboard import canonical
+        tokens = [0, 0]
+        for position, token in self.curr_tokens.items():
+            tokens[token - 1] |= 1 << position.square
+        return canonical(tokens[player - 1], tokens[player % 2])
+
     def update_board(self, placed_position: Position,
                      player: int) -> None:
         """
@@ -240,7 +378,7 @@ class Board:
         self.flip_token(placed_position, player)
         # Loop over all directions and find all tiles to flip
         tokens_to_flip = []
-        for direction in Direction:
+        for direction in DIRECTIONS:
             flankable = self.is_flankable(player, placed_position, direction)
             if flankable[0]:
                 # Loop over spaces now flanked
@@ -252,8 +390,57 @@ class Board:
     def create_updated_board(self, placed_position: Position,
                              player: int) -> "Board":
         """
-        Given a new position, return a new updated board with tiles flipped
+        Given a new position, return a new updated board with tiles flipped.
+        The raw board is copied, so this board is left untouched.
         """
-        new_board = Board(self.raw_board)
+        new_board = self.copy()
         new_board.update_board(placed_position, player)
         return new_board
+
+    def copy(self) -> "Board":
+        """
+        Create a copy of the board. The score and tokens are copied rather
+        than counted again from the raw board.
+        :return:
+        """
+        board = Board.__new__(Board)
+        board.score = self.score[:]
+        board.curr_tokens = self.curr_tokens.copy()
+        board.raw_board = [row[:] for row in self.raw_board]
+        board.undo_stack = []
+        return board
+
+    def make_move(self, placed_position: Position, player: int) -> None:
+        """
+        Given a new position, update this board in place and remember the
+        flipped tokens, so the move can be undone with unmake_move.
+        :param placed_position:
+        :param player:
+        :return:
+        """
+        # Find all tiles to flip before placing the new token
+        tokens_to_flip = []
+        for direction in DIRECTIONS:
+            flankable, line = self.is_flankable(player, placed_position,
+                                                direction)
+            if flankable:
+                tokens_to_flip.extend(line)
+        self.flip_token(placed_position, player)
+        for token in tokens_to_flip:
+            self.flip_token(token, player)
+        self.undo_stack.append((placed_position, player, tokens_to_flip))
+
+    def unmake_move(self) -> None:
+        """
+        Undo the last move made with make_move.
+        :return:
+        """
+        placed_position, player, flipped = self.undo_stack.pop()
+        opponent = player % 2 + 1
+        # Give the flipped tokens back to the opponent
+        for token in flipped:
+            self.flip_token(token, opponent)
+        # Then remove the placed token
+        del self.curr_tokens[placed_position]
+        self.raw_board[placed_position.row][placed_position.column] = 0
+        self.score[player - 1] -= 1
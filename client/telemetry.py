@@ -0,0 +1,70 @@
+"""
+This file contains the search telemetry: after each move the player can
+write one JSON line describing how the move was found. The line holds the
+nodes searched, the leaf evaluations, the cutoffs, the transposition table
+hits, the time and nodes of every iteration of the iterative deepening,
+the principal variation and the branching factor.
+
+The counters are plain integers kept by the player, so the search does the
+same work whether telemetry is enabled or not. Only building and writing
+the line costs time, once per move.
+"""
+
+import json
+import sys
+from typing import List, Optional, TextIO
+
+
+class MoveLog:
+    """
+    Writes one JSON object per line to a log file, or to stderr.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        :param path: File the lines are appended to, stderr if None or '-'
+        """
+        self.path = path
+        self.stream: TextIO = sys.stderr if path in (None, '-') \
+            else open(path, 'a')
+
+    def write(self, record: dict) -> None:
+        """
+        Write a record as a single line, and flush it so the log can be
+        followed while the game is played
+        :param record:
+        :return:
+        """
+        self.stream.write(json.dumps(record, sort_keys=True) + '\n')
+        self.stream.flush()
+
+    def close(self) -> None:
+        """
+        Close the log file. Nothing is done when writing to stderr.
+        :return:
+        """
+        if self.stream is not sys.stderr:
+            self.stream.close()
+
+
+def branching_factor(iterations: List[dict]) -> Optional[float]:
+    """
+    Effective branching factor of the search: how many times more nodes
+    the last completed iteration needed than the one before it.
+    :param iterations: Iterations as recorded in the telemetry, with the
+    nodes searched by each one
+    :return: The factor, or None if there are not two iterations to compare
+    """
+    if len(iterations) < 2 or not iterations[-2]['nodes']:
+        return None
+    return iterations[-1]['nodes'] / iterations[-2]['nodes']
+
+
+def read_log(path: str) -> List[dict]:
+    """
+    Read back the records of a log file
+    :param path:
+    :return:
+    """
+    with open(path) as log_file:
+        return [json.loads(line) for line in log_file if line.strip()]
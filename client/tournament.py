@@ -0,0 +1,209 @@
+"""
+This file contains the headless tournament runner. Two player variants play
+many games against each other through the local server, with the same
+protocol and turn time limits as the real server but without a network.
+Games run in parallel in worker processes, and the runner reports the win
+rate, move latency and timeouts of each variant.
+
+Run a tournament from the command line:
+python tournament.py <variant> <variant> [games] [workers] [maxTurnTime]
+where a variant is algorithm[:max depth], for example pvs:10 or mcts
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from player import MODES, MAX_DEPTH
+from server import GameResult, LocalServer, DEFAULT_TURN_TIME
+
+OPENING_PLIES = 4
+"""Random moves played by the server at the start of each game"""
+
+
+class Variant(NamedTuple):
+    """
+    Settings of a player taking part in a tournament
+    """
+
+    name: str
+    algorithm: str = 'expectimax'
+    """Search algorithm, from player.MODES"""
+    max_depth: int = MAX_DEPTH
+    ponder: bool = False
+    """Search during the opponent's turn"""
+    book_path: Optional[str] = None
+    """Opening book to use, if any"""
+
+
+class GameTask(NamedTuple):
+    """
+    A game of the tournament to play in a worker process
+    """
+
+    first: Variant
+    """Variant playing as player 1"""
+    second: Variant
+    """Variant playing as player 2"""
+    seed: int
+    """Seed of the random opening"""
+    max_turn_time: int
+    """Time allowed for each move in milliseconds"""
+
+
+def parse_variant(text: str) -> Variant:
+    """
+    Read a variant from the command line, as algorithm[:max depth]
+    :param text:
+    :return:
+    """
+    algorithm, _, depth = text.partition(':')
+    if algorithm not in MODES:
+        raise ValueError('Unknown search algorithm {!r}'.format(algorithm))
+    return Variant(text, algorithm, int(depth) if depth else MAX_DEPTH)
+
+
+async def _play_game(task: GameTask) -> GameResult:
+    """
+    Start a local server and connect both variants to it with the real
+    client, then play one game.
+    :param task:
+    :return:
+    """
+    # Imported here, as the protocol imports the whole player
+    from protocol import play
+    from session import PlayerSession
+
+    server = LocalServer(task.max_turn_time, OPENING_PLIES, task.seed,
+                         games=1)
+    listener = await asyncio.start_server(server.handle_connection,
+                                          '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+
+    clients = []
+    for variant in (task.first, task.second):
+        session = PlayerSession(max_depth=variant.max_depth,
+                                algorithm=variant.algorithm,
+                                ponder=variant.ponder,
+                                book_path=variant.book_path)
+        # Connections are paired in order, so connect one at a time
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        clients.append((reader, writer, session))
+
+    async def run_client(reader, writer, session):
+        try:
+            await play(reader, writer, session)
+        finally:
+            session.stop_pondering()
+            writer.close()
+
+    async with listener:
+        await asyncio.gather(*(run_client(*client) for client in clients))
+        await server.finished.wait()
+    return server.results[0]
+
+
+def play_game(task: GameTask) -> GameResult:
+    """
+    Play one game of the tournament. Runs inside a worker process.
+    :param task:
+    :return:
+    """
+    # The client and server print every move and game
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(_play_game(task))
+
+
+def summarize(variants: List[Variant],
+              tasks: List[GameTask],
+              results: List[GameResult]) -> Dict[str, dict]:
+    """
+    Sum up the results of each variant
+    :param variants:
+    :param tasks:
+    :param results:
+    :return: Maps each variant name to its games, wins, draws, losses, win
+    rate, average and maximum move time in ms, timeouts and forfeits
+    """
+    summary = {variant.name: {'games': 0, 'wins': 0, 'draws': 0,
+                              'losses': 0, 'moves': 0, 'time': 0.0,
+                              'max_time': 0.0, 'timeouts': 0, 'forfeits': 0}
+               for variant in variants}
+    for task, result in zip(tasks, results):
+        for player, variant in ((1, task.first), (2, task.second)):
+            stats = summary[variant.name]
+            stats['games'] += 1
+            if result.winner == player:
+                stats['wins'] += 1
+            elif result.winner == 0:
+                stats['draws'] += 1
+            else:
+                stats['losses'] += 1
+            times = result.move_times[player - 1]
+            stats['moves'] += len(times)
+            stats['time'] += sum(times)
+            stats['max_time'] = max([stats['max_time']] + times)
+            stats['timeouts'] += result.timeouts[player - 1]
+            stats['forfeits'] += result.forfeit == player
+    for stats in summary.values():
+        stats['win_rate'] = (stats['wins'] + stats['draws'] / 2) / \
+            max(stats['games'], 1)
+        stats['average_ms'] = stats['time'] / max(stats['moves'], 1) * 1000
+        stats['max_ms'] = stats.pop('max_time') * 1000
+        del stats['time']
+    return summary
+
+
+def run_tournament(first: Variant,
+                   second: Variant,
+                   games: int,
+                   workers: Optional[int] = None,
+                   max_turn_time: int = DEFAULT_TURN_TIME,
+                   seed: int = 0) -> Dict[str, dict]:
+    """
+    Play a tournament between two variants. Each opening is played twice,
+    once with each variant moving first.
+    :param first:
+    :param second:
+    :param games:
+    :param workers: Number of games played at once, one per core if None
+    :param max_turn_time: Time allowed for each move in milliseconds
+    :param seed: Seed of the first opening
+    :return: Summary of each variant, see summarize
+    """
+    if first.name == second.name:
+        second = second._replace(name=second.name + "'")
+    tasks = [GameTask(first, second, seed + number // 2, max_turn_time)
+             if number % 2 == 0 else
+             GameTask(second, first, seed + number // 2, max_turn_time)
+             for number in range(games)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(play_game, tasks))
+    return summarize([first, second], tasks, results)
+
+
+if __name__ == "__main__":
+    """
+    Run a tournament from the command line
+    """
+    variant_one = parse_variant(sys.argv[1])
+    variant_two = parse_variant(sys.argv[2])
+    game_count = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    worker_count = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    turn_time = int(sys.argv[5]) if len(sys.argv) > 5 else DEFAULT_TURN_TIME
+    start_time = time.monotonic()
+    tournament = run_tournament(variant_one, variant_two, game_count,
+                                worker_count, turn_time)
+    print('{} games in {:.0f}s'.format(game_count,
+                                       time.monotonic() - start_time))
+    for name, stats in tournament.items():
+        print('{:16} win rate {:.1%} ({} wins, {} draws, {} losses), '
+              'average move {:.0f}ms, slowest {:.0f}ms, {} timeouts'.format(
+                name, stats['win_rate'], stats['wins'], stats['draws'],
+                stats['losses'], stats['average_ms'], stats['max_ms'],
+                stats['timeouts']))
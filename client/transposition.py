@@ -0,0 +1,197 @@
+"""
+This file contains the Zobrist hashing and the transposition table used by
+the search. The same position is often reached through different move
+orders, so results are stored by the hash of the position and reused.
+"""
+
+import random
+from dataclasses import dataclass
+from typing import List, Optional
+
+from support import Position
+
+ZOBRIST_SEED = 0x07E110
+"""Seed of the Zobrist keys, fixed so hashes are the same in every process"""
+_random = random.Random(ZOBRIST_SEED)
+ZOBRIST_KEYS: List[List[int]] = [
+    [_random.getrandbits(64) for _ in range(64)] for _ in range(2)
+]
+"""Random key for every (player - 1, square) pair"""
+SIDE_KEY: int = _random.getrandbits(64)
+"""Key added to the hash when player 2 is the next to move"""
+
+EXACT = 0
+"""The stored value is the exact value of the position"""
+LOWER = 1
+"""The stored value is a lower bound (the search failed high)"""
+UPPER = 2
+"""The stored value is an upper bound (the search failed low)"""
+
+FULL_DEPTH = 64
+"""Depth stored for a subtree that was searched to the end of the game"""
+ENTRY_BYTES = 200
+"""Approximate memory used by one entry, including the Python objects"""
+DEFAULT_MEMORY = 32 * 1024 * 1024
+"""Default memory cap of the table in bytes"""
+POLICIES = ['depth', 'two_tier']
+"""
+Replacement policies.
+depth: one entry per slot, replaced by deeper or newer searches.
+two_tier: two entries per slot, one kept by depth and one always replaced.
+"""
+
+
+def zobrist_hash(tokens: List[int]) -> int:
+    """
+    Compute the Zobrist hash of a position from scratch.
+    Boards keep their hash up to date when moves are made, so this is only
+    needed when a board is created.
+    :param tokens: Bitboard of each player
+    :return:
+    """
+    key = 0
+    for player in range(2):
+        bits = tokens[player]
+        while bits:
+            low_bit = bits & -bits
+            key ^= ZOBRIST_KEYS[player][low_bit.bit_length() - 1]
+            bits ^= low_bit
+    return key
+
+
+def position_key(board_hash: int, next_player: int) -> int:
+    """
+    Combine the hash of a board with the player to move next
+    :param board_hash:
+    :param next_player:
+    :return:
+    """
+    return board_hash ^ SIDE_KEY if next_player == 2 else board_hash
+
+
+@dataclass()
+class TTEntry:
+    """
+    This class represents a single result stored in the table.
+    """
+
+    key: int
+    """Full hash of the position, to detect collisions in a slot"""
+    depth: int
+    """Remaining depth the position was searched to"""
+    value: float
+    """Value found by the search"""
+    bound: int
+    """EXACT, LOWER or UPPER"""
+    best_move: Optional[Position]
+    """Best move found in the position"""
+    generation: int
+    """Search the entry was stored in"""
+
+
+class TranspositionTable:
+    """
+    A fixed size hash table of search results.
+    The number of slots is a power of two, chosen to fit the memory cap.
+    """
+
+    def __init__(self,
+                 max_memory: int = DEFAULT_MEMORY,
+                 policy: str = 'two_tier'):
+        """
+        Create an empty table.
+        :param max_memory: Memory cap in bytes
+        :param policy: Replacement policy from POLICIES
+        """
+        if policy not in POLICIES:
+            raise ValueError('Unknown replacement policy {!r}'.format(policy))
+        self.policy = policy
+        ways = 2 if policy == 'two_tier' else 1
+        slots = 1
+        while slots * 2 * ways * ENTRY_BYTES <= max_memory:
+            slots *= 2
+        self.mask = slots - 1
+        self.ways = ways
+        self.entries: List[Optional[TTEntry]] = [None] * (slots * ways)
+        self.generation = 0
+
+        self.hits = 0
+        """Number of probes that found the position"""
+        self.misses = 0
+        """Number of probes that did not find the position"""
+        self.stores = 0
+        """Number of results stored"""
+
+    def __len__(self) -> int:
+        """
+        Number of entries that can be held by the table
+        :return:
+        """
+        return len(self.entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Fraction of probes that found the position
+        """
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def new_search(self) -> None:
+        """
+        Start a new search. Entries from older searches are replaced first.
+        :return:
+        """
+        self.generation += 1
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters
+        :return:
+        """
+        self.entries = [None] * len(self.entries)
+        self.hits = self.misses = self.stores = 0
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """
+        Find the entry stored for a position
+        :param key: Hash of the position
+        :return: The entry, or None if not found
+        """
+        index = (key & self.mask) * self.ways
+        for entry in self.entries[index:index + self.ways]:
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def store(self,
+              key: int,
+              depth: int,
+              value: float,
+              bound: int,
+              best_move: Optional[Position]) -> None:
+        """
+        Store a search result, following the replacement policy
+        :param key: Hash of the position
+        :param depth: Remaining depth searched
+        :param value:
+        :param bound: EXACT, LOWER or UPPER
+        :param best_move:
+        :return:
+        """
+        index = (key & self.mask) * self.ways
+        new_entry = TTEntry(key, depth, value, bound, best_move,
+                            self.generation)
+        deep = self.entries[index]
+        # The first way keeps the deepest result, unless it is stale
+        if deep is None or deep.key == key or depth >= deep.depth \
+                or deep.generation != self.generation:
+            self.entries[index] = new_entry
+        # The second way is always replaced
+        elif self.ways == 2:
+            self.entries[index + 1] = new_entry
+        else:
+            return
+        self.stores += 1
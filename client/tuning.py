@@ -0,0 +1,320 @@
+"""
+This file contains the self-play tuning of the evaluation weights. Games are
+played by worker processes on every core, and the positions of each game
+are appended to a dataset file as soon as the game ends. After every round
+of games, the pattern, mobility and token weights are fitted to the final
+results of the games by a batched least squares regression, and written to
+a new revision of the weight file. The next round plays with the new
+weights.
+
+Run it unattended, for example overnight:
+python tuning.py <weights path> [hours] [workers]
+
+Like batch.py, this file needs NumPy. The player only reads the weight file.
+"""
+
+import os
+import random
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from batch import batch_moves, popcount
+from bitboard import BitBoard, iter_squares, square_to_position
+from book import START_BOARD
+from evaluation import (PatternEvaluator, NUM_PHASES, PATTERNS, WEIGHTS_PATH,
+                        load_weights, mirror_tables, save_weights)
+
+POSITION_RECORD = struct.Struct('<QQb')
+"""
+Tokens of the player who just moved, tokens of the opponent, final token
+difference for the player who just moved
+"""
+POSITION_DTYPE = np.dtype([('own', '<u8'), ('other', '<u8'), ('result', 'i1')])
+"""POSITION_RECORD as a NumPy type, to read the dataset in one call"""
+SELF_PLAY_DEPTH = 2
+"""Depth of the search of the self-play players"""
+RANDOM_PLIES = 6
+"""Number of random moves at the start of each game, so games differ"""
+EXPLORATION = 0.05
+"""Chance of a random move after the start of the game"""
+GAMES_PER_ROUND = 256
+"""Number of games played between two fits of the weights"""
+DATASET_WINDOW = 4000000
+"""Number of the most recent positions used by a fit"""
+TARGET_SCALE = 10
+"""Weight units per token of the final token difference"""
+REGULARIZATION = 5.0
+"""Pull of each weight towards its previous value, in positions"""
+FIT_EPOCHS = 20
+"""Number of passes of the regression over the weights"""
+
+
+class GameTask(NamedTuple):
+    """
+    A self-play game to play in a worker process
+    """
+
+    seed: int
+    """Seed of the random moves"""
+    weights_path: Optional[str]
+    """Weight file to play with, or None for the hand tuned weights"""
+    revision: int
+    """Revision of the weight file, so workers know when to reload it"""
+    depth: int
+    """Depth of the search of both players"""
+
+
+_worker_evaluator: Optional[PatternEvaluator] = None
+"""Evaluator of a worker process, kept until a new revision is played"""
+
+
+def _task_evaluator(task: GameTask) -> PatternEvaluator:
+    """
+    Get the evaluator of a task, loading the weight file if the worker does
+    not have this revision yet. The hand tuned weights are revision 0, and
+    are built once per worker like any other revision.
+    :param task:
+    :return:
+    """
+    global _worker_evaluator
+    if _worker_evaluator is None or \
+            _worker_evaluator.revision != task.revision:
+        _worker_evaluator = load_weights(task.weights_path) \
+            if task.weights_path is not None else PatternEvaluator()
+    return _worker_evaluator
+
+
+def play_game(task: GameTask) -> bytes:
+    """
+    Play a game against itself. Runs inside a worker process.
+    :param task:
+    :return: The positions of the game, as POSITION_RECORD records
+    """
+    # Imported here, as the player is only needed by the workers
+    from player import Player
+
+    rng = random.Random(task.seed)
+    evaluator = _task_evaluator(task)
+    board = BitBoard(START_BOARD)
+    # Each side keeps its player, and transposition table, for the game
+    players = {
+        number: Player(board, number, max_depth=task.depth,
+                       algorithm='alphabeta', evaluator=evaluator)
+        for number in (1, 2)
+    }
+    positions: List[Tuple[int, int, int]] = []
+    player = 1
+    passes = 0
+    while passes < 2:
+        moves = board.valid_mask(player)
+        if not moves:
+            passes += 1
+            player = player % 2 + 1
+            continue
+        passes = 0
+        if len(positions) < RANDOM_PLIES or rng.random() < EXPLORATION:
+            move = square_to_position(rng.choice(list(iter_squares(moves))))
+        else:
+            searcher = players[player]
+            searcher.set_board(board)
+            # Fixed depth, so the games do not depend on the machine
+            searcher.deadline = None
+            move = searcher.iterative_deepening()
+        board.update_board(move, player)
+        positions.append((player, board.tokens[player - 1],
+                          board.tokens[player % 2]))
+        player = player % 2 + 1
+
+    one, two = board.score
+    return b''.join(
+        POSITION_RECORD.pack(own, other,
+                             one - two if mover == 1 else two - one)
+        for mover, own, other in positions)
+
+
+def read_dataset(path: str, limit: int = DATASET_WINDOW) -> np.ndarray:
+    """
+    Read the most recent positions of a dataset
+    :param path:
+    :param limit: Maximum number of positions
+    :return: Array of POSITION_DTYPE
+    """
+    count = os.path.getsize(path) // POSITION_RECORD.size
+    skipped = max(0, count - limit)
+    return np.fromfile(path, dtype=POSITION_DTYPE,
+                       offset=skipped * POSITION_RECORD.size)
+
+
+def fit_weights(positions: np.ndarray,
+                evaluator: PatternEvaluator,
+                epochs: int = FIT_EPOCHS,
+                regularization: float = REGULARIZATION
+                ) -> Tuple[PatternEvaluator, float, float]:
+    """
+    Fit the weights to the final results of the games by least squares.
+    Each pass updates one group of weights at a time (a pattern table, the
+    mobility weights, the token weights) from the residual of the others.
+    Weights seen in few positions stay close to their previous value. The
+    weights of mirrored indexes are kept equal, so the evaluation stays the
+    same for symmetric positions, which the evaluation cache relies on.
+    :param positions: Array of POSITION_DTYPE
+    :param evaluator: Previous weights, the starting point of the fit
+    :param epochs:
+    :param regularization:
+    :return: (evaluator with the next revision, root mean squared error
+    before and after the fit, in tokens)
+    """
+    own = positions['own']
+    other = positions['other']
+    target = positions['result'].astype(np.float64) * TARGET_SCALE
+    phases = np.minimum((popcount(own | other) - 4) * NUM_PHASES // 60,
+                        NUM_PHASES - 1)
+    replies = popcount(batch_moves(np.stack([other, own], axis=1))) \
+        .astype(np.float64)
+    tokens = (popcount(own) - popcount(other)).astype(np.float64)
+
+    # Flat index (phase, pattern index) of every instance, by pattern
+    sizes = [3 ** len(squares) for _, squares in PATTERNS]
+    cells: List[List[np.ndarray]] = [[] for _ in PATTERNS]
+    for pattern, extract, table in evaluator.instances:
+        table = np.asarray(table)
+        index = table[extract(own).astype(np.intp)] + \
+            2 * table[extract(other).astype(np.intp)]
+        cells[pattern].append(phases * sizes[pattern] + index)
+    mirrors = [[np.asarray(table) for table in tables]
+               for tables in mirror_tables()]
+
+    def symmetric(values: np.ndarray, pattern: int) -> np.ndarray:
+        # Average of each entry and its mirrored entries, in every phase
+        table = values.reshape(NUM_PHASES, -1)
+        total = table.copy()
+        for mirror in mirrors[pattern]:
+            total += table[:, mirror]
+        return (total / (len(mirrors[pattern]) + 1)).ravel()
+
+    weights = [symmetric(np.array([evaluator.weights[phase][pattern]
+                                   for phase in range(NUM_PHASES)],
+                                  dtype=np.float64).ravel(), pattern)
+               for pattern in range(len(PATTERNS))]
+    previous = [table.copy() for table in weights]
+    mobility = np.array(evaluator.mobility, dtype=np.float64)
+    discs = np.array(evaluator.discs, dtype=np.float64)
+
+    def predict() -> np.ndarray:
+        value = mobility[phases] * replies + discs[phases] * tokens
+        for pattern, pattern_cells in enumerate(cells):
+            for cell in pattern_cells:
+                value = value + weights[pattern][cell]
+        return value
+
+    prediction = predict()
+    error_before = np.sqrt(np.mean((prediction - target) ** 2)) / TARGET_SCALE
+    for _ in range(epochs):
+        for pattern, pattern_cells in enumerate(cells):
+            residual = target - prediction
+            size = len(weights[pattern])
+            sums = np.zeros(size)
+            counts = np.zeros(size)
+            for cell in pattern_cells:
+                sums += np.bincount(cell, residual, minlength=size)
+                counts += np.bincount(cell, minlength=size)
+            # All instances of a pattern change at once, so the step is
+            # shared between them to not overshoot
+            change = symmetric((sums - regularization *
+                                (weights[pattern] - previous[pattern])) /
+                               (counts + regularization) /
+                               len(pattern_cells), pattern)
+            weights[pattern] += change
+            for cell in pattern_cells:
+                prediction += change[cell]
+        for scalars, feature in ((mobility, replies), (discs, tokens)):
+            residual = target - prediction
+            change = np.bincount(phases, residual * feature,
+                                 minlength=NUM_PHASES) / \
+                (np.bincount(phases, feature * feature,
+                             minlength=NUM_PHASES) + regularization)
+            scalars += change
+            prediction += change[phases] * feature
+
+    # The search needs integer values
+    fitted = PatternEvaluator(
+        [[np.rint(weights[pattern].reshape(NUM_PHASES, -1)[phase])
+          .astype(int).tolist() for pattern in range(len(PATTERNS))]
+         for phase in range(NUM_PHASES)],
+        np.rint(mobility).astype(int).tolist(),
+        np.rint(discs).astype(int).tolist(),
+        evaluator.revision + 1)
+    error_after = np.sqrt(np.mean((predict() - target) ** 2)) / TARGET_SCALE
+    return fitted, float(error_before), float(error_after)
+
+
+def tune(weights_path: str,
+         hours: float,
+         workers: int,
+         dataset_path: Optional[str] = None,
+         games_per_round: int = GAMES_PER_ROUND,
+         depth: int = SELF_PLAY_DEPTH,
+         seed: Optional[int] = None) -> PatternEvaluator:
+    """
+    Play rounds of self-play games and fit the weights after each round,
+    until the time runs out. The tuning starts from the weight file if it
+    exists, and adds to the dataset if it exists, so a stopped run can be
+    started again.
+    :param weights_path: Weight file to write
+    :param hours: Time to run for
+    :param workers: Number of processes playing games
+    :param dataset_path: Positions of the games, next to the weights if None
+    :param games_per_round:
+    :param depth: Depth of the self-play search
+    :param seed: Seed of the first game, from the clock if None
+    :return: The last fitted weights
+    """
+    if dataset_path is None:
+        dataset_path = weights_path + '.positions'
+    evaluator = load_weights(weights_path) \
+        if os.path.exists(weights_path) else PatternEvaluator()
+    if seed is None:
+        seed = int(time.time())
+    start = time.monotonic()
+    end = start + hours * 3600
+    games = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(dataset_path, 'ab') as dataset:
+        while time.monotonic() < end:
+            tasks = [GameTask(seed + games + number,
+                              weights_path if evaluator.revision else None,
+                              evaluator.revision, depth)
+                     for number in range(games_per_round)]
+            # Games are written as they finish, in order
+            for records in pool.map(play_game, tasks):
+                dataset.write(records)
+                games += 1
+            dataset.flush()
+
+            positions = read_dataset(dataset_path)
+            evaluator, error_before, error_after = fit_weights(positions,
+                                                               evaluator)
+            save_weights(weights_path, evaluator)
+            elapsed = time.monotonic() - start
+            print('revision {}: {} games, {:.0f} games/hour, {} positions, '
+                  'error {:.2f} -> {:.2f} tokens'.format(
+                    evaluator.revision, games, games / elapsed * 3600,
+                    len(positions), error_before, error_after), flush=True)
+    return evaluator
+
+
+if __name__ == "__main__":
+    """
+    Tune the weights from the command line:
+    python tuning.py [weights path] [hours] [workers]
+    """
+    path = sys.argv[1] if len(sys.argv) > 1 else WEIGHTS_PATH
+    run_hours = float(sys.argv[2]) if len(sys.argv) > 2 else 8
+    run_workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    tune(path, run_hours, run_workers)
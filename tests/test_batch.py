@@ -0,0 +1,101 @@
+"""
+This file contains tests for functions in batch.py.
+"""
+
+import random
+import unittest
+from client.bitboard import (BitBoard, find_moves, find_flips, iter_squares,
+                             popcount, square_to_position)
+from client.player import Player
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+if np is not None:
+    from client.batch import (batch_moves, batch_flips, batch_children,
+                              batch_move_values, batch_evaluate, from_grids)
+
+
+def _random_positions(count, seed=1):
+    """Positions from seeded random games, as (own, other) pairs"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        own, other = 0x0000000810000000, 0x0000001008000000
+        for _ in range(rng.randrange(60)):
+            moves = find_moves(own, other)
+            if not moves:
+                own, other = other, own
+                if not find_moves(own, other):
+                    break
+                continue
+            square = rng.choice(list(iter_squares(moves)))
+            flipped = find_flips(own, other, square)
+            own, other = other & ~flipped, own | flipped | (1 << square)
+        positions.append((own, other))
+    return positions
+
+
+@unittest.skipUnless(np is not None, 'numpy is not installed')
+class TestBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.positions = _random_positions(200)
+        self.array = np.array(self.positions, dtype=np.uint64)
+
+    def test_moves(self):
+        moves = batch_moves(self.array)
+        for (own, other), mask in zip(self.positions, moves):
+            self.assertEqual(int(mask), find_moves(own, other))
+
+    def test_children(self):
+        children, parents, squares = batch_children(self.array)
+        expected = []
+        for own, other in self.positions:
+            for square in iter_squares(find_moves(own, other)):
+                flipped = find_flips(own, other, square)
+                expected.append((other & ~flipped,
+                                 own | flipped | (1 << square)))
+        self.assertEqual([tuple(int(bits) for bits in child)
+                          for child in children], expected)
+        for parent, square in zip(parents, squares):
+            own, other = self.positions[parent]
+            self.assertTrue(find_moves(own, other) >> int(square) & 1)
+
+    def test_flips(self):
+        children, parents, squares = batch_children(self.array)
+        flips = batch_flips(self.array[parents], squares)
+        for parent, square, flipped in zip(parents, squares, flips):
+            own, other = self.positions[parent]
+            self.assertEqual(int(flipped), find_flips(own, other, int(square)))
+
+    def test_move_values_match_player(self):
+        _, parents, squares = batch_children(self.array[:40])
+        values = batch_move_values(self.array[parents], squares)
+        for parent, square, value in zip(parents, squares, values):
+            own, other = self.positions[parent]
+            board = BitBoard.from_bits(own, other)
+            player = Player(board, 1)
+            board.make_move(square_to_position(int(square)), 1)
+            replies = popcount(board.valid_mask(2))
+            self.assertEqual(int(value), player._compute_board_value(
+                board, 1, replies))
+
+    def test_evaluate(self):
+        moves, children, parents, values = batch_evaluate(self.array)
+        self.assertEqual(len(children), int(np.sum(
+            [popcount(int(mask)) for mask in moves])))
+        self.assertEqual(len(values), len(children))
+
+    def test_from_grids(self):
+        boards = [BitBoard.from_bits(own, other)
+                  for own, other in self.positions[:10]]
+        grids = np.array([board.raw_board for board in boards])
+        positions = from_grids(grids, np.array([2] * 10))
+        for (own, other), position in zip(self.positions, positions):
+            self.assertEqual((int(position[0]), int(position[1])),
+                             (other, own))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+This file contains tests for functions in benchmark.py.
+"""
+
+import unittest
+from client.benchmark import (PERFT_START, PERFT_POSITIONS, perft, perft_bits,
+                              compare, time_to_depth)
+from client.bitboard import BitBoard
+from client.book import START_BOARD
+from client.support import Board
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_perft_start(self):
+        start = BitBoard(START_BOARD)
+        for depth in range(6):
+            self.assertEqual(perft_bits(start.tokens[0], start.tokens[1],
+                                        depth), PERFT_START[depth])
+        for depth in range(5):
+            self.assertEqual(perft(Board(START_BOARD), 1, depth),
+                             PERFT_START[depth])
+
+    def test_perft_positions(self):
+        for _, own, other, depth, leaves in PERFT_POSITIONS:
+            self.assertEqual(perft_bits(own, other, depth), leaves)
+
+    def test_compare(self):
+        baseline = {'benchmarks': {'a': {'per_second': 100.0},
+                                   'b': {'per_second': 100.0}}}
+        current = {'benchmarks': {
+            'a': {'per_second': 90.0},
+            'b': {'per_second': 50.0},
+            'c': {'per_second': 1.0, 'ok': False, 'leaves': 3,
+                  'expected': 4}}}
+        problems = compare(baseline, current, 0.2)
+        self.assertEqual(len(problems), 2)
+        self.assertTrue(problems[0].startswith('b:'))
+        self.assertTrue(problems[1].startswith('c:'))
+
+    def test_time_to_depth(self):
+        start = BitBoard(START_BOARD)
+        iterations = time_to_depth(start.tokens[0], start.tokens[1], 'pvs', 3)
+        self.assertEqual([depth for depth, _, _ in iterations], [1, 2, 3])
+        nodes = [count for _, _, count in iterations]
+        self.assertEqual(nodes, sorted(nodes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+"""
+This file contains tests for functions in bitboard.py.
+"""
+
+import random
+import unittest
+from client.support import Board, Position, Direction, RAYS as BOARD_RAYS
+from client.bitboard import (BitBoard, find_moves, find_flips, popcount,
+                             count_moves, square_to_position, RAYS,
+                             symmetries,
+                             transform, inverse_transform, canonical,
+                             flip_vertical, flip_horizontal, flip_diagonal)
+
+
+class TestBitBoard(unittest.TestCase):
+    """Test the bitboard engine against the dictionary board"""
+
+    def setUp(self) -> None:
+        self.start_board = [[0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 1, 2, 0, 0, 0],
+                            [0, 0, 0, 2, 1, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0]]
+        self.mid_board = [[0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 1, 0, 0, 0, 0, 0],
+                          [0, 1, 2, 0, 0, 2, 0, 0],
+                          [0, 2, 1, 1, 1, 0, 0, 0],
+                          [0, 1, 1, 1, 1, 0, 0, 0],
+                          [0, 1, 1, 2, 2, 0, 0, 0],
+                          [0, 1, 1, 2, 1, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0]]
+
+    @staticmethod
+    def _as_tuples(positions):
+        return sorted({(pos.row, pos.column) for pos in positions})
+
+    def test_constructor(self):
+        board = BitBoard(self.start_board)
+        self.assertEqual(board.score, [2, 2])
+        self.assertEqual(board.raw_board, self.start_board)
+        self.assertEqual(board.tokens,
+                         [(1 << 27) | (1 << 36), (1 << 28) | (1 << 35)])
+
+    def test_find_valid(self):
+        board = BitBoard(self.start_board)
+        self.assertEqual(self._as_tuples(board.find_valid(1)),
+                         [(2, 4), (3, 5), (4, 2), (5, 3)])
+        self.assertEqual(self._as_tuples(board.find_valid(2)),
+                         [(2, 3), (3, 2), (4, 5), (5, 4)])
+
+    def test_find_valid_matches_board(self):
+        for raw in [self.start_board, self.mid_board]:
+            for player in [1, 2]:
+                expected = self._as_tuples(
+                    Board([row[:] for row in raw]).find_valid(player))
+                found = list(BitBoard(raw).find_valid(player))
+                # Each position is only returned once
+                self.assertEqual(len(found), len(set(
+                    (pos.row, pos.column) for pos in found)))
+                self.assertEqual(self._as_tuples(found), expected)
+
+    def test_count_valid(self):
+        for raw in [self.start_board, self.mid_board]:
+            board = BitBoard(raw)
+            for player in [1, 2]:
+                self.assertEqual(board.count_valid(player),
+                                 len(list(board.find_valid(player))))
+                self.assertEqual(
+                    board.count_valid(player),
+                    count_moves(board.tokens[player - 1],
+                                board.tokens[player % 2]))
+                self.assertEqual(board.count_valid(player),
+                                 Board([row[:] for row in raw])
+                                 .count_valid(player))
+
+    def test_positions_are_shared(self):
+        board = BitBoard(self.mid_board)
+        for position in board.find_valid(1):
+            square = position.row * 8 + position.column
+            self.assertIs(position, square_to_position(square))
+
+    def test_no_wrap_around(self):
+        # A line of opponent tokens at the end of a row must not flank
+        # through to the start of the next row
+        raw = [[0] * 8 for _ in range(8)]
+        raw[2][6] = 1
+        raw[2][7] = 2
+        raw[3][0] = 0
+        raw[3][1] = 1
+        board = BitBoard(raw)
+        self.assertEqual(self._as_tuples(board.find_valid(1)), [])
+
+    def test_create_updated_board(self):
+        board = BitBoard(self.start_board)
+        new_board = board.create_updated_board(Position(3, 2), 2)
+        self.assertEqual(new_board.raw_board,
+                         [[0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 2, 2, 2, 0, 0, 0],
+                          [0, 0, 0, 2, 1, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0]])
+        self.assertEqual(new_board.score, [1, 4])
+        # The original board is left untouched
+        self.assertEqual(board.raw_board, self.start_board)
+
+    def test_updates_match_board(self):
+        for raw in [self.start_board, self.mid_board]:
+            for player in [1, 2]:
+                bitboard = BitBoard(raw)
+                for move in list(bitboard.find_valid(player)):
+                    expected = Board([row[:] for row in raw])
+                    expected.update_board(
+                        Position(move.row, move.column), player)
+                    updated = bitboard.create_updated_board(move, player)
+                    self.assertEqual(updated.raw_board, expected.raw_board)
+                    self.assertEqual(updated.score, expected.score)
+
+    def test_make_and_unmake_move(self):
+        for raw in [self.start_board, self.mid_board]:
+            board = BitBoard(raw)
+            tokens, hash_key = board.tokens[:], board.hash_key
+            for move in list(board.find_valid(2)):
+                board.make_move(move, 2)
+                self.assertEqual(
+                    board.tokens,
+                    BitBoard(raw).create_updated_board(move, 2).tokens)
+                for reply in list(board.find_valid(1)):
+                    board.make_move(reply, 1)
+                    board.unmake_move()
+                board.unmake_move()
+                # Bit for bit identical after the move is undone
+                self.assertEqual(board.tokens, tokens)
+                self.assertEqual(board.hash_key, hash_key)
+            self.assertEqual(board.undo_stack, [])
+
+    def test_find_flips(self):
+        board = BitBoard(self.start_board)
+        own, other = board.tokens[1], board.tokens[0]
+        self.assertEqual(find_flips(own, other, 3 * 8 + 2), 1 << 27)
+        self.assertEqual(find_flips(own, other, 0), 0)
+        self.assertEqual(popcount(find_moves(own, other)), 4)
+
+    def test_rays(self):
+        # From (2, 5) to the right: (2, 6) and (2, 7)
+        self.assertEqual(RAYS[21][Direction.RIGHT.index],
+                         (1 << 22) | (1 << 23))
+        self.assertEqual(RAYS[0][Direction.UP.index], 0)
+        for square in range(64):
+            for direction in Direction:
+                self.assertEqual(
+                    RAYS[square][direction.index],
+                    sum(1 << position.square for position in
+                        BOARD_RAYS[square][direction.index]))
+
+    def test_find_flips_matches_board(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            board = BitBoard(self.start_board)
+            player = 1
+            for _ in range(rng.randrange(40)):
+                moves = list(board.find_valid(player))
+                if moves:
+                    board.update_board(rng.choice(moves), player)
+                player = player % 2 + 1
+            raw = board.raw_board
+            for move in board.find_valid(player):
+                expected = Board([row[:] for row in raw])
+                expected.update_board(move, player)
+                self.assertEqual(
+                    board.create_updated_board(move, player).raw_board,
+                    expected.raw_board)
+
+
+class TestSymmetry(unittest.TestCase):
+    """Test the 8 symmetries of the board"""
+
+    def test_flips(self):
+        square = 1 << (2 * 8 + 5)
+        self.assertEqual(flip_vertical(square), 1 << (5 * 8 + 5))
+        self.assertEqual(flip_horizontal(square), 1 << (2 * 8 + 2))
+        self.assertEqual(flip_diagonal(square), 1 << (5 * 8 + 2))
+
+    def test_transforms_are_distinct_and_invertible(self):
+        bits = 0x0000000810204000 | 0x3
+        transformed = {transform(bits, symmetry) for symmetry in range(8)}
+        self.assertEqual(len(transformed), 8)
+        for symmetry in range(8):
+            self.assertEqual(
+                inverse_transform(transform(bits, symmetry), symmetry), bits)
+
+    def test_symmetries(self):
+        bits = 0x0000000810204000 | 0x3
+        self.assertEqual(symmetries(bits),
+                         [transform(bits, symmetry) for symmetry in range(8)])
+
+    def test_board_canonical(self):
+        board = BitBoard([[0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 1, 0, 0, 0, 0],
+                          [0, 0, 0, 1, 1, 0, 0, 0],
+                          [0, 0, 0, 2, 1, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0],
+                          [0, 0, 0, 0, 0, 0, 0, 0]])
+        own, other, symmetry = board.canonical(2)
+        self.assertEqual(transform(board.tokens[1], symmetry), own)
+        self.assertEqual(transform(board.tokens[0], symmetry), other)
+        self.assertEqual(Board(board.raw_board).canonical(2),
+                         (own, other, symmetry))
+        for turned in range(8):
+            rotated = BitBoard.from_bits(transform(board.tokens[0], turned),
+                                         transform(board.tokens[1], turned))
+            self.assertEqual(rotated.canonical(2)[:2], (own, other))
+
+    def test_canonical(self):
+        board = BitBoard.from_bits(0x0000000810000000, 0x0000001008000000)
+        own, other, symmetry = canonical(*board.tokens)
+        for other_symmetry in range(8):
+            self.assertEqual(
+                canonical(transform(board.tokens[0], other_symmetry),
+                          transform(board.tokens[1], other_symmetry))[:2],
+                (own, other))
+        self.assertEqual(transform(board.tokens[0], symmetry), own)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+This file contains tests for functions in book.py.
+"""
+
+import os
+import tempfile
+import unittest
+from client.bitboard import BitBoard, transform
+from client.book import (OpeningBook, build_book, write_book, START_BOARD,
+                         HEADER, RECORD)
+from client.player import Player
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'test.book')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_write_and_load(self):
+        entries = {(1, 2): 10, (3, 4): 20, (5, 6): 30}
+        write_book(self.path, entries)
+        book = OpeningBook(self.path)
+        self.assertEqual(dict(book.items()), entries)
+        self.assertEqual(len(book), 3)
+        self.assertEqual(book.lookup_canonical(3, 4), 20)
+        self.assertIsNone(book.lookup_canonical(4, 3))
+        # Fixed size records in a power of two table
+        self.assertEqual(os.path.getsize(self.path),
+                         HEADER.size + 8 * RECORD.size)
+        book.close()
+
+    def test_not_a_book(self):
+        with open(self.path, 'wb') as book_file:
+            book_file.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            OpeningBook(self.path)
+
+    def test_build_and_lookup_symmetric_positions(self):
+        write_book(self.path, build_book(plies=2, depth=2))
+        book = OpeningBook(self.path)
+        start = BitBoard(START_BOARD)
+        move = book.lookup(start, 1)
+        self.assertIn(move, list(start.find_valid(1)))
+        # All 4 first moves are symmetric, so they share one entry
+        self.assertEqual(len(book), 2)
+        for first in start.find_valid(1):
+            board = start.create_updated_board(first, 1)
+            reply = book.lookup(board, 2)
+            self.assertIn(reply, list(board.find_valid(2)))
+        # A symmetric board gets the symmetric move
+        mirrored = BitBoard.from_bits(transform(start.tokens[0], 2),
+                                      transform(start.tokens[1], 2))
+        self.assertIn(book.lookup(mirrored, 1),
+                      list(mirrored.find_valid(1)))
+        book.close()
+
+    def test_player_uses_book(self):
+        write_book(self.path, build_book(plies=1, depth=1))
+        book = OpeningBook(self.path)
+        player = Player(BitBoard(START_BOARD), 1, book=book)
+        move = player.get_move(1000)
+        self.assertEqual(player.nodes, 0)
+        self.assertIn(move, [[2, 4], [3, 5], [4, 2], [5, 3]])
+        book.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+This file contains tests for functions in cache.py.
+"""
+
+import unittest
+from client.bitboard import BitBoard, transform
+from client.book import START_BOARD
+from client.cache import PositionCache
+from client.player import Player
+
+OWN = 0x0000000810000000 | (1 << 19)
+OTHER = 0x0000001008000000 & ~(1 << 27)
+
+
+class TestPositionCache(unittest.TestCase):
+    def test_symmetric_positions_share_an_entry(self):
+        cache = PositionCache()
+        self.assertIsNone(cache.get(OWN, OTHER))
+        cache.put(OWN, OTHER, 7)
+        for symmetry in range(8):
+            self.assertEqual(cache.get(transform(OWN, symmetry),
+                                       transform(OTHER, symmetry)), 7)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 8)
+
+    def test_many_tokens_use_the_position(self):
+        cache = PositionCache(canonical_tokens=0)
+        cache.put(OWN, OTHER, 7)
+        self.assertEqual(cache.get(OWN, OTHER), 7)
+        self.assertIsNone(cache.get(transform(OWN, 1), transform(OTHER, 1)))
+
+    def test_least_recently_used_is_removed(self):
+        cache = PositionCache(max_entries=2, canonical_tokens=0)
+        cache.put(1, 2, 10)
+        cache.put(3, 4, 20)
+        # (1, 2) becomes the most recently used
+        self.assertEqual(cache.get(1, 2), 10)
+        cache.put(5, 6, 30)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(3, 4))
+        self.assertEqual(cache.get(1, 2), 10)
+        self.assertEqual(cache.get(5, 6), 30)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hit_rate, 0.0)
+
+    def test_player_gets_the_same_move(self):
+        for algorithm in ('alphabeta', 'expectimax'):
+            moves = []
+            for cache in (None, PositionCache()):
+                player = Player(BitBoard(START_BOARD), 1, max_depth=4,
+                                algorithm=algorithm, eval_cache=cache)
+                moves.append(player.iterative_deepening())
+                if cache is not None:
+                    self.assertGreater(cache.hits, 0)
+            self.assertEqual(moves[0], moves[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
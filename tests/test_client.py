@@ -2,8 +2,11 @@
 This file contains tests for functions in client.py
 """
 
+import asyncio
+import json
 import unittest
 from client import client
+from client.session import PlayerSession
 
 
 class TestPrepareResponse(unittest.TestCase):
@@ -11,5 +14,59 @@ class TestPrepareResponse(unittest.TestCase):
         self.assertEqual(client.prepare_response([2, 3]), b'[2, 3]\n')
 
 
+class TestParseMessage(unittest.TestCase):
+    def test_parse_message(self):
+        self.assertEqual(client.parse_message(b'{"player": 1}\n'),
+                         {'player': 1})
+
+    def test_parse_blank_message(self):
+        self.assertIsNone(client.parse_message(b'\r\n'))
+
+
+class _Writer:
+    """Collects what the client sends to the server"""
+
+    def __init__(self):
+        self.sent = b''
+
+    def write(self, data: bytes) -> None:
+        self.sent += data
+
+    async def drain(self) -> None:
+        pass
+
+
+class TestPlay(unittest.TestCase):
+    def setUp(self) -> None:
+        board = [[0] * 8 for _ in range(8)]
+        board[3][3] = board[4][4] = 1
+        board[3][4] = board[4][3] = 2
+        self.message = json.dumps({'board': board, 'player': 1,
+                                   'maxTurnTime': 200}).encode() + b'\n'
+
+    def _play(self, chunks):
+        async def run():
+            reader = asyncio.StreamReader()
+            for chunk in chunks:
+                reader.feed_data(chunk)
+            reader.feed_eof()
+            writer = _Writer()
+            await client.play(reader, writer,
+                              PlayerSession(max_depth=2, ponder=False))
+            return writer.sent
+        return asyncio.run(run())
+
+    def test_split_message(self):
+        middle = len(self.message) // 2
+        sent = self._play([self.message[:middle], self.message[middle:]])
+        self.assertEqual(sent.count(b'\n'), 1)
+
+    def test_coalesced_messages(self):
+        sent = self._play([self.message + self.message])
+        self.assertEqual(sent.count(b'\n'), 2)
+        self.assertIn(json.loads(sent.split(b'\n')[0]),
+                      [[2, 4], [3, 5], [4, 2], [5, 3]])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,76 @@
+"""
+This file contains tests for functions in endgame.py.
+"""
+
+import unittest
+from client.bitboard import (BitBoard, find_moves, find_flips, iter_squares,
+                             popcount)
+from client.endgame import EndgameSolver, BENCHMARK_POSITIONS, final_score
+from client.player import Player
+
+
+def _minimax(own, other, passed=False):
+    """Solve a position without any pruning, as a reference"""
+    moves = find_moves(own, other)
+    if not moves:
+        if passed:
+            return final_score(own, other)
+        return -_minimax(other, own, True)
+    values = []
+    for square in iter_squares(moves):
+        flipped = find_flips(own, other, square)
+        values.append(-_minimax(other & ~flipped,
+                                own | flipped | (1 << square)))
+    return max(values)
+
+
+class TestEndgameSolver(unittest.TestCase):
+    def test_final_score(self):
+        self.assertEqual(final_score(0b111, 0b1000), 2 + 60)
+        self.assertEqual(final_score(0b1, 0b110), -1 - 61)
+        self.assertEqual(final_score(0b1, 0b10), 0)
+
+    def test_benchmark_positions(self):
+        for name, own, other, value in BENCHMARK_POSITIONS:
+            self.assertEqual(EndgameSolver().solve(own, other), value, name)
+
+    def test_matches_minimax(self):
+        for name, own, other, value in BENCHMARK_POSITIONS:
+            if 64 - popcount(own | other) <= 8:
+                self.assertEqual(_minimax(own, other), value, name)
+
+    def test_best_move(self):
+        name, own, other, value = BENCHMARK_POSITIONS[0]
+        solver = EndgameSolver()
+        square, best = solver.best_move(own, other)
+        self.assertEqual(best, value)
+        flipped = find_flips(own, other, square)
+        self.assertEqual(-solver.solve(other & ~flipped,
+                                       own | flipped | (1 << square)), value)
+
+    def test_pass(self):
+        # Player to move has no move, but the opponent does
+        board = [[2] * 8 for _ in range(8)]
+        board[0][0] = 0
+        board[0][1] = 1
+        board[7][7] = 0
+        own = BitBoard(board).tokens[0]
+        other = BitBoard(board).tokens[1]
+        self.assertEqual(find_moves(other, own) != 0, True)
+        square, value = EndgameSolver().best_move(other, own)
+        self.assertEqual(square, 0)
+        self.assertEqual(value, 64)
+
+    def test_player_uses_solver(self):
+        name, own, other, value = BENCHMARK_POSITIONS[0]
+        player = Player(BitBoard.from_bits(own, other), 1)
+        move = player.get_move(5000)
+        self.assertEqual(player.nodes, 0)
+        square = move[0] * 8 + move[1]
+        flipped = find_flips(own, other, square)
+        self.assertEqual(-EndgameSolver().solve(
+            other & ~flipped, own | flipped | (1 << square)), value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+This file contains tests for functions in evaluation.py.
+"""
+
+import os
+import random
+import tempfile
+import unittest
+from client.bitboard import BitBoard, transform, SYMMETRIES
+from client.book import START_BOARD
+from client.evaluation import (PatternBoard, PatternEvaluator, PATTERNS,
+                               NUM_PHASES,
+                               game_phase, default_weights,
+                               get_default_evaluator, load_weights,
+                               save_weights, symmetric_weights)
+
+POSITION = (0x40E0FCD052C4001F, 0x2F1D032F2D3B3F20)
+"""Position with tokens in every pattern"""
+
+
+class TestPatternEvaluator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.evaluator = get_default_evaluator()
+
+    def test_every_square_is_read(self):
+        own = 0xFFFFFFFFFFFFFFFF
+        for pattern, index in self.evaluator.pattern_indexes(own, 0):
+            self.assertEqual(index, (3 ** len(PATTERNS[pattern][1]) - 1) // 2)
+        for pattern, index in self.evaluator.pattern_indexes(0, own):
+            self.assertEqual(index, 3 ** len(PATTERNS[pattern][1]) - 1)
+
+    def test_symmetric_positions_have_the_same_value(self):
+        own, other = POSITION
+        value = self.evaluator.evaluate(own, other, 3)
+        for symmetry in range(SYMMETRIES):
+            self.assertEqual(self.evaluator.evaluate(
+                transform(own, symmetry), transform(other, symmetry), 3),
+                value)
+
+    def test_value_is_relative_to_the_player(self):
+        own, other = POSITION
+        self.assertEqual(self.evaluator.evaluate(own, other, 0),
+                         -self.evaluator.evaluate(other, own, 0))
+
+    def test_corner_is_good(self):
+        start = (0x0000000810000000, 0x0000001008000000)
+        self.assertGreater(self.evaluator.evaluate(start[0] | 1, start[1], 0),
+                           self.evaluator.evaluate(*start, 0))
+        # The diagonal square next to an empty corner is bad
+        self.assertLess(self.evaluator.evaluate(start[0] | 1 << 9, start[1],
+                                                0),
+                        self.evaluator.evaluate(*start, 0))
+
+    def test_mobility(self):
+        own, other = POSITION
+        self.assertLess(self.evaluator.evaluate(own, other, 5),
+                        self.evaluator.evaluate(own, other, 2))
+
+    def test_game_phase(self):
+        self.assertEqual(game_phase(0x0000001818000000), 0)
+        self.assertEqual(game_phase(0xFFFFFFFFFFFFFFFF), NUM_PHASES - 1)
+        self.assertEqual(game_phase(0xFFFFFFFF00000003), NUM_PHASES // 2)
+
+    def test_value_bounds(self):
+        lowest, highest = self.evaluator.value_bounds()
+        self.assertLessEqual(lowest, 0)
+        self.assertGreaterEqual(highest, 0)
+        rng = random.Random(4)
+        for _ in range(200):
+            own = rng.getrandbits(64)
+            other = rng.getrandbits(64) & ~own
+            value = self.evaluator.evaluate(own, other, rng.randrange(61))
+            self.assertTrue(lowest <= value <= highest)
+
+    def test_custom_weights(self):
+        # The 4 edges are empty and use the changed weight
+        full = 0x007E7E7E7E7E7E00
+        weights, mobility, discs = default_weights()
+        weights[game_phase(full)][0][0] += 7
+        evaluator = PatternEvaluator(weights, mobility, discs)
+        self.assertEqual(evaluator.evaluate(full, 0, 0),
+                         self.evaluator.evaluate(full, 0, 0) + 4 * 7)
+
+    def test_symmetric_weights(self):
+        weights, mobility, discs = default_weights()
+        self.assertEqual(symmetric_weights(weights), weights)
+        rng = random.Random(5)
+        changed = [[[value + rng.randint(-30, 30) for value in table]
+                    for table in phase] for phase in weights]
+        own, other = POSITION
+        values = []
+        for changed_weights in [changed, symmetric_weights(changed)]:
+            evaluator = PatternEvaluator(changed_weights, mobility, discs)
+            values.append({evaluator.evaluate(transform(own, symmetry),
+                                              transform(other, symmetry), 3)
+                           for symmetry in range(SYMMETRIES)})
+        # Only the averaged weights give every symmetry the same value
+        self.assertGreater(len(values[0]), 1)
+        self.assertEqual(len(values[1]), 1)
+
+
+
+class TestPatternBoard(unittest.TestCase):
+    def setUp(self) -> None:
+        self.evaluator = get_default_evaluator()
+
+    def assert_indexes(self, board: PatternBoard) -> None:
+        self.assertEqual(board.indexes, [
+            index for _, index in self.evaluator.pattern_indexes(
+                *board.tokens)])
+
+    def test_indexes_follow_the_moves(self):
+        rng = random.Random(3)
+        board = PatternBoard(BitBoard(START_BOARD), self.evaluator)
+        self.assert_indexes(board)
+        player = 1
+        history = []
+        while board.valid_mask(1) or board.valid_mask(2):
+            if not board.valid_mask(player):
+                player = player % 2 + 1
+            board.make_move(rng.choice(list(board.find_valid(player))),
+                            player)
+            history.append((list(board.tokens), board.hash_key))
+            self.assert_indexes(board)
+            self.assertEqual(board.hash_key,
+                             BitBoard.from_bits(*board.tokens).hash_key)
+            player = player % 2 + 1
+        while history:
+            tokens, hash_key = history.pop()
+            self.assertEqual((board.tokens, board.hash_key),
+                             (tokens, hash_key))
+            board.unmake_move()
+            self.assert_indexes(board)
+        self.assertEqual(board.tokens, BitBoard(START_BOARD).tokens)
+
+    def test_evaluate_matches_evaluator(self):
+        board = PatternBoard(BitBoard.from_bits(*POSITION), self.evaluator)
+        for player in (1, 2):
+            own = board.tokens[player - 1]
+            other = board.tokens[player % 2]
+            self.assertEqual(board.evaluate(player, 5),
+                             self.evaluator.evaluate(own, other, 5))
+
+
+class TestWeightFile(unittest.TestCase):
+    def test_save_and_load(self):
+        weights, mobility, discs = default_weights()
+        weights[1][2][5] = -123
+        evaluator = PatternEvaluator(weights, [-1, -2, -3, -4], discs, 7)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'weights.bin')
+            save_weights(path, evaluator)
+            loaded = load_weights(path)
+        self.assertEqual(loaded.revision, 7)
+        self.assertEqual(loaded.weights, evaluator.weights)
+        self.assertEqual(loaded.mobility, [-1, -2, -3, -4])
+        self.assertEqual(loaded.discs, discs)
+
+    def test_load_symmetric(self):
+        weights, mobility, discs = default_weights()
+        # Edge index 1 is an own token in the corner, its mirror index
+        # 3 ** 7 the same token in the other corner
+        weights[0][0][1] += 10
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'weights.bin')
+            save_weights(path, PatternEvaluator(weights, mobility, discs, 2))
+            self.assertEqual(load_weights(path).weights, weights)
+            loaded = load_weights(path, symmetric=True)
+        self.assertEqual(loaded.revision, 2)
+        self.assertEqual(loaded.weights[0][0][1],
+                         loaded.weights[0][0][3 ** 7])
+        self.assertEqual(loaded.weights[0][0][1],
+                         default_weights()[0][0][0][1] + 5)
+
+    def test_bad_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'weights.bin')
+            with open(path, 'wb') as weight_file:
+                weight_file.write(b'AOBK' + bytes(100))
+            with self.assertRaises(ValueError):
+                load_weights(path)
+
+if __name__ == '__main__':
+    unittest.main()
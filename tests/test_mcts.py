@@ -0,0 +1,178 @@
+"""
+This file contains tests for functions in mcts.py.
+"""
+
+import random
+import time
+import unittest
+from client.bitboard import BitBoard, square_to_position
+from client.book import START_BOARD
+from client.mcts import MctsSearch, NodePool, PASS, playout
+
+
+class TestPlayout(unittest.TestCase):
+    def test_finished_game(self):
+        rng = random.Random(1)
+        self.assertEqual(playout(0xFFFFFFFF, 0xFFFFFFFF00000000, 1, rng), 0)
+        self.assertEqual(playout(0xFFFF, 0xFFFFFFFFFFFF0000, 1, rng), 2)
+        # Nobody can move, even with empty squares left
+        self.assertEqual(playout(0xFF, 0, 2, rng), 1)
+
+    def test_playout_ends_the_game(self):
+        rng = random.Random(2)
+        start = BitBoard(START_BOARD)
+        winners = {playout(start.tokens[0], start.tokens[1], 1, rng)
+                   for _ in range(50)}
+        self.assertLessEqual(winners, {0, 1, 2})
+        self.assertIn(1, winners)
+        self.assertIn(2, winners)
+
+
+class TestNodePool(unittest.TestCase):
+    def test_expand(self):
+        start = BitBoard(START_BOARD)
+        pool = NodePool(16)
+        root = pool.add(-1, PASS, start.tokens[0], start.tokens[1], 1)
+        self.assertTrue(pool.expand(root))
+        self.assertEqual(len(pool.children(root)), 4)
+        for child in pool.children(root):
+            board = start.copy()
+            board.update_board(square_to_position(pool.square[child]), 1)
+            self.assertEqual([pool.player_one[child], pool.player_two[child]],
+                             board.tokens)
+            self.assertEqual(pool.to_move[child], 2)
+            self.assertEqual(pool.parent[child], root)
+            self.assertEqual(pool.first_child[child], -1)
+
+    def test_expand_pass_and_end(self):
+        pool = NodePool(4)
+        # Player 2 has no move, player 1 can still play on square 2
+        node = pool.add(-1, PASS, 0x1, 0x2, 2)
+        self.assertTrue(pool.expand(node))
+        child = pool.children(node)[0]
+        self.assertEqual(pool.square[child], PASS)
+        self.assertEqual(pool.to_move[child], 1)
+        finished = pool.add(-1, PASS, 0xFF, 0, 1)
+        self.assertTrue(pool.expand(finished))
+        self.assertEqual(len(pool.children(finished)), 0)
+
+    def test_expand_full_pool(self):
+        start = BitBoard(START_BOARD)
+        pool = NodePool(3)
+        root = pool.add(-1, PASS, start.tokens[0], start.tokens[1], 1)
+        self.assertFalse(pool.expand(root))
+        self.assertEqual(pool.first_child[root], -1)
+        self.assertEqual(len(pool), 1)
+
+    def test_copy_subtree(self):
+        start = BitBoard(START_BOARD)
+        search = MctsSearch(seed=3)
+        search.set_position(start.tokens[0], start.tokens[1], 1)
+        search.search(max_playouts=200)
+        pool = search.pool
+        child = pool.children(search.root)[1]
+        copied = pool.copy_subtree(child)
+        self.assertEqual(copied.visits[0], pool.visits[child])
+        self.assertEqual(copied.parent[0], -1)
+        old = [child]
+        new = [0]
+        while old:
+            self.assertEqual(
+                [(pool.square[node], pool.visits[node], pool.wins[node])
+                 for node in old],
+                [(copied.square[node], copied.visits[node],
+                  copied.wins[node]) for node in new])
+            old = [node for parent in old for node in pool.children(parent)]
+            new = [node for parent in new
+                   for node in copied.children(parent)]
+            self.assertEqual(len(old), len(new))
+
+
+class TestMctsSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.start = BitBoard(START_BOARD)
+
+    def test_search(self):
+        search = MctsSearch(seed=4)
+        search.set_position(self.start.tokens[0], self.start.tokens[1], 1)
+        self.assertEqual(search.search(max_playouts=300), 300)
+        pool = search.pool
+        self.assertEqual(pool.visits[search.root], 300)
+        stats = search.root_stats()
+        self.assertEqual(sum(visits for visits, _ in stats.values()), 300)
+        moves = self.start.valid_mask(1)
+        self.assertEqual(sorted(stats), [square for square in range(64)
+                                         if moves >> square & 1])
+        square, win_rate = search.best_move()
+        self.assertEqual(stats[square][0], max(
+            visits for visits, _ in stats.values()))
+        self.assertTrue(0 <= win_rate <= 1)
+
+    def test_seed_repeats_the_search(self):
+        results = []
+        for _ in range(2):
+            search = MctsSearch(seed=5)
+            search.set_position(self.start.tokens[0], self.start.tokens[1],
+                                1)
+            search.search(max_playouts=100)
+            results.append(search.root_stats())
+        self.assertEqual(results[0], results[1])
+
+    def test_search_stops_at_deadline(self):
+        search = MctsSearch(seed=6)
+        search.set_position(self.start.tokens[0], self.start.tokens[1], 1)
+        start = time.monotonic()
+        self.assertGreaterEqual(search.search(start + 0.1), 1)
+        self.assertLess(time.monotonic() - start, 0.2)
+
+    def test_tree_is_reused(self):
+        search = MctsSearch(seed=7)
+        search.set_position(self.start.tokens[0], self.start.tokens[1], 1)
+        search.search(max_playouts=300)
+        pool = search.pool
+        reply = pool.children(pool.children(search.root)[0])[0]
+        visits = pool.visits[reply]
+        search.set_position(pool.player_one[reply], pool.player_two[reply],
+                            1)
+        self.assertEqual(search.root, reply)
+        self.assertEqual(search.reused, visits)
+        search.search(max_playouts=10)
+        self.assertEqual(pool.visits[reply], visits + 10)
+
+        # A position that is not in the tree starts a new tree
+        search.set_position(self.start.tokens[0], self.start.tokens[1], 1)
+        self.assertEqual((search.root, len(pool), search.reused), (0, 1, 0))
+
+    def test_full_tree_is_compacted(self):
+        search = MctsSearch(max_nodes=200, seed=8)
+        search.set_position(self.start.tokens[0], self.start.tokens[1], 1)
+        search.search(max_playouts=400)
+        pool = search.pool
+        self.assertGreater(len(pool), 100)
+        child = pool.children(search.root)[2]
+        visits = pool.visits[child]
+        search.set_position(pool.player_one[child], pool.player_two[child],
+                            2)
+        self.assertIsNot(search.pool, pool)
+        self.assertEqual(search.root, 0)
+        self.assertEqual(search.reused, visits)
+        self.assertLess(len(search.pool), len(pool))
+
+    def test_finds_the_only_winning_move(self):
+        # 8 empty squares, the endgame solver wins by 12 with square 1 and
+        # loses by at least 18 with the other 3 moves
+        own, other = 0x6B331319143C3C7C, 0x040C8CE66BC3C381
+        search = MctsSearch(seed=9)
+        search.set_position(own, other, 1)
+        search.search(max_playouts=500)
+        square, win_rate = search.best_move()
+        self.assertEqual(square, 1)
+        self.assertGreater(win_rate, 0.5)
+
+    def test_search_needs_position(self):
+        with self.assertRaises(ValueError):
+            MctsSearch().search(max_playouts=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
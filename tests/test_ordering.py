@@ -0,0 +1,73 @@
+"""
+This file contains tests for functions in ordering.py.
+"""
+
+import unittest
+from client.bitboard import BitBoard, square_to_position
+from client.book import START_BOARD
+from client.ordering import MoveOrdering, KILLERS_PER_PLY
+from client.player import Player
+from client.support import Position
+
+
+class TestMoveOrdering(unittest.TestCase):
+    def test_static_order(self):
+        moves = [Position(1, 1), Position(0, 0), Position(3, 5)]
+        ordered = MoveOrdering().order(list(moves), [0, 0], 1, 5, 0)
+        self.assertEqual(ordered[0], Position(0, 0))
+        self.assertEqual(ordered[-1], Position(1, 1))
+        self.assertEqual(set(ordered), set(moves))
+
+    def test_hash_move_and_killers_first(self):
+        ordering = MoveOrdering()
+        moves = [Position(1, 0), Position(3, 5), Position(2, 0)]
+        ordering.record_cutoff(Position(3, 5), 1, 4,1)
+        ordered = ordering.order(list(moves), [0, 0], 1, 4, 2)
+        self.assertEqual(ordered[0], Position(3, 5))
+        ordered = ordering.order(list(moves), [0, 0], 1, 4, 2,
+                                 Position(2, 0))
+        self.assertEqual(ordered[:2], [Position(2, 0), Position(3, 5)])
+        # Killers are kept per ply
+        self.assertEqual(ordering.order(list(moves), [0, 0], 1, 3, 2)[0],
+                         Position(2, 0))
+
+    def test_corners_before_killers(self):
+        ordering = MoveOrdering()
+        moves = [Position(3, 5), Position(7, 7), Position(2, 2)]
+        ordering.record_cutoff(Position(3, 5), 1, 4, 2)
+        ordered = ordering.order(list(moves), [0, 0], 1, 4, 2)
+        self.assertEqual(ordered[:2], [Position(7, 7), Position(3, 5)])
+        # The hash move still comes before the corners
+        ordered = ordering.order(list(moves), [0, 0], 1, 4, 2,
+                                 Position(2, 2))
+        self.assertEqual(ordered, [Position(2, 2), Position(7, 7),
+                                   Position(3, 5)])
+
+    def test_killers_and_history(self):
+        ordering = MoveOrdering()
+        for square in range(KILLERS_PER_PLY + 1):
+            ordering.record_cutoff(square_to_position(square), 2, 3, 1)
+        self.assertEqual(len(ordering.killers[3]), KILLERS_PER_PLY)
+        self.assertEqual(ordering.killers[3][0], KILLERS_PER_PLY)
+        self.assertEqual(ordering.history[1][0], 4)
+        self.assertEqual(ordering.history[0][0], 0)
+        # Two plies were played, so ply 3 becomes ply 1
+        ordering.new_search()
+        self.assertEqual(ordering.killers[1][0], KILLERS_PER_PLY)
+        self.assertEqual(ordering.history[1][0], 2)
+        ordering.clear()
+        self.assertEqual(ordering.killers[1], [])
+
+    def test_search_records_cutoffs(self):
+        for algorithm in ('alphabeta', 'pvs'):
+            player = Player(BitBoard(START_BOARD), 1, max_depth=5,
+                            algorithm=algorithm)
+            move = player.iterative_deepening()
+            self.assertGreater(player.cutoffs, 0)
+            self.assertIn(move, list(BitBoard(START_BOARD).find_valid(1)))
+            # The history of the first search is kept for the next one
+            self.assertTrue(any(player.ordering.history[0]) or
+                            any(player.ordering.history[1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+This file contains tests for functions in parallel.py.
+"""
+
+import unittest
+from client import parallel
+from client.bitboard import BitBoard, square_to_position
+from client.player import Player
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.input_board = [[0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 1, 0, 0, 0, 0, 0],
+                            [0, 1, 2, 0, 0, 2, 0, 0],
+                            [0, 2, 1, 1, 1, 0, 0, 0],
+                            [0, 1, 1, 1, 1, 0, 0, 0],
+                            [0, 1, 1, 2, 2, 0, 0, 0],
+                            [0, 1, 1, 2, 1, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0]]
+
+    def tearDown(self) -> None:
+        parallel.shutdown_pool()
+
+    def test_pool_is_reused(self):
+        pool = parallel.get_pool(2)
+        self.assertIs(parallel.get_pool(2), pool)
+
+    def test_search_task(self):
+        board = BitBoard(self.input_board)
+        task = parallel.SearchTask(board.tokens[0], board.tokens[1], 2,
+                                   7 * 8, 2, 'alphabeta', None)
+        value, nodes, depth_limited = parallel.search_task(task)
+        player = Player(board, 2, algorithm='alphabeta')
+        player.search_depth = 2
+        self.assertEqual(value, player.search_move(square_to_position(7 * 8)))
+        self.assertGreater(nodes, 0)
+        self.assertTrue(depth_limited)
+
+    def test_search_task_starts_new_search(self):
+        board = BitBoard(self.input_board)
+        tasks = [parallel.SearchTask(board.tokens[0], board.tokens[1], 2,
+                                     7 * 8, 2, 'negamax', None, generation)
+                 for generation in [5, 5, 6]]
+        generations = []
+        for task in tasks:
+            parallel.search_task(task)
+            generations.append(
+                parallel._worker_tables[(2, 'negamax')].generation)
+        # Only a new generation ages the entries of the worker's table
+        self.assertEqual(generations[1], generations[0])
+        self.assertEqual(generations[2], generations[1] + 1)
+
+    def test_parallel_matches_serial(self):
+        moves = []
+        for workers in [0, 2]:
+            player = Player(BitBoard(self.input_board), 2, max_depth=2,
+                            workers=workers)
+            moves.append(player.get_move(60000))
+        self.assertEqual(moves[0], moves[1])
+
+    def test_mcts_task(self):
+        board = BitBoard(self.input_board)
+        task = parallel.MctsTask(board.tokens[0], board.tokens[1], 2, 1,
+                                 None, 50)
+        stats, playouts = parallel.mcts_task(task)
+        self.assertEqual(playouts, 50)
+        self.assertEqual(sum(visits for visits, _ in stats.values()), 50)
+        self.assertEqual(sorted(stats), sorted(
+            move.row * 8 + move.column for move in board.find_valid(2)))
+
+    def test_parallel_mcts(self):
+        board = BitBoard(self.input_board)
+        player = Player(board, 2, algorithm='mcts', workers=2)
+        move = player.get_move(300)
+        self.assertIn(move, [[pos.row, pos.column]
+                             for pos in board.find_valid(2)])
+        self.assertGreater(player.nodes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
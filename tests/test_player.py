@@ -2,9 +2,13 @@
 This file contains tests for functions in support.py.
 """
 
+import time
 import unittest
+from client.benchmark import SEARCH_POSITIONS
+from client.bitboard import BitBoard
 from client.support import Board
-from client.player import Player
+from client.player import Player, INFINITY
+from client.transposition import TranspositionTable
 
 
 class TestPlayer(unittest.TestCase):
@@ -24,9 +28,200 @@ class TestPlayer(unittest.TestCase):
         Player(Board(self.input_board), self.player_num)
 
     def test_get_move(self):
-        player = Player(Board(self.input_board), self.player_num)
+        # The search is time limited, so fix the depth to get the same move.
+        # At depth 2 the opponent's replies add no evaluation, so this only
+        # checks that the corner (7, 0) has the best value for the bot. The
+        # original player found the same corner through an unbounded search
+        # with the roles of the players swapped, see
+        # test_expectimax_averages_the_opponent
+        player = Player(Board(self.input_board), self.player_num, max_depth=2)
         self.assertEqual(player.get_move(), [7, 0])
 
+    def test_get_move_honors_turn_time(self):
+        player = Player(Board(self.input_board), self.player_num)
+        start = time.monotonic()
+        move = player.get_move(200)
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertIn(move, [[pos.row, pos.column]
+                             for pos in player.board.find_valid(2)])
+
+    def test_mcts_mode(self):
+        player = Player(Board(self.input_board), self.player_num,
+                        algorithm='mcts')
+        start = time.monotonic()
+        move = player.get_move(200)
+        # The playouts stop at 150ms, the rest is a margin for busy machines
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertIn(move, [[pos.row, pos.column]
+                             for pos in player.board.find_valid(2)])
+        self.assertEqual(player.nodes, player.mcts.playouts)
+        self.assertGreater(player.nodes, 0)
+
+    def test_get_move_stops_when_tree_is_searched(self):
+        # Only one empty square is left, so the search ends at depth 1
+        board = [[1] * 8 for _ in range(8)]
+        board[0][0] = 0
+        board[0][1] = 2
+        player = Player(Board(board), 1, endgame_empties=0)
+        self.assertEqual(player.get_move(10000), [0, 0])
+        self.assertEqual(player.search_depth, 1)
+
+
+class TestPruningSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.input_board = [[0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 1, 0, 0, 0, 0, 0],
+                            [0, 1, 2, 0, 0, 2, 0, 0],
+                            [0, 2, 1, 1, 1, 0, 0, 0],
+                            [0, 1, 1, 1, 1, 0, 0, 0],
+                            [0, 1, 1, 2, 2, 0, 0, 0],
+                            [0, 1, 1, 2, 1, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0]]
+        self.player_num = 2
+
+    def _minimax(self, player, position, board, depth, curr_player):
+        """Unpruned minimax, used as a reference for the pruning searches"""
+        value, opponent_moves, stop = player._expand(
+            position, board, depth, curr_player)
+        values = [self._minimax(player, move, board, depth + 1,
+                                curr_player % 2 + 1)
+                  for move in opponent_moves] if not stop else []
+        board.unmake_move()
+        if stop:
+            return value
+        if curr_player == player.player_num:
+            return value + min(values)
+        return max(values)
+
+    def _expectimax(self, player, position, board, depth, curr_player):
+        """Unpruned expectimax, the bot maxes and the opponent is random"""
+        new_board = board.create_updated_board(position, curr_player)
+        opponent = curr_player % 2 + 1
+        replies = list(new_board.find_valid(opponent))
+        value = 0
+        if curr_player == player.player_num:
+            value = player._compute_board_value(new_board, curr_player,
+                                                len(replies))
+        if depth >= player.search_depth or not replies:
+            return value
+        values = [self._expectimax(player, reply, new_board, depth + 1,
+                                   opponent) for reply in replies]
+        if curr_player == player.player_num:
+            return value + sum(values) / len(values)
+        return max(values)
+
+    def test_expectimax_averages_the_opponent(self):
+        for depth in (3, 4):
+            for pruning in (False, True):
+                player = Player(Board(self.input_board), self.player_num,
+                                chance_pruning=pruning)
+                player.search_depth = depth
+                for move in player.board.find_valid(self.player_num):
+                    self.assertAlmostEqual(
+                        player.compute_val(move, player._search_board(), 1,
+                                           self.player_num),
+                        self._expectimax(player, move, player.board, 1,
+                                         self.player_num))
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            Player(Board(self.input_board), self.player_num, algorithm='dfs')
+
+    def test_pruning_values_match_minimax(self):
+        for algorithm in ['alpha_beta', 'negamax', 'pvs']:
+            player = Player(Board(self.input_board), self.player_num)
+            player.search_depth = 3
+            search = getattr(player, algorithm)
+            for move in player.board.find_valid(self.player_num):
+                self.assertEqual(
+                    search(move, player.board, 1, self.player_num,
+                           -INFINITY, INFINITY),
+                    self._minimax(player, move, player.board, 1,
+                                  self.player_num))
+
+    def test_pruning_modes_agree(self):
+        moves = []
+        for algorithm in ['alphabeta', 'negamax', 'pvs']:
+            player = Player(Board(self.input_board), self.player_num,
+                            max_depth=4, algorithm=algorithm)
+            moves.append(player.get_move(60000))
+        self.assertEqual(moves, [moves[0]] * 3)
+
+    def test_transposition_table_keeps_values(self):
+        for algorithm in ['expectimax', 'alphabeta', 'pvs']:
+            values = []
+            for use_table in [False, True]:
+                player = Player(Board(self.input_board), self.player_num,
+                                max_depth=3, algorithm=algorithm,
+                                use_transposition_table=use_table)
+                player.get_move(60000)
+                fringe = player.search_root(
+                    list(player.board.find_valid(self.player_num)))
+                values.append(max(value for value, _ in fringe))
+            self.assertEqual(values[0], values[1])
+
+    def test_search_leaves_board_unchanged(self):
+        for algorithm in ['expectimax', 'alphabeta', 'negamax', 'pvs']:
+            player = Player(Board(self.input_board), self.player_num,
+                            max_depth=3, algorithm=algorithm)
+            player.get_move(60000)
+            self.assertEqual(player.board.raw_board, self.input_board)
+            self.assertEqual(player.board.undo_stack, [])
+
+    def test_pruning_searches_fewer_nodes(self):
+        expectimax = Player(Board(self.input_board), self.player_num,
+                            max_depth=3, chance_pruning=False)
+        expectimax.get_move(60000)
+        alpha_beta = Player(Board(self.input_board), self.player_num,
+                            max_depth=3, algorithm='alphabeta')
+        alpha_beta.get_move(60000)
+        self.assertLess(alpha_beta.nodes, expectimax.nodes)
+
+    def test_chance_pruning_keeps_the_move(self):
+        # The regression positions: every search must give the same move
+        # and value as the full expectimax, with fewer nodes
+        positions = [(own, other) for _, own, other in SEARCH_POSITIONS]
+        positions.append(tuple(BitBoard(self.input_board).tokens))
+        for depth in (3, 4):
+            for own, other in positions:
+                results = []
+                for pruning in (False, True):
+                    player = Player(BitBoard.from_bits(own, other), 1,
+                                    max_depth=depth, endgame_empties=0,
+                                    chance_pruning=pruning)
+                    move = player.iterative_deepening()
+                    results.append((move, player.best_value, player.nodes))
+                self.assertEqual(results[0][:2], results[1][:2])
+                self.assertLessEqual(results[1][2], results[0][2])
+
+    def test_reused_table_keeps_the_move(self):
+        # Values are sums of evaluations, so a table filled by a deeper
+        # search, as after pondering, must not change a shallower one
+        positions = [(own, other) for _, own, other in SEARCH_POSITIONS]
+        positions.append(tuple(BitBoard(self.input_board).tokens))
+        variants = [('expectimax', False), ('expectimax', True),
+                    ('alphabeta', True), ('negamax', True), ('pvs', True)]
+        for algorithm, pruning in variants:
+            for own, other in positions:
+                results = []
+                for table in (TranspositionTable(), TranspositionTable()):
+                    if not results:
+                        deep = Player(BitBoard.from_bits(own, other), 1,
+                                      max_depth=4, algorithm=algorithm,
+                                      transposition_table=table,
+                                      endgame_empties=0,
+                                      chance_pruning=pruning)
+                        deep.iterative_deepening()
+                    player = Player(BitBoard.from_bits(own, other), 1,
+                                    max_depth=2, algorithm=algorithm,
+                                    transposition_table=table,
+                                    endgame_empties=0,
+                                    chance_pruning=pruning)
+                    move = player.iterative_deepening()
+                    results.append((move, player.best_value))
+                self.assertEqual(results[0], results[1],
+                                 (algorithm, pruning, own, other))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,21 @@
+"""
+This file contains tests for functions in protocol.py
+"""
+
+import unittest
+from client.protocol import parse_move
+
+
+class TestParseMove(unittest.TestCase):
+    def test_parse_move(self):
+        self.assertEqual(parse_move(b'[2, 3]\n').row, 2)
+        self.assertEqual(parse_move(b'[2, 3]\n').column, 3)
+
+    def test_parse_bad_move(self):
+        self.assertIsNone(parse_move(b'hello\n'))
+        self.assertIsNone(parse_move(b'[1]\n'))
+        self.assertIsNone(parse_move(b'\r\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
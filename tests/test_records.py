@@ -0,0 +1,125 @@
+"""
+This file contains tests for functions in records.py.
+"""
+
+import math
+import os
+import tempfile
+import unittest
+from client.bitboard import BitBoard
+from client.book import START_BOARD
+from client.records import (GameRecords, GameRecordWriter, PositionRecord,
+                            HEADER, RECORD)
+from client.session import PlayerSession
+
+
+class TestGameRecords(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games.rec')
+        self.start = BitBoard(START_BOARD)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_write_and_read(self):
+        writer = GameRecordWriter(self.path)
+        writer.record(self.start.tokens, 1, 19, 1.5, 0.25, 6, 'book')
+        writer.record((0xFF, 0xFF00), 1, 16)
+        writer.close()
+        self.assertEqual(os.path.getsize(self.path),
+                         HEADER.size + 2 * RECORD.size)
+
+        records = GameRecords(self.path)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0], PositionRecord(
+            self.start.tokens[0], self.start.tokens[1], 0, 1.5, 250000, 1,
+            19, 6, 1))
+        last = records[-1]
+        self.assertEqual(last.game, 0)
+        self.assertTrue(math.isnan(last.value))
+        self.assertEqual([record[6] for record in records], [19, 16])
+        with self.assertRaises(IndexError):
+            records[2]
+        records.close()
+
+    def test_games(self):
+        writer = GameRecordWriter(self.path)
+        # Tokens only grow during a game, and the player stays the same
+        writer.record((0x1, 0x2), 1, 0)
+        writer.record((0x7, 0x8), 1, 0)
+        writer.record((0x1, 0x2), 1, 0)
+        writer.record((0x7, 0x18), 2, 0)
+        writer.close()
+        # Games of an existing file are continued
+        writer = GameRecordWriter(self.path)
+        writer.record((0xF, 0x30), 2, 0)
+        writer.close()
+
+        records = GameRecords(self.path)
+        self.assertEqual(list(records.games()),
+                         [(0, 0, 2), (1, 2, 3), (2, 3, 4), (3, 4, 5)])
+        self.assertEqual([record[2] for record in records.records(1, 4)],
+                         [0, 1, 2])
+        records.close()
+
+    def test_records_in_chunks(self):
+        writer = GameRecordWriter(self.path)
+        for index in range(10000):
+            writer.record((index, 0), 1, index % 64)
+        writer.close()
+        records = GameRecords(self.path)
+        self.assertEqual([record[0] for record in records],
+                         list(range(10000)))
+        self.assertEqual(sum(1 for _ in records.records(4000, 9000)), 5000)
+        # The reader can be closed while a loop is unfinished
+        loop = iter(records)
+        next(loop)
+        records.close()
+
+    def test_partial_record(self):
+        writer = GameRecordWriter(self.path)
+        writer.record(self.start.tokens, 1, 19)
+        writer.close()
+        with open(self.path, 'ab') as record_file:
+            record_file.write(b'\x01' * 5)
+        records = GameRecords(self.path)
+        self.assertEqual(len(records), 1)
+        records.close()
+
+        # The writer drops it before appending
+        writer = GameRecordWriter(self.path)
+        writer.record((0x1, 0x2), 2, 3)
+        writer.close()
+        records = GameRecords(self.path)
+        self.assertEqual([record[6] for record in records], [19, 3])
+        records.close()
+
+    def test_bad_file(self):
+        with open(self.path, 'wb') as record_file:
+            record_file.write(b'not a record file')
+        with self.assertRaises(ValueError):
+            GameRecords(self.path)
+        with self.assertRaises(ValueError):
+            GameRecordWriter(self.path)
+
+    def test_session_records_moves(self):
+        writer = GameRecordWriter(self.path)
+        session = PlayerSession(max_depth=2, ponder=False, recorder=writer)
+        move = session.get_move(BitBoard(START_BOARD), 1, 1000)
+        writer.close()
+        records = GameRecords(self.path)
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual((record.player_one, record.player_two),
+                         tuple(self.start.tokens))
+        self.assertEqual(record.square, move[0] * 8 + move[1])
+        self.assertEqual(record.depth, session.player.completed_depth)
+        self.assertAlmostEqual(record.value, session.player.best_value,
+                               places=4)
+        self.assertGreater(record.microseconds, 0)
+        records.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+This file contains tests for functions in server.py.
+"""
+
+import asyncio
+import json
+import unittest
+from client.bitboard import BitBoard
+from client.server import LocalServer, random_opening
+
+
+async def _first_move_client(port, delay=0.0, illegal=False):
+    """Client playing the first valid move of every turn"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        board = BitBoard(message['board'])
+        move = next(board.find_valid(message['player']))
+        await asyncio.sleep(delay)
+        reply = [0, 0] if illegal else [move.row, move.column]
+        writer.write('{}\n'.format(reply).encode())
+        await writer.drain()
+    writer.close()
+
+
+def _play(first, second, max_turn_time=1000):
+    """Play a game on a local server between two test clients"""
+    async def run():
+        server = LocalServer(max_turn_time, games=1)
+        listener = await asyncio.start_server(server.handle_connection,
+                                              '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            first_client = asyncio.ensure_future(first(port))
+            # Let the first client connect first, so it is player 1
+            while server.waiting is None:
+                await asyncio.sleep(0.01)
+            await asyncio.gather(first_client, second(port))
+            await server.finished.wait()
+        return server.results[0]
+    return asyncio.run(run())
+
+
+class TestServer(unittest.TestCase):
+    def test_random_opening(self):
+        board, player = random_opening(4, 1)
+        self.assertEqual(sum(board.score), 8)
+        self.assertEqual(player, 1)
+        self.assertEqual(random_opening(4, 1)[0], board)
+
+    def test_full_game(self):
+        result = _play(_first_move_client, _first_move_client)
+        self.assertIsNone(result.forfeit)
+        self.assertEqual(result.winner,
+                         0 if result.score[0] == result.score[1]
+                         else 1 if result.score[0] > result.score[1] else 2)
+        moves = len(result.move_times[0]) + len(result.move_times[1])
+        self.assertEqual(sum(result.score), 4 + moves)
+
+    def test_illegal_move_forfeits(self):
+        result = _play(
+            lambda port: _first_move_client(port, illegal=True),
+            _first_move_client)
+        self.assertEqual(result.forfeit, 1)
+        self.assertEqual(result.winner, 2)
+
+    def test_timeout_forfeits(self):
+        result = _play(
+            _first_move_client,
+            lambda port: _first_move_client(port, delay=0.3),
+            max_turn_time=100)
+        self.assertEqual(result.forfeit, 2)
+        self.assertEqual(result.timeouts, [0, 1])
+        self.assertEqual(result.winner, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+This file contains tests for functions in session.py.
+"""
+
+import time
+import unittest
+from client.bitboard import BitBoard
+from client.session import PlayerSession
+
+
+class TestPlayerSession(unittest.TestCase):
+    def setUp(self) -> None:
+        self.input_board = [[0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 1, 0, 0, 0, 0, 0],
+                            [0, 1, 2, 0, 0, 2, 0, 0],
+                            [0, 2, 1, 1, 1, 0, 0, 0],
+                            [0, 1, 1, 1, 1, 0, 0, 0],
+                            [0, 1, 1, 2, 2, 0, 0, 0],
+                            [0, 1, 1, 2, 1, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0]]
+
+    def test_player_is_kept_between_turns(self):
+        session = PlayerSession(max_depth=2, ponder=False)
+        session.get_move(BitBoard(self.input_board), 2, 1000)
+        player = session.player
+        stores = session.table.stores
+        session.get_move(BitBoard(self.input_board), 2, 1000)
+        self.assertIs(session.player, player)
+        # The second search finds the first one in the table
+        self.assertEqual(session.table.stores, stores)
+        self.assertGreater(session.table.hits, 0)
+
+    def test_new_player_number_resets_the_table(self):
+        session = PlayerSession(max_depth=2, ponder=False)
+        session.get_move(BitBoard(self.input_board), 2, 1000)
+        session.get_move(BitBoard(self.input_board), 1, 1000)
+        self.assertEqual(session.player.player_num, 1)
+
+    def test_ponder_hit(self):
+        session = PlayerSession(max_depth=3, algorithm='alphabeta')
+        board = BitBoard(self.input_board)
+        move = session.get_move(board, 2, 1000)
+        session.start_pondering(move)
+        self.assertIsNotNone(session.ponder_thread)
+        # The killer moves and history learned by pondering are kept
+        self.assertIs(session.ponder_player.ordering, session.ordering)
+        expected = session.ponder_board
+        time.sleep(0.05)
+        session.get_move(expected.copy(), 2, 1000)
+        self.assertIsNone(session.ponder_thread)
+        self.assertEqual((session.ponder_hits, session.ponder_misses), (1, 0))
+
+    def test_ponder_miss(self):
+        session = PlayerSession(max_depth=3)
+        move = session.get_move(BitBoard(self.input_board), 2, 1000)
+        session.start_pondering(move)
+        session.get_move(BitBoard(self.input_board), 2, 1000)
+        self.assertEqual((session.ponder_hits, session.ponder_misses), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,9 @@
 This file contains tests for functions in support.py.
 """
 
+import pickle
 import unittest
-from client.support import Position, Direction, Board
+from client.support import Position, Direction, Board, SQUARE_POSITIONS
 
 
 class TestPosition(unittest.TestCase):
@@ -45,6 +46,22 @@ class TestPosition(unittest.TestCase):
         self.assertEqual(off_board2 + Direction.DOWN_RIGHT, None)
         self.assertEqual(off_board2 + Direction.RIGHT, None)
 
+    def test_board_positions_are_shared(self):
+        self.assertIs(SQUARE_POSITIONS[9] + Direction.UP_LEFT,
+                      SQUARE_POSITIONS[0])
+        self.assertIs(Position(1, 1) + Direction.DOWN, SQUARE_POSITIONS[17])
+        self.assertIsNone(SQUARE_POSITIONS[7] + Direction.RIGHT)
+        # Positions outside the board still work
+        self.assertEqual(Position(-1, 0) + Direction.DOWN, Position(0, 0))
+
+    def test_position_value(self):
+        position = Position(2, 5)
+        self.assertEqual(position.square, 21)
+        self.assertEqual(repr(position), 'Position(row=2, column=5)')
+        self.assertEqual(pickle.loads(pickle.dumps(position)), position)
+        self.assertEqual({position: 1}[SQUARE_POSITIONS[21]], 1)
+        self.assertNotEqual(position, (2, 5))
+
     def test_opposite_dir(self):
         self.assertEqual(Direction.UP.get_opposite(), Direction.DOWN)
         self.assertEqual(Direction.DOWN.get_opposite(), Direction.UP)
@@ -214,6 +231,24 @@ class TestBoard(unittest.TestCase):
                          ]
                          )
 
+    def test_find_valid_returns_each_position_once(self):
+        # (2, 2) flanks (2, 3) to the right and (3, 3) down to the right
+        board = Board([[0, 0, 0, 0, 0, 0, 0, 0],
+                       [0, 0, 0, 0, 0, 0, 0, 0],
+                       [0, 0, 0, 2, 1, 0, 0, 0],
+                       [0, 0, 0, 2, 0, 0, 0, 0],
+                       [0, 0, 0, 0, 1, 0, 0, 0],
+                       [0, 0, 0, 0, 0, 0, 0, 0],
+                       [0, 0, 0, 0, 0, 0, 0, 0],
+                       [0, 0, 0, 0, 0, 0, 0, 0]])
+        moves = list(board.find_valid(1))
+        self.assertEqual(moves.count(Position(2, 2)), 1)
+        self.assertEqual(len(moves), len(set(moves)))
+        self.assertEqual(board.count_valid(1), len(moves))
+        mask = board.valid_mask(1)
+        self.assertEqual(mask, sum(1 << (move.row * 8 + move.column)
+                                   for move in moves))
+
     def test_create_updated_board(self):
         board = Board(self.input_board)
 
@@ -247,6 +282,34 @@ class TestBoard(unittest.TestCase):
                           [0, 0, 0, 0, 0, 0, 0, 0],
                           [0, 0, 0, 0, 0, 0, 0, 0]])
 
+    def test_create_updated_board_copies_raw_board(self):
+        board = Board(self.input_board)
+        board.create_updated_board(self.pos1 + Direction.LEFT, 2)
+        self.assertEqual(board.raw_board[3], [0, 0, 0, 1, 2, 0, 0, 0])
+        self.assertEqual(board.score, [2, 2])
+        self.assertEqual(len(board.curr_tokens), 4)
+
+    def test_make_and_unmake_move(self):
+        board = Board(self.input_board)
+        raw_board = [row[:] for row in board.raw_board]
+        curr_tokens = dict(board.curr_tokens)
+        score = board.score[:]
+
+        board.make_move(self.pos1 + Direction.LEFT, 2)
+        self.assertEqual(board.raw_board[3], [0, 0, 2, 2, 2, 0, 0, 0])
+        self.assertEqual(board.score, [1, 4])
+        board.make_move(self.pos1 + Direction.UP_LEFT, 1)
+        self.assertEqual(board.score, [3, 3])
+
+        board.unmake_move()
+        self.assertEqual(board.raw_board[3], [0, 0, 2, 2, 2, 0, 0, 0])
+        self.assertEqual(board.score, [1, 4])
+        board.unmake_move()
+        self.assertEqual(board.raw_board, raw_board)
+        self.assertEqual(board.curr_tokens, curr_tokens)
+        self.assertEqual(board.score, score)
+        self.assertEqual(board.undo_stack, [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+"""
+This file contains tests for functions in telemetry.py.
+"""
+
+import os
+import tempfile
+import unittest
+from client.bitboard import BitBoard
+from client.book import START_BOARD
+from client.player import Player
+from client.telemetry import MoveLog, branching_factor, read_log
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_branching_factor(self):
+        self.assertIsNone(branching_factor([]))
+        self.assertIsNone(branching_factor([{'nodes': 4}]))
+        self.assertEqual(branching_factor([{'nodes': 4}, {'nodes': 10}]),
+                         2.5)
+
+    def test_move_record(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'moves.log')
+            log = MoveLog(path)
+            player = Player(BitBoard(START_BOARD), 1, max_depth=4,
+                            algorithm='pvs', telemetry=log)
+            move = player.get_move(10000)
+            player.get_move(10000)
+            log.close()
+            records = read_log(path)
+        self.assertEqual(len(records), 2)
+        record = records[0]
+        self.assertEqual(record['move'], move)
+        self.assertEqual(record['source'], 'search')
+        self.assertEqual(record['depth'], 4)
+        self.assertEqual([iteration['depth']
+                          for iteration in record['iterations']],
+                         [1, 2, 3, 4])
+        self.assertEqual(sum(iteration['nodes']
+                             for iteration in record['iterations']),
+                         record['nodes'])
+        self.assertGreater(record['evaluations'], 0)
+        self.assertGreater(record['cutoffs'], 0)
+        self.assertLessEqual(record['tt_hits'], record['tt_probes'])
+        self.assertEqual(record['pv'][0], move)
+        self.assertLessEqual(len(record['pv']), 4)
+        # The second search reuses the table of the first
+        self.assertGreater(records[1]['tt_hits'], 0)
+
+    def test_disabled(self):
+        player = Player(BitBoard(START_BOARD), 1, max_depth=3)
+        player.get_move(10000)
+        self.assertEqual(player.completed_depth, 3)
+        self.assertEqual(len(player.iterations), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
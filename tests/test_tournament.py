@@ -0,0 +1,36 @@
+"""
+This file contains tests for functions in tournament.py.
+"""
+
+import unittest
+from client.tournament import (Variant, GameTask, parse_variant, play_game,
+                               run_tournament)
+
+
+class TestTournament(unittest.TestCase):
+    def test_parse_variant(self):
+        self.assertEqual(parse_variant('pvs:4'), Variant('pvs:4', 'pvs', 4))
+        with self.assertRaises(ValueError):
+            parse_variant('random')
+
+    def test_play_game(self):
+        task = GameTask(Variant('a', 'alphabeta', 1),
+                        Variant('b', 'expectimax', 1), 1, 1000)
+        result = play_game(task)
+        self.assertIsNone(result.forfeit)
+        self.assertGreater(len(result.move_times[0]), 0)
+
+    def test_run_tournament(self):
+        summary = run_tournament(Variant('a', 'alphabeta', 1),
+                                 Variant('a', 'alphabeta', 1), 2, workers=1)
+        self.assertEqual(set(summary), {'a', "a'"})
+        for stats in summary.values():
+            self.assertEqual(stats['games'], 2)
+            self.assertEqual(stats['timeouts'], 0)
+        # Each opening is played from both sides by the same players
+        self.assertEqual(summary['a']['wins'] + summary['a']['draws'] / 2,
+                         summary["a'"]['wins'] + summary["a'"]['draws'] / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
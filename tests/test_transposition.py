@@ -0,0 +1,103 @@
+"""
+This file contains tests for functions in transposition.py.
+"""
+
+import unittest
+from client.bitboard import BitBoard
+from client.transposition import (TranspositionTable, zobrist_hash,
+                                  position_key, ENTRY_BYTES, EXACT, LOWER)
+
+
+class TestZobrist(unittest.TestCase):
+    def setUp(self) -> None:
+        self.input_board = [[0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 1, 2, 0, 0, 0],
+                            [0, 0, 0, 2, 1, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0],
+                            [0, 0, 0, 0, 0, 0, 0, 0]]
+
+    def test_incremental_hash_matches_full_hash(self):
+        board = BitBoard(self.input_board)
+        player = 1
+        # Play the first legal move until the game ends
+        for _ in range(60):
+            moves = list(board.find_valid(player))
+            if not moves:
+                player = player % 2 + 1
+                moves = list(board.find_valid(player))
+                if not moves:
+                    break
+            board = board.create_updated_board(moves[0], player)
+            self.assertEqual(board.hash_key, zobrist_hash(board.tokens))
+            player = player % 2 + 1
+
+    def test_same_position_has_the_same_hash(self):
+        board = BitBoard(self.input_board)
+        move = list(board.find_valid(1))[0]
+        updated = board.create_updated_board(move, 1)
+        # The same tokens reached without playing the move
+        rebuilt = BitBoard(updated.raw_board)
+        self.assertEqual(updated.hash_key, rebuilt.hash_key)
+        self.assertNotEqual(updated.hash_key, board.hash_key)
+        self.assertNotEqual(position_key(updated.hash_key, 1),
+                            position_key(updated.hash_key, 2))
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_memory_cap(self):
+        table = TranspositionTable(max_memory=1024 * 1024, policy='depth')
+        self.assertLessEqual(len(table) * ENTRY_BYTES, 1024 * 1024)
+        self.assertGreater(len(table) * ENTRY_BYTES * 2, 1024 * 1024)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            TranspositionTable(policy='random')
+
+    def test_probe_and_counters(self):
+        table = TranspositionTable(max_memory=64 * 1024)
+        self.assertIsNone(table.probe(1234))
+        table.store(1234, 3, 10, EXACT, None)
+        entry = table.probe(1234)
+        self.assertEqual((entry.depth, entry.value, entry.bound),
+                         (3, 10, EXACT))
+        self.assertEqual((table.hits, table.misses, table.stores), (1, 1, 1))
+        self.assertEqual(table.hit_rate, 0.5)
+
+    def test_depth_preferred_replacement(self):
+        table = TranspositionTable(max_memory=64 * 1024, policy='depth')
+        collision = 5 + len(table)
+        table.store(5, 4, 10, EXACT, None)
+        # A shallower result in the same slot is dropped
+        table.store(collision, 2, 20, LOWER, None)
+        self.assertIsNotNone(table.probe(5))
+        self.assertIsNone(table.probe(collision))
+        # But a result from a newer search replaces it
+        table.new_search()
+        table.store(collision, 2, 20, LOWER, None)
+        self.assertIsNone(table.probe(5))
+        self.assertIsNotNone(table.probe(collision))
+
+    def test_two_tier_replacement(self):
+        table = TranspositionTable(max_memory=64 * 1024, policy='two_tier')
+        slots = len(table) // 2
+        table.store(5, 4, 10, EXACT, None)
+        table.store(5 + slots, 2, 20, EXACT, None)
+        table.store(5 + 2 * slots, 1, 30, EXACT, None)
+        # The deep entry is kept, the always replace entry holds the newest
+        self.assertIsNotNone(table.probe(5))
+        self.assertIsNone(table.probe(5 + slots))
+        self.assertEqual(table.probe(5 + 2 * slots).value, 30)
+
+    def test_clear(self):
+        table = TranspositionTable(max_memory=64 * 1024)
+        table.store(5, 4, 10, EXACT, None)
+        table.clear()
+        self.assertIsNone(table.probe(5))
+        self.assertEqual(table.stores, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+This file contains tests for functions in tuning.py.
+"""
+
+import os
+import tempfile
+import unittest
+from client.bitboard import BitBoard
+from client.evaluation import PatternEvaluator, mirror_tables
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+if np is not None:
+    from client.tuning import (GameTask, POSITION_RECORD, play_game,
+                               read_dataset, fit_weights, _task_evaluator)
+
+
+@unittest.skipUnless(np is not None, 'numpy is not installed')
+class TestTuning(unittest.TestCase):
+    def test_play_game(self):
+        records = play_game(GameTask(1, None, 0, 1))
+        self.assertEqual(len(records) % POSITION_RECORD.size, 0)
+        positions = list(POSITION_RECORD.iter_unpack(records))
+        # Every move adds a token
+        self.assertLessEqual(len(positions), 60)
+        own, other, result = positions[-1]
+        board = BitBoard.from_bits(own, other)
+        self.assertEqual(board.score[0] - board.score[1], result)
+        # The same seed plays the same game
+        self.assertEqual(play_game(GameTask(1, None, 0, 1)), records)
+
+    def test_task_evaluator_is_kept(self):
+        evaluator = _task_evaluator(GameTask(1, None, 0, 1))
+        self.assertEqual(evaluator.revision, 0)
+        self.assertIs(_task_evaluator(GameTask(2, None, 0, 1)), evaluator)
+
+    def test_read_dataset(self):
+        records = play_game(GameTask(2, None, 0, 1))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'positions')
+            with open(path, 'wb') as dataset:
+                dataset.write(records)
+            positions = read_dataset(path, limit=5)
+        expected = list(POSITION_RECORD.iter_unpack(records))[-5:]
+        self.assertEqual([(int(own), int(other), int(result))
+                          for own, other, result in positions], expected)
+
+    def test_fit_reduces_the_error(self):
+        records = b''.join(play_game(GameTask(seed, None, 0, 1))
+                           for seed in range(20))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'positions')
+            with open(path, 'wb') as dataset:
+                dataset.write(records)
+            positions = read_dataset(path)
+        evaluator = PatternEvaluator()
+        fitted, before, after = fit_weights(positions, evaluator)
+        self.assertEqual(fitted.revision, 1)
+        self.assertLess(after, before)
+        # The fitted values are integers and the error is in tokens
+        value = fitted.evaluate(int(positions[0]['own']),
+                                int(positions[0]['other']), 4)
+        self.assertIsInstance(value, int)
+        self.assertLess(after, 64)
+        # Mirrored indexes keep the same weight
+        for phase in fitted.weights:
+            for table, mirrors in zip(phase, mirror_tables()):
+                for mirror in mirrors:
+                    self.assertEqual([table[index] for index in mirror],
+                                     table)
+
+
+if __name__ == '__main__':
+    unittest.main()